@@ -0,0 +1,36 @@
+"""add delivery mode, sample size and question difficulty
+
+Revision ID: delivery_modes
+Revises: initial
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "delivery_modes"
+down_revision: Union[str, Sequence[str], None] = "initial"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column)
+COLUMNS = [
+    ("quizzes", sa.Column("delivery_mode", sa.String(), nullable=False, server_default="fixed")),
+    ("quizzes", sa.Column("sample_size", sa.Integer(), nullable=True)),
+    ("questions", sa.Column("difficulty", sa.Integer(), nullable=True, server_default="1")),
+]
+
+
+def upgrade() -> None:
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(column)
+
+
+def downgrade() -> None:
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column(column.name)
@@ -0,0 +1,84 @@
+"""initial schema
+
+Revision ID: initial
+Revises:
+Create Date: 2024-01-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "initial"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the base tables as they were before any later revision."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_admin", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "quizzes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("is_active", sa.Boolean()),
+    )
+    op.create_index("ix_quizzes_id", "quizzes", ["id"])
+    op.create_index("ix_quizzes_title", "quizzes", ["title"])
+
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("quizzes.id")),
+        sa.Column("text", sa.Text()),
+        sa.Column("order", sa.Integer()),
+    )
+    op.create_index("ix_questions_id", "questions", ["id"])
+
+    op.create_table(
+        "answers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id")),
+        sa.Column("text", sa.Text()),
+        sa.Column("is_correct", sa.Boolean()),
+    )
+    op.create_index("ix_answers_id", "answers", ["id"])
+
+    op.create_table(
+        "user_quiz_results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("quizzes.id")),
+        sa.Column("score", sa.Integer()),
+        sa.Column("completed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_user_quiz_results_id", "user_quiz_results", ["id"])
+
+
+def downgrade() -> None:
+    """Drop the base tables."""
+    op.drop_table("user_quiz_results")
+    op.drop_table("answers")
+    op.drop_table("questions")
+    op.drop_table("quizzes")
+    op.drop_table("users")
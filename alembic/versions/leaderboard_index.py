@@ -0,0 +1,26 @@
+"""index user_quiz_stats for leaderboards
+
+Revision ID: leaderboard_index
+Revises: submission_keys
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "leaderboard_index"
+down_revision: Union[str, Sequence[str], None] = "submission_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_user_quiz_stats_quiz_best", "user_quiz_stats", ["quiz_id", "best_score"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_quiz_stats_quiz_best", table_name="user_quiz_stats")
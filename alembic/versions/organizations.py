@@ -0,0 +1,67 @@
+"""add organizations and scope users, quizzes and results to one
+
+Revision ID: organizations
+Revises: jobs
+Create Date: 2026-10-19 00:00:00
+
+Run against every shard (each with its own DATABASE_URL); the directory
+row of the default organization only matters in the default database.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "organizations"
+down_revision: Union[str, Sequence[str], None] = "jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_ORG_ID = 1
+SCOPED_TABLES = ["users", "quizzes", "user_quiz_results"]
+
+
+def upgrade() -> None:
+    organizations = op.create_table(
+        "organizations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("slug", sa.String(64), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("shard", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_organizations_id", "organizations", ["id"])
+    op.create_index("ix_organizations_slug", "organizations", ["slug"], unique=True)
+    op.bulk_insert(
+        organizations,
+        [{"id": DEFAULT_ORG_ID, "slug": "default", "name": "Default", "shard": "default"}],
+    )
+
+    for table in SCOPED_TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column(
+                "org_id", sa.Integer(), nullable=False, server_default=str(DEFAULT_ORG_ID)
+            ))
+        op.create_index(f"ix_{table}_org_id", table, ["org_id"])
+
+    # Usernames and emails become unique per organization
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.create_index("ux_users_org_username", "users", ["org_id", "username"], unique=True)
+    op.create_index("ux_users_org_email", "users", ["org_id", "email"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_users_org_email", table_name="users")
+    op.drop_index("ux_users_org_username", table_name="users")
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    for table in reversed(SCOPED_TABLES):
+        op.drop_index(f"ix_{table}_org_id", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("org_id")
+    op.drop_index("ix_organizations_slug", table_name="organizations")
+    op.drop_index("ix_organizations_id", table_name="organizations")
+    op.drop_table("organizations")
@@ -0,0 +1,134 @@
+"""partition user_quiz_results by month
+
+Revision ID: partition_results
+Revises: delivery_modes
+Create Date: 2026-10-19 00:00:00
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.db import partitions
+
+# revision identifiers, used by Alembic.
+revision: str = "partition_results"
+down_revision: Union[str, Sequence[str], None] = "delivery_modes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, user_id, quiz_id, score, completed_at"
+
+
+def _create_indexes(include_id: bool = True) -> None:
+    if include_id:
+        op.execute("CREATE INDEX ix_user_quiz_results_id ON user_quiz_results (id)")
+    op.execute(
+        "CREATE INDEX ix_user_quiz_results_user_completed "
+        "ON user_quiz_results (user_id, completed_at)"
+    )
+    op.execute(
+        "CREATE INDEX ix_user_quiz_results_quiz_completed "
+        "ON user_quiz_results (quiz_id, completed_at)"
+    )
+
+
+def _rename_old_table() -> None:
+    op.execute("ALTER TABLE user_quiz_results RENAME TO user_quiz_results_old")
+    op.execute(
+        "ALTER TABLE user_quiz_results_old "
+        "RENAME CONSTRAINT user_quiz_results_pkey TO user_quiz_results_old_pkey"
+    )
+    # Keep the id sequence alive when the old table is dropped
+    op.execute("ALTER SEQUENCE user_quiz_results_id_seq OWNED BY NONE")
+    for name in (
+        "ix_user_quiz_results_id",
+        "ix_user_quiz_results_user_completed",
+        "ix_user_quiz_results_quiz_completed",
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    """Convert user_quiz_results to a monthly range-partitioned table."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        # Elsewhere the table stays unpartitioned, with the same constraint
+        # and query indexes
+        op.execute(
+            "UPDATE user_quiz_results SET completed_at = CURRENT_TIMESTAMP "
+            "WHERE completed_at IS NULL"
+        )
+        with op.batch_alter_table("user_quiz_results") as batch:
+            batch.alter_column(
+                "completed_at", existing_type=sa.DateTime(timezone=True), nullable=False
+            )
+        _create_indexes(include_id=False)
+        return
+
+    _rename_old_table()
+    # The partition key must be part of the primary key
+    op.execute("""
+        CREATE TABLE user_quiz_results (
+            id INTEGER NOT NULL DEFAULT nextval('user_quiz_results_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            quiz_id INTEGER REFERENCES quizzes (id),
+            score INTEGER,
+            completed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, completed_at)
+        ) PARTITION BY RANGE (completed_at)
+    """)
+    op.execute("ALTER SEQUENCE user_quiz_results_id_seq OWNED BY user_quiz_results.id")
+    # Catches rows if partition maintenance ever falls behind
+    op.execute("CREATE TABLE user_quiz_results_default PARTITION OF user_quiz_results DEFAULT")
+
+    first = bind.execute(
+        sa.text("SELECT min(completed_at) FROM user_quiz_results_old")
+    ).scalar() or date.today()
+    last = partitions.add_months(
+        partitions.month_start(date.today()), settings.RESULT_PARTITION_MONTHS_AHEAD
+    )
+    for month in partitions.iter_months(first, last):
+        partitions.create_month_partition(bind, month)
+
+    op.execute(f"""
+        INSERT INTO user_quiz_results ({COLUMNS})
+        SELECT id, user_id, quiz_id, score, coalesce(completed_at, now())
+        FROM user_quiz_results_old
+    """)
+    op.execute("DROP TABLE user_quiz_results_old")
+    _create_indexes()
+
+
+def downgrade() -> None:
+    """Fold the partitions back into a plain table."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.drop_index("ix_user_quiz_results_quiz_completed", table_name="user_quiz_results")
+        op.drop_index("ix_user_quiz_results_user_completed", table_name="user_quiz_results")
+        with op.batch_alter_table("user_quiz_results") as batch:
+            batch.alter_column(
+                "completed_at", existing_type=sa.DateTime(timezone=True), nullable=True
+            )
+        return
+
+    _rename_old_table()
+    op.execute("""
+        CREATE TABLE user_quiz_results (
+            id INTEGER NOT NULL DEFAULT nextval('user_quiz_results_id_seq') PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            quiz_id INTEGER REFERENCES quizzes (id),
+            score INTEGER,
+            completed_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("ALTER SEQUENCE user_quiz_results_id_seq OWNED BY user_quiz_results.id")
+    op.execute(f"""
+        INSERT INTO user_quiz_results ({COLUMNS})
+        SELECT {COLUMNS} FROM user_quiz_results_old
+    """)
+    op.execute("DROP TABLE user_quiz_results_old CASCADE")
+    _create_indexes()
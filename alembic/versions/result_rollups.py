@@ -0,0 +1,48 @@
+"""add user_quiz_stats and user_progress rollups
+
+Revision ID: result_rollups
+Revises: partition_results
+Create Date: 2026-10-19 00:00:00
+
+Run `python -m app.cli rollups` afterwards to backfill existing results.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "result_rollups"
+down_revision: Union[str, Sequence[str], None] = "partition_results"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_quiz_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("quizzes.id"), primary_key=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("total_score", sa.Integer(), nullable=False),
+        sa.Column("best_score", sa.Integer(), nullable=False),
+        sa.Column("last_score", sa.Integer(), nullable=False),
+        sa.Column("last_completed_at", sa.DateTime(timezone=True)),
+    )
+    op.create_table(
+        "user_progress",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("total_score", sa.Integer(), nullable=False),
+        sa.Column("average_score", sa.Float(), nullable=False),
+        sa.Column("current_streak", sa.Integer(), nullable=False),
+        sa.Column("longest_streak", sa.Integer(), nullable=False),
+        sa.Column("last_active_on", sa.Date()),
+    )
+    op.create_index("ix_user_progress_average_score", "user_progress", ["average_score"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_progress_average_score", table_name="user_progress")
+    op.drop_table("user_progress")
+    op.drop_table("user_quiz_stats")
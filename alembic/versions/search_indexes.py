@@ -0,0 +1,40 @@
+"""add full-text search indexes on quizzes and questions
+
+Revision ID: search_indexes
+Revises: organizations
+Create Date: 2026-10-19 00:00:00
+
+PostgreSQL only; other databases search with the in-memory index.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "search_indexes"
+down_revision: Union[str, Sequence[str], None] = "organizations"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.models.quiz.search_vector() for queries to use them
+INDEXES = {
+    "ix_quizzes_fts": (
+        "quizzes",
+        "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))",
+    ),
+    "ix_questions_fts": ("questions", "to_tsvector('english', coalesce(text, ''))"),
+}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for name, (table, expression) in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON {table} USING gin ({expression})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for name in INDEXES:
+        op.execute(f"DROP INDEX {name}")
@@ -0,0 +1,36 @@
+"""add submission_keys for idempotent submissions
+
+Revision ID: submission_keys
+Revises: result_rollups
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "submission_keys"
+down_revision: Union[str, Sequence[str], None] = "result_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "submission_keys",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("request_hash", sa.String(64), nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False
+        ),
+    )
+    op.create_index("ix_submission_keys_created_at", "submission_keys", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_submission_keys_created_at", table_name="submission_keys")
+    op.drop_table("submission_keys")
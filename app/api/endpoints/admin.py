@@ -0,0 +1,109 @@
+import os
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.responses import ORJSONResponse
+from app.core.security import get_current_admin_user
+from app.db.session import get_db
+from app.models.user import User
+from app.schemas.job import Job as JobSchema, JobCreate
+from app.schemas.organization import (
+    Organization as OrganizationSchema,
+    OrganizationCreate,
+    OrganizationStats,
+)
+from app.services import jobs as job_service
+from app.services import organizations as organization_service
+
+router = APIRouter(
+    default_response_class=ORJSONResponse,
+    dependencies=[Depends(get_current_admin_user)],
+)
+
+@router.get("/jobs/kinds")
+def read_job_kinds() -> Any:
+    """
+    Registered job kinds with their executor and default priority.
+    """
+    return {
+        name: {"executor": kind.executor, "priority": kind.priority}
+        for name, kind in sorted(job_service.JOB_KINDS.items())
+    }
+
+@router.post("/jobs", response_model=JobSchema, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    job_in: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Queue a background job.
+    """
+    params = dict(job_in.params)
+    if job_in.kind == "import_quizzes":
+        # Imported quizzes belong to the admin who queued them
+        params["user_id"] = current_user.id
+    return job_service.submit_job(db, job_in.kind, params, job_in.priority, current_user.id)
+
+@router.get("/jobs", response_model=List[JobSchema])
+def read_jobs(
+    status_: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Most recent jobs first, optionally only those with a given status.
+    """
+    return job_service.list_jobs(db, status_, limit)
+
+@router.get("/jobs/{job_id}", response_model=JobSchema)
+def read_job(job_id: int, db: Session = Depends(get_db)) -> Any:
+    """
+    Status, progress and result of a job.
+    """
+    return job_service.get_job(db, job_id)
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobSchema)
+def cancel_job(job_id: int, db: Session = Depends(get_db)) -> Any:
+    """
+    Cancel a queued job, or ask a running one to stop.
+    """
+    return job_service.cancel_job(db, job_id)
+
+@router.get("/jobs/{job_id}/download")
+def download_job_output(job_id: int, db: Session = Depends(get_db)) -> Any:
+    """
+    The file written by a job, e.g. a results export.
+    """
+    job = job_service.get_job(db, job_id)
+    path = (job.result or {}).get("path") if isinstance(job.result, dict) else None
+    output_dir = os.path.realpath(settings.JOB_OUTPUT_DIR)
+    if not path or not os.path.realpath(path).startswith(output_dir + os.sep) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job has no output file")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@router.get("/orgs", response_model=List[OrganizationSchema])
+def read_organizations(db: Session = Depends(get_db)) -> Any:
+    """
+    Every organization and the shard it lives in.
+    """
+    return organization_service.list_organizations(db)
+
+@router.post("/orgs", response_model=OrganizationSchema, status_code=status.HTTP_201_CREATED)
+def create_organization(org_in: OrganizationCreate, db: Session = Depends(get_db)) -> Any:
+    """
+    Add an organization on one of the configured shards.
+    """
+    return organization_service.create_organization(db, org_in)
+
+@router.get("/orgs/stats", response_model=List[OrganizationStats])
+def read_organization_stats(db: Session = Depends(get_db)) -> Any:
+    """
+    Users, active quizzes and results per organization across all shards
+    (queried in parallel).
+    """
+    return organization_service.organization_stats(db)
@@ -0,0 +1,33 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from app.core.profiler import get_profile, profiles
+from app.core.responses import ORJSONResponse
+
+# Only mounted when PROFILING_ENABLED is set
+router = APIRouter(default_response_class=ORJSONResponse)
+
+@router.get("/profiles")
+def list_profiles() -> Any:
+    """
+    Summaries of the most recent profiled requests, newest first.
+    """
+    return [
+        {
+            key: profile[key]
+            for key in ("id", "method", "path", "status", "duration_ms", "query_count", "query_ms")
+        } | {"n_plus_one": len(profile["repeated"])}
+        for profile in reversed(profiles)
+    ]
+
+@router.get("/profiles/{profile_id}")
+def read_profile(profile_id: str) -> Any:
+    """
+    Full report: every statement with timing and call site, repeated
+    statement shapes (likely N+1s) and the CPU profile if requested.
+    """
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi import APIRouter, status
+
+from app.core import singleflight
+from app.core.responses import ORJSONResponse
+from app.services.warmup import state as warmup_state
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+@router.get("/live")
+def live() -> Any:
+    """
+    The process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready() -> Any:
+    """
+    Ready for traffic once the startup warm-up has finished.
+    """
+    status_code = status.HTTP_200_OK if warmup_state.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return ORJSONResponse(warmup_state.as_dict(), status_code=status_code)
+
+@router.get("/metrics")
+def metrics() -> Any:
+    """
+    In-process counters: single-flight calls, executions and coalesced waits.
+    """
+    return {"singleflight": singleflight.stats()}
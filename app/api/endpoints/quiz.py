@@ -1,19 +1,37 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Header, Query, Response, status
 from sqlalchemy.orm import Session
 
+from app.core.idempotency import request_fingerprint, run_idempotent
+from app.core.ratelimit import limit_by_user
+from app.core.responses import ORJSONResponse, adapter_response
 from app.core.security import get_current_user
 from app.db.session import get_db
-from app.models.quiz import Quiz, Question, Answer, UserQuizResult
 from app.models.user import User
 from app.schemas.quiz import (
     Quiz as QuizSchema,
     QuizCreate,
+    LeaderboardEntry,
+    QuizPaper,
+    QuizSearchHit,
+    QuizStats,
+    QuizSummary,
     UserQuizResult as UserQuizResultSchema,
     QuizSubmission,
+    QuizUpdate,
+    QuizSearchHitListAdapter,
+    QuizSummaryListAdapter,
+    UserQuizResultAdapter,
+    UserQuizResultListAdapter,
 )
+from app.services import quiz as quiz_service
+from app.services.archive import result_stats
+from app.services.progress import get_leaderboard
+from app.services.delivery import get_pool, paper_for_user
+from app.services.search import search_quizzes
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 @router.post("/", response_model=QuizSchema)
 def create_quiz(
@@ -24,40 +42,9 @@ def create_quiz(
     """
     Create new quiz.
     """
-    quiz = Quiz(
-        title=quiz_in.title,
-        description=quiz_in.description,
-        created_by=current_user.id,
-    )
-    db.add(quiz)
-    db.commit()
-    db.refresh(quiz)
-    
-    # Add questions and answers
-    for q_idx, q_data in enumerate(quiz_in.questions):
-        question = Question(
-            quiz_id=quiz.id,
-            text=q_data.text,
-            order=q_data.order or q_idx,
-        )
-        db.add(question)
-        db.commit()
-        db.refresh(question)
-        
-        # Add answers for this question
-        for a_data in q_data.answers:
-            answer = Answer(
-                question_id=question.id,
-                text=a_data.text,
-                is_correct=a_data.is_correct,
-            )
-            db.add(answer)
-        
-    db.commit()
-    db.refresh(quiz)
-    return quiz
-
-@router.get("/", response_model=List[QuizSchema])
+    return quiz_service.create_quiz(db, quiz_in, user_id=current_user.id)
+
+@router.get("/", response_model=List[QuizSummary])
 def read_quizzes(
     skip: int = 0,
     limit: int = 100,
@@ -67,86 +54,134 @@ def read_quizzes(
     """
     Retrieve quizzes.
     """
-    quizzes = db.query(Quiz).filter(Quiz.is_active == True).offset(skip).limit(limit).all()
-    return quizzes
+    quizzes = quiz_service.get_quizzes(db, skip=skip, limit=limit)
+    return adapter_response(QuizSummaryListAdapter, quizzes)
+
+@router.get("/search", response_model=List[QuizSearchHit])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Ranked full-text search over quiz titles, descriptions and questions.
+    """
+    hits = search_quizzes(db, q, limit=limit)
+    return adapter_response(
+        QuizSearchHitListAdapter,
+        [{**quiz._mapping, "score": score} for quiz, score in hits],
+    )
 
-@router.get("/{quiz_id}", response_model=QuizSchema)
+@router.get("/{quiz_id}", response_model=QuizPaper)
 def read_quiz(
     quiz_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
-    Get quiz by ID.
+    Get the current user's paper for a quiz (no answer key).
     """
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id, Quiz.is_active == True).first()
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    return quiz
+    quiz = quiz_service.get_quiz(db, quiz_id)
+    pool = get_pool(db, quiz)
+    return ORJSONResponse(paper_for_user(db, pool, current_user.id))
 
-@router.post("/submit", response_model=UserQuizResultSchema)
+@router.patch("/{quiz_id}", response_model=QuizSchema)
+def update_quiz(
+    quiz_id: int,
+    quiz_in: QuizUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Update a quiz. Questions and answers are matched by id, so unchanged
+    rows keep their ids.
+    """
+    quiz = quiz_service.get_quiz(db, quiz_id)
+    return quiz_service.update_quiz(db, quiz, quiz_in, current_user)
+
+@router.post(
+    "/submit",
+    response_model=UserQuizResultSchema,
+    dependencies=[Depends(limit_by_user("submit"))],
+)
 def submit_quiz(
     submission: QuizSubmission,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
     Submit quiz answers and get results.
+
+    With an Idempotency-Key header, retries of the same submission return
+    the original result (marked with Idempotent-Replayed) instead of
+    scoring it again.
     """
-    # Check if quiz exists
-    quiz = db.query(Quiz).filter(Quiz.id == submission.quiz_id, Quiz.is_active == True).first()
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Calculate score
-    total_questions = len(quiz.questions)
-    correct_answers = 0
-    
-    answer_map = {answer.question_id: answer.answer_id for answer in submission.answers}
-    
-    for question in quiz.questions:
-        submitted_answer_id = answer_map.get(question.id)
-        if submitted_answer_id:
-            # Check if the submitted answer is correct
-            is_correct = db.query(Answer).filter(
-                Answer.id == submitted_answer_id,
-                Answer.question_id == question.id,
-                Answer.is_correct == True
-            ).first() is not None
-            
-            if is_correct:
-                correct_answers += 1
-    
-    # Calculate percentage score
-    score = int((correct_answers / total_questions) * 100) if total_questions > 0 else 0
-    
-    # Save results
-    quiz_result = UserQuizResult(
-        user_id=current_user.id,
-        quiz_id=submission.quiz_id,
-        score=score,
+    if idempotency_key is None:
+        [result] = quiz_service.score_submissions(db, [(current_user.id, submission)])
+        return result
+
+    fingerprint = request_fingerprint(submission.model_dump_json().encode())
+
+    def submit():
+        result, replayed = quiz_service.submit_idempotent(
+            db, current_user.id, submission, idempotency_key, fingerprint
+        )
+        body = UserQuizResultAdapter.dump_python(
+            UserQuizResultAdapter.validate_python(result, from_attributes=True), mode="json"
+        )
+        return body, replayed
+
+    body, replayed = run_idempotent(
+        f"submit:{current_user.org_id}:{current_user.id}:{idempotency_key}", fingerprint, submit
     )
-    db.add(quiz_result)
-    db.commit()
-    db.refresh(quiz_result)
-    
-    return quiz_result
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
 
 @router.get("/results/{quiz_id}", response_model=List[UserQuizResultSchema])
 def read_quiz_results(
     quiz_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Get user's results for a specific quiz, optionally within [start, end).
+    """
+    results = quiz_service.get_user_quiz_results(
+        db, current_user.id, quiz_id=quiz_id, start=start, end=end
+    )
+    return adapter_response(UserQuizResultListAdapter, results)
+
+@router.get("/{quiz_id}/leaderboard", response_model=List[LeaderboardEntry])
+def read_leaderboard(
+    quiz_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Top players of a quiz by best score (refreshed every few seconds).
+    """
+    return get_leaderboard(db, quiz_id, limit)
+
+@router.get("/{quiz_id}/stats", response_model=QuizStats)
+def read_quiz_stats(
+    quiz_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
-    Get user's results for a specific quiz.
+    Attempts, average and best score for a quiz, including archived months.
     """
-    results = db.query(UserQuizResult).filter(
-        UserQuizResult.quiz_id == quiz_id,
-        UserQuizResult.user_id == current_user.id
-    ).all()
-    
-    return results
+    quiz_service.get_quiz(db, quiz_id, active_only=False)
+    return {"quiz_id": quiz_id, **result_stats(db, quiz_id=quiz_id, start=start, end=end)}
 
 @router.delete("/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_quiz(
@@ -157,15 +192,6 @@ def delete_quiz(
     """
     Delete a quiz (soft delete).
     """
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Only the creator or an admin can delete the quiz
-    if quiz.created_by != current_user.id and not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    
-    # Soft delete
-    quiz.is_active = False
-    db.commit()
+    quiz = quiz_service.get_quiz(db, quiz_id, active_only=False)
+    quiz_service.delete_quiz(db, quiz, current_user)
     return None  # No response body for a 204 No Content
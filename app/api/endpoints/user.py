@@ -1,57 +1,30 @@
-from datetime import timedelta
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from app.core.config import settings
-from app.core.security import (
-    get_password_hash, 
-    verify_password, 
-    create_access_token, 
-    get_current_user
-)
-from app.db.session import get_db
+from app.core.ratelimit import check_rate_limit, limit_by_ip
+from app.core.responses import ORJSONResponse
+from app.core.security import get_current_user
+from app.db.session import get_db, shard_session
+from app.db.tenancy import org_id_of, refresh_token_tenant
 from app.models.user import User
-from app.schemas.user import UserCreate, User as UserSchema, Token
+from app.services import progress as progress_service
+from app.services import tokens as token_service
+from app.services import user as user_service
+from app.schemas.user import UserCreate, User as UserSchema, RefreshRequest, Token, UserSummary
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 @router.post("/register", response_model=UserSchema)
 def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
     """
     Register a new user.
     """
-    # Check if username already exists
-    user = db.query(User).filter(User.username == user_in.username).first()
-    if user:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this username already exists in the system.",
-        )
-    
-    # Check if email already exists
-    user = db.query(User).filter(User.email == user_in.email).first()
-    if user:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this email already exists in the system.",
-        )
-    
-    # Create the new user
-    db_user = User(
-        username=user_in.username,
-        email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
-        is_active=True,
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    return user_service.create_user(db, user_in)
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(limit_by_ip("login"))])
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
@@ -60,15 +33,11 @@ def login_for_access_token(
     OAuth2 compatible token login, get an access token for future requests.
     Allows login via either username or email.
     """
-    # First try to find user by username
-    user = db.query(User).filter(User.username == form_data.username).first()
-    
-    # If not found by username, try by email
+    # Throttle per account before spending any bcrypt time
+    check_rate_limit("login", f"user:{org_id_of(db)}:{form_data.username.lower()}")
+
+    user = user_service.authenticate_user(db, form_data.username, form_data.password)
     if not user:
-        user = db.query(User).filter(User.email == form_data.username).first()
-    
-    # If no user found or password is incorrect
-    if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -83,17 +52,43 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Generate token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)},  # Use ID as subject, and ensure it's a string
-        expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Short-lived access token plus a refresh token for renewing it
+    return token_service.login(db, user)
+
+@router.post("/token/refresh", response_model=Token, dependencies=[Depends(limit_by_ip("refresh"))])
+def refresh_access_token(request: Request, body: RefreshRequest) -> Any:
+    """
+    Exchange a refresh token for a new access token and refresh token.
+    Each refresh token works once; no password check is involved.
+    """
+    # Routed by the organization the refresh token names
+    org = refresh_token_tenant(request, body.refresh_token)
+    with shard_session(org.shard, org.id) as db:
+        return token_service.refresh(db, body.refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: Request, body: RefreshRequest) -> Response:
+    """
+    End the session of a refresh token; its access tokens stop working too.
+    """
+    org = refresh_token_tenant(request, body.refresh_token)
+    with shard_session(org.shard, org.id) as db:
+        token_service.logout(db, body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/me", response_model=UserSchema)
 def read_users_me(current_user: User = Depends(get_current_user)) -> Any:
     """
     Get current user.
     """
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.get("/me/summary", response_model=UserSummary)
+def read_users_me_summary(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """
+    Get attempts, best and last score per quiz, streaks and percentile.
+    """
+    return progress_service.get_summary(db, current_user.id)
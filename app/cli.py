@@ -0,0 +1,146 @@
+"""
+Maintenance commands, meant to be run from cron or a deploy hook. Each
+runs on every shard in turn, or only on `--shard NAME`.
+
+Usage:
+    python -m app.cli [--shard NAME] partitions [--months-ahead N]
+    python -m app.cli [--shard NAME] archive [--retention-months N]
+    python -m app.cli [--shard NAME] rollups [--user ID ...]
+    python -m app.cli [--shard NAME] prune-keys [--hours N]
+    python -m app.cli [--shard NAME] prune-tokens
+"""
+import argparse
+from typing import Iterator, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import base  # noqa: F401 - registers every model
+from app.db import partitions
+from app.db.session import engines, shard_session
+
+
+def _shards(args: argparse.Namespace) -> Iterator[Tuple[str, Session]]:
+    """
+    (shard, unscoped session) for every shard the command runs on.
+    """
+    for shard in [args.shard] if args.shard else list(engines):
+        db = shard_session(shard)
+        try:
+            yield shard, db
+        finally:
+            db.close()
+
+
+def create_partitions(args: argparse.Namespace) -> None:
+    for shard, db in _shards(args):
+        created = partitions.ensure_partitions(db.connection(), args.months_ahead)
+        db.commit()
+        if created:
+            print(f"[{shard}] Partitions present: " + ", ".join(created))
+        else:
+            print(f"[{shard}] user_quiz_results is not partitioned; nothing to do")
+
+
+def archive_results(args: argparse.Namespace) -> None:
+    from app.services.archive import archive_old_results
+
+    for shard, db in _shards(args):
+        archived = archive_old_results(db, args.retention_months)
+        for path, count in archived:
+            print(f"[{shard}] Archived {count} results to {path}")
+        if not archived:
+            print(f"[{shard}] No results older than the retention window")
+
+
+def rebuild_rollups(args: argparse.Namespace) -> None:
+    from app.services.progress import clear_rollup_caches, rebuild_rollups as rebuild
+
+    for shard, db in _shards(args):
+        count = rebuild(db, args.user)
+        print(f"[{shard}] Rebuilt rollups from {count} results")
+    # Running workers sharing SHARED_CACHE_DIR drop their cached copies
+    clear_rollup_caches()
+
+
+def prune_keys(args: argparse.Namespace) -> None:
+    from datetime import datetime, timedelta, timezone
+
+    from sqlalchemy import delete
+
+    from app.models.quiz import SubmissionKey
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.hours)
+    for shard, db in _shards(args):
+        deleted = db.execute(
+            delete(SubmissionKey).where(SubmissionKey.created_at < cutoff)
+        ).rowcount
+        db.commit()
+        print(f"[{shard}] Deleted {deleted} idempotency keys older than {args.hours}h")
+
+
+def prune_tokens(args: argparse.Namespace) -> None:
+    from datetime import datetime, timezone
+
+    from sqlalchemy import delete
+
+    from app.models.user import RefreshToken
+
+    for shard, db in _shards(args):
+        deleted = db.execute(
+            delete(RefreshToken).where(RefreshToken.expires_at < datetime.now(timezone.utc))
+        ).rowcount
+        db.commit()
+        print(f"[{shard}] Deleted {deleted} expired refresh tokens")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument(
+        "--shard", choices=list(engines), help="only this shard (default: every shard)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_partitions = commands.add_parser(
+        "partitions", help="create upcoming monthly result partitions"
+    )
+    parser_partitions.add_argument(
+        "--months-ahead", type=int, default=settings.RESULT_PARTITION_MONTHS_AHEAD
+    )
+    parser_partitions.set_defaults(func=create_partitions)
+
+    parser_archive = commands.add_parser(
+        "archive", help="move results older than the retention window to .npy files"
+    )
+    parser_archive.add_argument(
+        "--retention-months", type=int, default=settings.RESULTS_RETENTION_MONTHS
+    )
+    parser_archive.set_defaults(func=archive_results)
+
+    parser_rollups = commands.add_parser(
+        "rollups", help="backfill the per-user result rollups"
+    )
+    parser_rollups.add_argument(
+        "--user", type=int, action="append", help="only rebuild these users (repeatable)"
+    )
+    parser_rollups.set_defaults(func=rebuild_rollups)
+
+    parser_keys = commands.add_parser(
+        "prune-keys", help="delete expired submission idempotency keys"
+    )
+    parser_keys.add_argument(
+        "--hours", type=int, default=settings.IDEMPOTENCY_TTL_SECONDS // 3600
+    )
+    parser_keys.set_defaults(func=prune_keys)
+
+    parser_tokens = commands.add_parser(
+        "prune-tokens", help="delete expired refresh tokens"
+    )
+    parser_tokens.set_defaults(func=prune_tokens)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
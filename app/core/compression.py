@@ -0,0 +1,164 @@
+import gzip
+from typing import Dict, List
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli is optional - only gzip is negotiated without it
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+)
+
+# Responses that have no body, or whose body must go out as-is
+UNCOMPRESSED_STATUSES = {204, 206, 304}
+
+
+def _accepted_encodings(headers: Headers) -> Dict[str, float]:
+    """
+    Accept-Encoding as {coding: q-value}; malformed q-values count as 0.
+    """
+    accepted = {}
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+def _quality(accepted: Dict[str, float], coding: str) -> float:
+    # An explicit entry wins over "*"
+    return accepted.get(coding, accepted.get("*", 0.0))
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli or GZip depending on Accept-Encoding.
+
+    Each encoding has its own size threshold: tiny bodies are sent as-is
+    because the framing overhead outweighs the savings. Bodies are buffered
+    up to `maximum_buffer_size`, which covers the API's JSON payloads;
+    larger bodies, file downloads and responses without a body are passed
+    through untouched, as is everything the middleware does not compress.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        gzip_minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_minimum_size: int = 500,
+        brotli_quality: int = 4,
+        maximum_buffer_size: int = 1024 * 1024,
+    ) -> None:
+        self.app = app
+        self.gzip_minimum_size = gzip_minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_minimum_size = brotli_minimum_size
+        self.brotli_quality = brotli_quality
+        self.maximum_buffer_size = maximum_buffer_size
+
+    def _passthrough(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        if message["status"] < 200 or message["status"] in UNCOMPRESSED_STATUSES:
+            return True
+        if "content-encoding" in headers:
+            return True
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return True
+        # File responses advertise byte ranges, which only make sense on the
+        # file as stored
+        if "accept-ranges" in headers:
+            return True
+        content_length = headers.get("content-length")
+        return content_length is not None and (
+            not content_length.isdigit() or int(content_length) > self.maximum_buffer_size
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope))
+        brotli_quality = _quality(accepted, "br") if brotli is not None else 0.0
+        gzip_quality = _quality(accepted, "gzip")
+        # Brotli unless the client prefers gzip
+        use_brotli = brotli_quality > 0 and brotli_quality >= gzip_quality
+        use_gzip = gzip_quality > 0
+        if not use_brotli and not use_gzip:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        body_parts: List[bytes] = []
+        buffered = 0
+        passthrough = False
+
+        async def flush_uncompressed() -> None:
+            await send(start_message)
+            for part in body_parts:
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+            body_parts.clear()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, buffered, passthrough
+            if message["type"] == "http.response.start":
+                if self._passthrough(message):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            body_parts.append(body)
+            buffered += len(body)
+            more_body = message.get("more_body", False)
+            if more_body and buffered > self.maximum_buffer_size:
+                # Too large to buffer: stream the rest uncompressed
+                passthrough = True
+                await flush_uncompressed()
+                return
+            if more_body:
+                return
+
+            body = b"".join(body_parts)
+            if use_brotli and len(body) >= self.brotli_minimum_size:
+                body = brotli.compress(body, quality=self.brotli_quality)
+                encoding = "br"
+            elif use_gzip and len(body) >= self.gzip_minimum_size:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+                encoding = "gzip"
+            else:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -15,11 +15,118 @@ class Settings(BaseSettings):
     API_V1_STR: str = ""
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    # 60 minutes * 24 hours * 8 days = 8 days
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Access tokens are short-lived and renewed with a rotating refresh token
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Revoked sessions kept in memory (Bloom filter + exact set) until their
+    # access tokens expire; the filter is sized for this many
+    REVOCATION_CAPACITY: int = 100_000
+    # Seconds between reloads of recent revocations from the database, so
+    # logouts reach every worker process (0 = load once at startup)
+    REVOCATION_SYNC_SECONDS: float = 10
     
     # Database
     DATABASE_URL: str
+    # Extra tenant databases by shard name, e.g. {"eu": "postgresql://..."};
+    # DATABASE_URL is the "default" shard and holds the organization directory
+    SHARD_DATABASE_URLS: Dict[str, str] = {}
+    # Seconds the organization directory is cached per process
+    ORG_CACHE_SECONDS: float = 60
+    # Fail service calls that exceed their declared query budget (dev/CI)
+    ENFORCE_QUERY_BUDGETS: bool = False
+
+    # Result history: monthly partitions created ahead of time (PostgreSQL),
+    # and months kept in the database before archiving to RESULTS_ARCHIVE_DIR
+    RESULT_PARTITION_MONTHS_AHEAD: int = 3
+    RESULTS_RETENTION_MONTHS: int = 12
+    RESULTS_ARCHIVE_DIR: str = "archive"
+
+    # Response compression (bodies below the threshold are sent uncompressed;
+    # bodies above the buffer size and file downloads are streamed as-is)
+    GZIP_MINIMUM_SIZE: int = 500
+    GZIP_COMPRESSLEVEL: int = 6
+    BROTLI_MINIMUM_SIZE: int = 500
+    BROTLI_QUALITY: int = 4
+    COMPRESSION_MAX_BUFFER_SIZE: int = 1024 * 1024
+
+    # Number of per-quiz question pools kept in memory
+    QUESTION_POOL_CACHE_SIZE: int = 1024
+
+    # Seconds a quiz leaderboard may be served from memory
+    LEADERBOARD_CACHE_SECONDS: float = 5.0
+    # Seconds the sorted player averages behind summary percentiles are cached
+    PERCENTILE_CACHE_SECONDS: float = 60.0
+
+    # Token-bucket limits per route, as "<count>/<second|minute|hour|day>":
+    # per user (per account for login) and per client IP. IP limits are much
+    # higher, since a whole school can share one NAT address
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Dict[str, str] = {
+        "login": "10/minute",
+        "refresh": "60/minute",
+        "submit": "30/minute",
+    }
+    IP_RATE_LIMITS: Dict[str, str] = {
+        "login": "300/minute",
+        "refresh": "1200/minute",
+        "submit": "3000/minute",
+    }
+
+    # Idempotency-Key on submissions: how long replays are answered from the
+    # in-process store (and keys kept in the database), and its size
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_CACHE_SIZE: int = 100_000
+
+    # Database connections per process and shard (pool plus overflow), and
+    # threads sync endpoints run in
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    THREADPOOL_SIZE: int = 40
+
+    # Admission control: concurrent API requests and max queue wait (SLO).
+    # Unset, the concurrency is what the DB pool and threadpool can serve
+    MAX_CONCURRENT_REQUESTS: Optional[int] = None
+    MAX_QUEUE_WAIT_MS: int = 200
+    SHED_RETRY_AFTER_SECONDS: int = 1
+
+    # Development profiler: requests with the X-Profile header (sql|cpu) or
+    # ?_profile= get SQL/CPU reports under /debug/profiles. Never enable in
+    # production: reports contain full SQL
+    PROFILING_ENABLED: bool = False
+    PROFILE_REPEAT_THRESHOLD: int = 3
+    PROFILE_CPU_INTERVAL_MS: float = 1.0
+    PROFILE_HISTORY: int = 100
+
+    # Startup warm-up before /healthz/ready reports ready: question pools of
+    # the most attempted quizzes and pooled DB connections to open. A failed
+    # warm-up is retried, waiting twice as long each time up to the maximum
+    WARMUP_ENABLED: bool = True
+    WARMUP_QUIZ_COUNT: int = 100
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_RETRY_SECONDS: float = 1.0
+    WARMUP_RETRY_MAX_SECONDS: float = 60.0
+
+    # Background jobs (/api/admin/jobs): threads for I/O-bound jobs, processes
+    # for CPU-bound ones, housekeeping interval (heartbeats, picking up jobs
+    # queued by other processes) and where job output files are written
+    JOBS_ENABLED: bool = True
+    JOB_THREAD_WORKERS: int = 2
+    JOB_PROCESS_WORKERS: int = 1
+    JOB_POLL_SECONDS: float = 5.0
+    JOB_OUTPUT_DIR: str = "job_output"
+
+    # Multi-process mode (serve.py): worker count (0 = one per available
+    # core), seconds to drain in-flight requests on reload/shutdown, and a
+    # tmpfs directory for read-only data shared between workers ("" = off)
+    WORKERS: int = 0
+    GRACEFUL_TIMEOUT: int = 30
+    SHARED_CACHE_DIR: str = ""
+    # Size past which the shared search change log is truncated by the next
+    # full index load; workers behind the truncation reload their index
+    SEARCH_CHANGE_LOG_MAX_BYTES: int = 1024 * 1024
+    # Whether this process runs the job runner and loads the shared question
+    # pools on warm-up; serve.py turns it off in every worker but one
+    PRIMARY_WORKER: bool = True
     
     class Config:
         env_file = ".env"
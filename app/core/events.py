@@ -0,0 +1,32 @@
+import logging
+from collections import defaultdict
+from typing import Any, Callable, DefaultDict, List
+
+logger = logging.getLogger(__name__)
+
+# Published after a quiz tree or its metadata is committed:
+# quiz_id=<int>, shard=<database shard name>
+QUIZ_CHANGED = "quiz_changed"
+
+_handlers: DefaultDict[str, List[Callable[..., Any]]] = defaultdict(list)
+
+
+def subscribe(event: str, handler: Callable[..., Any]) -> None:
+    """
+    Register `handler` to be called with the payload of every `event`.
+    """
+    _handlers[event].append(handler)
+
+
+def publish(event: str, **payload: Any) -> None:
+    """
+    Call every handler for `event` synchronously.
+
+    A failing handler is logged and does not stop the others, so one broken
+    cache cannot fail the request that committed the change.
+    """
+    for handler in list(_handlers[event]):
+        try:
+            handler(**payload)
+        except Exception:
+            logger.exception("Handler %r failed for %s", handler, event)
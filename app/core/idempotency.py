@@ -0,0 +1,108 @@
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core import singleflight
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+class IdempotencyBackend(ABC):
+    """
+    Storage for completed responses. Subclass to share them between processes.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        ...
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """
+    Bounded in-process store; entries expire after their TTL or are
+    evicted LRU-first.
+    """
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self._entries = LRUCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+
+_backend: IdempotencyBackend = MemoryIdempotencyBackend(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def set_idempotency_backend(backend: IdempotencyBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def request_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class KeyReused(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+
+
+class KeyResultArchived(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency-Key was already used; its result has been archived",
+        )
+
+
+_flights = singleflight.group("idempotency")
+
+
+def run_idempotent(
+    key: str, fingerprint: str, compute: Callable[[], Tuple[Any, bool]]
+) -> Tuple[Any, bool]:
+    """
+    Run `compute` at most once per key and return (response, replayed).
+
+    A completed response is replayed from the backend. Concurrent requests
+    with the same key wait for the one already running and share its
+    outcome instead of computing it again. `compute` returns its response
+    and whether it found an earlier result itself (e.g. in the database).
+    A key reused with a different request fingerprint is rejected with 422.
+    """
+    stored = _backend.get(key)
+    if stored is not None:
+        if stored["fingerprint"] != fingerprint:
+            raise KeyReused()
+        return stored["response"], True
+
+    def lead() -> Tuple[str, Any, bool]:
+        response, replayed = compute()
+        # Stored before the in-flight call completes, so a late duplicate
+        # always finds one or the other. Failures are not stored: a retry
+        # runs again
+        _backend.set(
+            key,
+            {"fingerprint": fingerprint, "response": response},
+            ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+        )
+        return fingerprint, response, replayed
+
+    (owner_fingerprint, response, replayed), shared = _flights.do(key, lead)
+    if shared:
+        if owner_fingerprint != fingerprint:
+            raise KeyReused()
+        return response, True
+    return response, replayed
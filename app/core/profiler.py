@@ -0,0 +1,271 @@
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.instrumentation import QueryCollector
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Frames from these files are plumbing, never the code issuing a query
+_SKIP_FILES = (
+    os.path.join(PROJECT_ROOT, "app", "db", "instrumentation.py"),
+    os.path.abspath(__file__),
+)
+
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so that executions differing only in parameters,
+    IN-list lengths or inlined numbers compare equal.
+    """
+    shape = _PLACEHOLDER_RE.sub("?", statement)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PLACEHOLDER_LIST_RE.sub("(?)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+def _project_location(frame) -> Optional[str]:
+    filename = frame.f_code.co_filename
+    if filename.startswith("<"):
+        # Generated code, e.g. SQLAlchemy's decorator wrappers
+        return None
+    filename = os.path.abspath(filename)
+    if not filename.startswith(PROJECT_ROOT) or "site-packages" in filename:
+        return None
+    return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def caller_location() -> Optional[str]:
+    """
+    The innermost project frame outside the instrumentation itself.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if os.path.abspath(frame.f_code.co_filename) not in _SKIP_FILES:
+            location = _project_location(frame)
+            if location:
+                return location
+        frame = frame.f_back
+    return None
+
+
+class ProfilingCollector(QueryCollector):
+    """
+    QueryCollector that also records where each statement was issued from.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.callers: List[Optional[str]] = []
+
+    def record(self, statement: str, duration: float) -> None:
+        super().record(statement, duration)
+        self.callers.append(caller_location())
+
+    def repeated(self, threshold: int) -> List[dict]:
+        """
+        Statement shapes executed at least `threshold` times: N+1 suspects.
+        """
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for index, (statement, _) in enumerate(self.statements):
+            groups[statement_shape(statement)].append(index)
+        suspects = []
+        for shape, indexes in groups.items():
+            if len(indexes) < threshold:
+                continue
+            suspects.append({
+                "shape": shape,
+                "count": len(indexes),
+                "total_ms": round(sum(self.statements[i][1] for i in indexes) * 1000, 3),
+                "callers": dict(Counter(self.callers[i] for i in indexes).most_common()),
+            })
+        return sorted(suspects, key=lambda suspect: -suspect["count"])
+
+
+class Sampler:
+    """
+    Statistical CPU profiler: samples the stacks of all other threads every
+    `interval` seconds and counts the project functions on them.
+
+    Intended for one profiled request at a time; concurrent requests on
+    other threads show up in the same profile.
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                seen = set()
+                leaf = None
+                while frame is not None:
+                    location = _project_location(frame)
+                    if location and location not in seen:
+                        leaf = leaf or location
+                        seen.add(location)
+                    frame = frame.f_back
+                if leaf:
+                    self.samples += 1
+                    self.self_counts[leaf] += 1
+                    self.total_counts.update(seen)
+
+    def report(self, top: int = 25) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "functions": [
+                {"location": location, "total": total, "self": self.self_counts[location]}
+                for location, total in self.total_counts.most_common(top)
+            ],
+        }
+
+
+# Most recent profiles, newest last, served by the debug endpoints
+profiles: Deque[dict] = deque(maxlen=settings.PROFILE_HISTORY)
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    for profile in profiles:
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+def _requested_mode(scope: Scope, header: str) -> Optional[str]:
+    value = None
+    header_name = header.lower().encode()
+    for name, raw in scope["headers"]:
+        if name == header_name:
+            value = raw.decode()
+    if value is None:
+        value = QueryParams(scope.get("query_string", b"")).get("_profile")
+    if not value or value.lower() in ("0", "false", "off"):
+        return None
+    return "cpu" if value.lower() == "cpu" else "sql"
+
+
+class ProfilerMiddleware:
+    """
+    Development-only per-request profiler.
+
+    A request carrying the `header` (X-Profile: sql|cpu) or the `_profile`
+    query parameter has all of its SQL captured with timings and call sites,
+    statement shapes repeated `repeat_threshold` times or more flagged as
+    likely N+1s, and, in cpu mode, a sampling CPU profile. A summary is added
+    to the response headers; the full report is kept under X-Profile-Id for
+    GET /debug/profiles/{id}.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        header: str = "X-Profile",
+        repeat_threshold: int = 3,
+        cpu_interval: float = 0.001,
+    ) -> None:
+        self.app = app
+        self.header = header
+        self.repeat_threshold = repeat_threshold
+        self.cpu_interval = cpu_interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        mode = _requested_mode(scope, self.header) if scope["type"] == "http" else None
+        if mode is None or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(6)
+        sampler = Sampler(self.cpu_interval) if mode == "cpu" else None
+        started = time.perf_counter()
+        status_code: Optional[int] = None
+        finished = False
+
+        def finish() -> Tuple[dict, float]:
+            nonlocal finished
+            finished = True
+            duration = time.perf_counter() - started
+            if sampler:
+                sampler.stop()
+            report = self._report(profile_id, scope, status_code, duration, queries, sampler)
+            profiles.append(report)
+            return report, duration
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start" and not finished:
+                status_code = message["status"]
+                report, duration = finish()
+                headers = MutableHeaders(raw=message["headers"])
+                headers["X-Profile-Id"] = profile_id
+                headers["X-Profile-Queries"] = str(report["query_count"])
+                headers["X-Profile-N-Plus-One"] = str(len(report["repeated"]))
+                headers["Server-Timing"] = (
+                    f'db;dur={report["query_ms"]};desc="{report["query_count"]} queries", '
+                    f"total;dur={round(duration * 1000, 3)}"
+                )
+            await send(message)
+
+        with ProfilingCollector() as queries:
+            if sampler:
+                sampler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if not finished:
+                    finish()
+
+    def _report(self, profile_id, scope, status_code, duration, queries, sampler) -> dict:
+        repeated = queries.repeated(self.repeat_threshold)
+        path = scope["path"]
+        for suspect in repeated:
+            logger.warning(
+                "Possible N+1 in %s %s: %d x %s", scope["method"], path,
+                suspect["count"], suspect["shape"][:200],
+            )
+        return {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": path,
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "query_count": queries.count,
+            "query_ms": round(queries.total_time * 1000, 3),
+            "repeated": repeated,
+            "queries": [
+                {"sql": statement, "ms": round(seconds * 1000, 3), "caller": caller}
+                for (statement, seconds), caller in zip(queries.statements, queries.callers)
+            ],
+            "cpu": sampler.report() if sampler else None,
+        }
@@ -0,0 +1,181 @@
+import asyncio
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.models.user import User
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(limit: str) -> Tuple[float, int]:
+    """
+    Parse "10/minute" into (tokens per second, bucket capacity).
+    """
+    count, _, period = limit.partition("/")
+    capacity = int(count)
+    return capacity / PERIODS[period.strip().rstrip("s")], capacity
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for token buckets. Subclass to share state between processes.
+    """
+
+    @abstractmethod
+    def hit(self, key: str, rate: float, capacity: int) -> float:
+        """
+        Take one token from `key`'s bucket.
+
+        Returns 0 when the request is allowed, otherwise the number of
+        seconds until a token becomes available.
+        """
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    In-process token buckets; idle buckets are evicted LRU-first.
+    """
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, rate: float, capacity: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets.set(key, (tokens - 1, now))
+                return 0.0
+            self._buckets.set(key, (tokens, now))
+            return (1 - tokens) / rate
+
+
+_backend: RateLimitBackend = MemoryRateLimitBackend()
+
+
+def set_rate_limit_backend(backend: RateLimitBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def check_rate_limit(route: str, key: str, limits: Optional[Dict[str, str]] = None) -> None:
+    """
+    Raise 429 if `key` has exhausted the bucket configured for `route` in
+    `limits` (RATE_LIMITS by default).
+    """
+    limits = settings.RATE_LIMITS if limits is None else limits
+    limit = limits.get(route)
+    if not settings.RATE_LIMIT_ENABLED or not limit:
+        return
+    rate, capacity = parse_limit(limit)
+    retry_after = _backend.hit(f"{route}:{key}", rate, capacity)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def check_ip_rate_limit(route: str, request: Request) -> None:
+    check_rate_limit(route, f"ip:{client_ip(request)}", settings.IP_RATE_LIMITS)
+
+
+def limit_by_ip(route: str):
+    """
+    Dependency limiting `route` per client IP (IP_RATE_LIMITS).
+    """
+    def dependency(request: Request) -> None:
+        check_ip_rate_limit(route, request)
+    return dependency
+
+
+def limit_by_user(route: str):
+    """
+    Dependency limiting `route` per authenticated user (RATE_LIMITS) and
+    per client IP (IP_RATE_LIMITS).
+    """
+    def dependency(
+        request: Request, current_user: User = Depends(get_current_user)
+    ) -> None:
+        # IP first: a request the shared IP limit rejects must not use up
+        # the user's own quota
+        check_ip_rate_limit(route, request)
+        check_rate_limit(route, f"user:{current_user.org_id}:{current_user.id}")
+    return dependency
+
+
+def default_max_concurrency() -> int:
+    """
+    API requests that can actually run at once: each sync endpoint needs a
+    threadpool thread and a database connection, so more admitted requests
+    would only queue there, where admission control cannot see the wait.
+    """
+    return max(1, min(settings.THREADPOOL_SIZE, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW))
+
+
+class AdmissionControlMiddleware:
+    """
+    Global concurrency limit with load shedding.
+
+    At most `max_concurrency` API requests run at once; a request that cannot
+    get a slot within `max_queue_wait` seconds is rejected with 503 and a
+    Retry-After header instead of queueing behind a saturated DB pool.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_concurrency: int = 64,
+        max_queue_wait: float = 0.2,
+        retry_after: int = 1,
+        path_prefix: str = "/api",
+    ) -> None:
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = retry_after
+        self.path_prefix = path_prefix
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats: Dict[str, int] = {"admitted": 0, "shed": 0}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self.stats["shed"] += 1
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.stats["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,40 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+# orjson is optional - fall back to the standard JSON response without it
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson (falls back to the stdlib encoder).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def adapter_response(
+    adapter: TypeAdapter, obj: Any, status_code: int = 200
+) -> Response:
+    """
+    Serialize ORM objects through a precompiled TypeAdapter straight to bytes.
+
+    The object is validated once from attributes and dumped by pydantic-core,
+    so FastAPI does not re-validate it against the response_model and run
+    jsonable_encoder over the result.
+    """
+    validated = adapter.validate_python(obj, from_attributes=True)
+    return Response(
+        content=adapter.dump_json(validated),
+        status_code=status_code,
+        media_type="application/json",
+    )
@@ -0,0 +1,91 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, false
+    positives at roughly `error_rate` once `capacity` items are added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """
+    Ids (token families) whose access tokens must be rejected before they
+    expire. Membership is checked on every authenticated request: the Bloom
+    filter answers the common "not revoked" case, the exact set confirms
+    its positives. Entries are dropped once every token they cover has
+    expired, and the filter is rebuilt from the survivors.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._expires: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+
+    def add(self, item: str, ttl: float) -> None:
+        """
+        Revoke `item` for `ttl` seconds (the longest any covered token lives).
+        """
+        with self._lock:
+            self._expires[item] = max(self._expires.get(item, 0), time.time() + ttl)
+            if len(self._expires) > self.capacity:
+                self._rebuild()
+            else:
+                self._bloom.add(item)
+
+    def __contains__(self, item: Optional[str]) -> bool:
+        if not item or item not in self._bloom:
+            return False
+        expires_at = self._expires.get(item)
+        return expires_at is not None and expires_at > time.time()
+
+    def prune(self) -> int:
+        """
+        Forget expired entries; returns how many are left.
+        """
+        with self._lock:
+            self._rebuild()
+            return len(self._expires)
+
+    def _rebuild(self) -> None:
+        now = time.time()
+        self._expires = {item: at for item, at in self._expires.items() if at > now}
+        # Grow rather than let the false-positive rate degrade
+        while len(self._expires) > self.capacity:
+            self.capacity *= 2
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for item in self._expires:
+            bloom.add(item)
+        self._bloom = bloom
+
+    def __len__(self) -> int:
+        return len(self._expires)
@@ -8,12 +8,18 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.revocation import RevocationList
 from app.db.session import get_db
+from app.models.organization import DEFAULT_ORG_ID
 from app.models.user import User
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Sessions (refresh token families) revoked by logout or token reuse; their
+# access tokens carry the family as "sid" and are rejected until they expire
+revoked_sessions = RevocationList(settings.REVOCATION_CAPACITY)
+
 # OAuth2 scheme setup - Make sure this URL matches what's in the frontend and router
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/users/token")
 
@@ -64,6 +70,9 @@ def get_current_user(
         user_id: str = payload.get("sub")  # Get 'sub' from payload
         if user_id is None:
             raise credentials_exception
+        # In-memory check: no query for the overwhelmingly common case
+        if payload.get("sid") in revoked_sessions:
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
     
@@ -85,4 +94,17 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
\ No newline at end of file
+    return user
+
+
+def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """
+    Get current user, who must be a platform admin (an admin of the
+    default organization)
+    """
+    if not current_user.is_admin or current_user.org_id != DEFAULT_ORG_ID:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return current_user
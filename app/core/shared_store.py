@@ -0,0 +1,337 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+from collections.abc import Sequence
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+# orjson is optional - fall back to the standard JSON encoder without it
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is None:
+        return json.dumps(value, separators=(",", ":")).encode()
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _loads(data: memoryview) -> Any:
+    if orjson is None:
+        return json.loads(bytes(data))
+    return orjson.loads(data)
+
+
+# Record files: header length and record count, the JSON header, count + 1
+# record offsets (relative to the first record), then the records
+_PREFIX = struct.Struct("<QQ")
+_OFFSET = struct.Struct("<Q")
+# Mappings held open by MappedRecords need no file descriptor of their own
+_MMAP_OPTIONS = {"trackfd": False} if sys.version_info >= (3, 13) else {}
+# Before 3.13 every mapping keeps a duplicate descriptor open for as long as
+# it lives, and record entries live in caches of up to a thousand pools. So
+# entries smaller than MMAP_MIN_SIZE, and any beyond MAX_MAPPED_ENTRIES
+# mappings held at once, are read into memory instead
+MAPPING_HOLDS_FD = not _MMAP_OPTIONS
+MMAP_MIN_SIZE = 64 * 1024
+MAX_MAPPED_ENTRIES = 128
+
+_mapped_entries = 0
+_mapped_lock = threading.Lock()
+
+
+def _reserve_mapping(size: int) -> bool:
+    global _mapped_entries
+    if not MAPPING_HOLDS_FD:
+        return True
+    if size < MMAP_MIN_SIZE:
+        return False
+    with _mapped_lock:
+        if _mapped_entries >= MAX_MAPPED_ENTRIES:
+            return False
+        _mapped_entries += 1
+        return True
+
+
+def _release_mapping() -> None:
+    global _mapped_entries
+    with _mapped_lock:
+        _mapped_entries -= 1
+
+
+class MappedRecords(Sequence):
+    """
+    The records of one shared entry, decoded from the mapping one at a
+    time on access. Nothing but the header is parsed up front, so every
+    worker reads the same page-cache pages instead of its own copy (unless
+    the entry was read into `bytes`; see MAX_MAPPED_ENTRIES).
+    """
+
+    def __init__(self, mapped: Union[mmap.mmap, bytes]) -> None:
+        header_length, self._count = _PREFIX.unpack_from(mapped, 0)
+        self._offsets = _PREFIX.size + header_length
+        self._records = self._offsets + (self._count + 1) * _OFFSET.size
+        if self._records > len(mapped):
+            raise ValueError("truncated record file")
+        self._mapped = mapped
+        self.header = _loads(mapped[_PREFIX.size:self._offsets])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start, end = struct.unpack_from(
+            "<QQ", self._mapped, self._offsets + index * _OFFSET.size
+        )
+        return _loads(self._mapped[self._records + start:self._records + end])
+
+
+class LogTruncated(Exception):
+    """
+    Records after a reader's log offset were dropped by `truncate_log`.
+    """
+
+
+# A truncated log starts with "#<offset>\n": the offset its first record
+# is at. Records are JSON, so they never start with "#"
+_LOG_HEADER_SIZE = 32
+
+
+def _log_header(fd: int) -> Tuple[int, int]:
+    # (offset of the log's first record, length of the header line)
+    head = os.pread(fd, _LOG_HEADER_SIZE, 0)
+    if not head.startswith(b"#"):
+        return 0, 0
+    end = head.index(b"\n")
+    return int(head[1:end]), end + 1
+
+
+def _replaced(fd: int, path: str) -> bool:
+    # Whether `path` no longer names the file open as `fd` (truncated or deleted)
+    try:
+        return os.fstat(fd).st_ino != os.stat(path).st_ino
+    except FileNotFoundError:
+        return True
+
+
+class SharedStore:
+    """
+    Read-only values shared between worker processes through files in a
+    (preferably tmpfs) directory.
+
+    Each entry is written once, atomically, and read through mmap, so all
+    workers on a host map the same page-cache pages and a value built by
+    one worker is available to the others without touching the database.
+    Entries carry a version; a reader asking for a different version gets
+    a miss and rebuilds.
+
+    `get`/`put` store a single JSON value. `get_records`/`put_records`
+    store a list of records behind an offset table, for values that are
+    read one record at a time and should never be parsed whole.
+    `append`/`read_log` keep an append-only log that every worker reads
+    from its own offset, for broadcasting changes; `truncate_log` drops
+    its records once every reader can rebuild without them.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, namespace: str, key: Any, suffix: str = "json") -> str:
+        return os.path.join(self.directory, f"{namespace}-{key}.{suffix}")
+
+    def _write(self, path: str, chunks: Iterable[bytes]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, namespace: str, key: Any, version: str) -> Optional[Any]:
+        try:
+            with open(self._path(namespace, key), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as data:
+                        entry = _loads(data)
+        except (FileNotFoundError, ValueError):
+            # Missing, or empty/truncated by a crashed writer
+            return None
+        if entry.get("version") != version:
+            return None
+        return entry["value"]
+
+    def put(self, namespace: str, key: Any, version: str, value: Any) -> None:
+        self._write(
+            self._path(namespace, key), [_dumps({"version": version, "value": value})]
+        )
+
+    def get_records(
+        self, namespace: str, key: Any, version: str
+    ) -> Optional[MappedRecords]:
+        """
+        Map a record entry. The mapping stays valid after the entry is
+        replaced or deleted; it is released with the returned object.
+        Entries that would cost a file descriptor to keep mapped are read
+        into memory instead.
+        """
+        try:
+            with open(self._path(namespace, key, "rec"), "rb") as f:
+                if _reserve_mapping(os.fstat(f.fileno()).st_size):
+                    try:
+                        mapped = mmap.mmap(
+                            f.fileno(), 0, access=mmap.ACCESS_READ, **_MMAP_OPTIONS
+                        )
+                    except BaseException:
+                        if MAPPING_HOLDS_FD:
+                            _release_mapping()
+                        raise
+                    if MAPPING_HOLDS_FD:
+                        weakref.finalize(mapped, _release_mapping)
+                else:
+                    mapped = f.read()
+            records = MappedRecords(mapped)
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        if records.header.get("version") != version:
+            return None
+        return records
+
+    def put_records(
+        self, namespace: str, key: Any, version: str, header: dict, records: Iterable[Any]
+    ) -> None:
+        """
+        Store `records` under `key`. `header` (which must not use the
+        "version" key) is parsed on every read, so keep it small.
+        """
+        header = _dumps({**header, "version": version})
+        encoded = [_dumps(record) for record in records]
+        offsets = [0]
+        for record in encoded:
+            offsets.append(offsets[-1] + len(record))
+        self._write(self._path(namespace, key, "rec"), [
+            _PREFIX.pack(len(header), len(encoded)),
+            header,
+            b"".join(_OFFSET.pack(offset) for offset in offsets),
+            *encoded,
+        ])
+
+    def append(self, namespace: str, key: Any, record: Any) -> int:
+        """
+        Append one record to a log and return the size of the log file.
+        Each record is a single O_APPEND write, so records from concurrent
+        writers never interleave; the shared lock keeps it from landing in
+        a log `truncate_log` is replacing.
+        """
+        path = self._path(namespace, key, "log")
+        line = _dumps(record) + b"\n"
+        while True:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                if not _replaced(fd, path):
+                    os.write(fd, line)
+                    return os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+    def read_log(self, namespace: str, key: Any, offset: int = 0) -> Tuple[List[Any], int]:
+        """
+        Records appended to a log after `offset`, and the offset to read
+        from next time. Raises LogTruncated if records after `offset` were
+        dropped by `truncate_log`.
+        """
+        path = self._path(namespace, key, "log")
+        try:
+            with open(path, "rb") as f:
+                base, header = _log_header(f.fileno())
+                if offset < base:
+                    raise LogTruncated(f"{path} was truncated at {base}, past offset {offset}")
+                start = header + offset - base
+                if os.fstat(f.fileno()).st_size <= start:
+                    return [], offset
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # A record still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        return [_loads(line) for line in data[:end].splitlines()], offset + end
+
+    def log_size(self, namespace: str, key: Any) -> int:
+        """
+        Offset of the end of a log: reading from it returns only records
+        appended later.
+        """
+        try:
+            with open(self._path(namespace, key, "log"), "rb") as f:
+                base, header = _log_header(f.fileno())
+                return base + os.fstat(f.fileno()).st_size - header
+        except FileNotFoundError:
+            return 0
+
+    def truncate_log(self, namespace: str, key: Any, max_bytes: int = 0) -> int:
+        """
+        Drop the records of a log once they take more than `max_bytes`, and
+        return the offset of its end. Offsets carry on from there, so a
+        reader behind the truncation gets LogTruncated rather than missing
+        records silently; it has to rebuild from the source instead.
+        """
+        path = self._path(namespace, key, "log")
+        while True:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                return 0
+            try:
+                # Waits for appends in progress; later ones see the new file
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if _replaced(fd, path):
+                    continue
+                base, header = _log_header(fd)
+                size = os.fstat(fd).st_size - header
+                if size > max_bytes:
+                    self._write(path, [b"#%d\n" % (base + size)])
+                return base + size
+            finally:
+                os.close(fd)
+
+    def delete(self, namespace: str, key: Any) -> None:
+        for suffix in ("json", "rec", "log"):
+            try:
+                os.unlink(self._path(namespace, key, suffix))
+            except FileNotFoundError:
+                pass
+
+
+_store: Optional[SharedStore] = None
+
+
+def get_shared_store() -> Optional[SharedStore]:
+    """
+    The process-wide store, or None when SHARED_CACHE_DIR is not set
+    (single-process mode).
+    """
+    global _store
+    if _store is None:
+        from app.core.config import settings
+
+        if settings.SHARED_CACHE_DIR:
+            _store = SharedStore(settings.SHARED_CACHE_DIR)
+    return _store
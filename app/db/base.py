@@ -1,5 +1,7 @@
 # Import all the models, so that Base has them before being
 # imported by Alembic
 from app.db.base_class import Base  # noqa
-from app.models.user import User  # noqa
-from app.models.quiz import Quiz, Question, Answer, UserQuizResult  # noqa
\ No newline at end of file
+from app.models.organization import Organization  # noqa
+from app.models.user import User, RefreshToken  # noqa
+from app.models.quiz import Quiz, Question, Answer, UserQuizResult, SubmissionKey, UserQuizStats, UserProgress  # noqa
+from app.models.job import Job  # noqa
@@ -0,0 +1,44 @@
+import math
+from typing import List, Sequence
+
+from sqlalchemy import Row, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.compiler import InsertmanyvaluesSentinelOpts
+
+
+def _ordered_returning(db: Session) -> bool:
+    # Backends with insertmanyvalues sentinels (PostgreSQL) batch ordered
+    # INSERT ... RETURNING; SQLAlchemy runs it row by row elsewhere
+    dialect = db.get_bind().dialect
+    sentinel = dialect.insertmanyvalues_implicit_sentinel
+    return bool(
+        dialect.use_insertmanyvalues and sentinel & InsertmanyvaluesSentinelOpts.ANY_AUTOINCREMENT
+    )
+
+
+def insert_returning(db: Session, model: type, rows: Sequence[dict], *returning) -> List[Row]:
+    """
+    INSERT many `rows` into `model`'s table and return `returning` (the
+    entities if empty) for each, in the order of `rows`.
+
+    One statement per insertmanyvalues page on PostgreSQL and SQLite.
+    SQLite has no insert sentinels, so the rows come back unordered; a
+    multi-row INSERT assigns it ascending ids in VALUES order, so sorting
+    on the id restores the order.
+    """
+    returning = returning or (model,)
+    if _ordered_returning(db):
+        return db.execute(
+            insert(model).returning(*returning, sort_by_parameter_order=True), rows
+        ).all()
+    result = db.execute(insert(model).returning(model.id, *returning), rows).all()
+    return [row[1:] for row in sorted(result, key=lambda row: row[0])]
+
+
+def returning_insert_cost(db: Session, rows: int) -> int:
+    """
+    Statements needed to insert `rows` rows with insert_returning() or an
+    executemany INSERT: one per insertmanyvalues page (1000 rows by
+    default), whatever the row count below that.
+    """
+    return math.ceil(rows / db.get_bind().dialect.insertmanyvalues_page_size)
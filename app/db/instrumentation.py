@@ -0,0 +1,97 @@
+import functools
+import time
+from contextvars import ContextVar
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+# Collectors active in the current context; every cursor execute is recorded
+# into each of them
+_collectors: ContextVar[Tuple["QueryCollector", ...]] = ContextVar(
+    "query_collectors", default=()
+)
+
+
+class QueryCollector:
+    """
+    Records SQL statements executed while it is active.
+
+    Usage:
+        with QueryCollector() as queries:
+            ...
+        print(queries.count)
+    """
+
+    def __init__(self) -> None:
+        # (statement, duration in seconds)
+        self.statements: List[Tuple[str, float]] = []
+        self._token = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements.append((statement, duration))
+
+    def __enter__(self) -> "QueryCollector":
+        self._token = _collectors.set(_collectors.get() + (self,))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _collectors.reset(self._token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _collectors.get():
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _collectors.get()
+    if not collectors:
+        return
+    started = conn.info["query_start_time"].pop()
+    duration = time.perf_counter() - started
+    for collector in collectors:
+        collector.record(statement, duration)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(budget: Union[int, Callable[..., int]]):
+    """
+    Declare the maximum number of SQL statements a service function may issue.
+
+    `budget` is either a fixed number or a callable receiving the function's
+    arguments. Budgets are checked only when ENFORCE_QUERY_BUDGETS is set, so
+    development and CI catch N+1 regressions without production overhead.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.ENFORCE_QUERY_BUDGETS:
+                return fn(*args, **kwargs)
+            limit = budget(*args, **kwargs) if callable(budget) else budget
+            with QueryCollector() as queries:
+                result = fn(*args, **kwargs)
+            if queries.count > limit:
+                raise QueryBudgetExceeded(
+                    f"{fn.__qualname__} issued {queries.count} queries, "
+                    f"budget is {limit}"
+                )
+            return result
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from typing import Iterator, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# user_quiz_results is range-partitioned by month on completed_at (PostgreSQL)
+RESULTS_TABLE = "user_quiz_results"
+
+
+def month_start(value: Union[date, datetime]) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """
+    Yield the first day of every month from `start` up to and including `end`.
+    """
+    current = month_start(start)
+    while current <= end:
+        yield current
+        current = add_months(current, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{RESULTS_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name"
+        ),
+        {"name": RESULTS_TABLE},
+    ).scalar())
+
+
+def create_month_partition(conn: Connection, month: date) -> str:
+    """
+    Create the partition holding `month` if it does not exist yet.
+    """
+    name = partition_name(month)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {RESULTS_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{add_months(month, 1).isoformat()}')"
+    ))
+    return name
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = 3) -> List[str]:
+    """
+    Make sure partitions exist from the current month to `months_ahead`
+    months from now. Does nothing unless the table is partitioned.
+    """
+    if not is_partitioned(conn):
+        return []
+    this_month = month_start(date.today())
+    return [
+        create_month_partition(conn, month)
+        for month in iter_months(this_month, add_months(this_month, months_ahead))
+    ]
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    """
+    Monthly partitions of the results table as (name, month), oldest first.
+    """
+    if not is_partitioned(conn):
+        return []
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ),
+        {"name": RESULTS_TABLE},
+    ).scalars()
+    partitions = []
+    prefix = f"{RESULTS_TABLE}_y"
+    for name in rows:
+        if name.startswith(prefix):
+            year, month = name[len(prefix):].split("m")
+            partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def drop_partition(conn: Connection, name: str) -> None:
+    """
+    Detach and drop one monthly partition.
+    """
+    conn.execute(text(f"ALTER TABLE {RESULTS_TABLE} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
@@ -0,0 +1,31 @@
+from functools import lru_cache
+from typing import Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect, select
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+
+@lru_cache(maxsize=None)
+def projected_columns(schema: Type[BaseModel], model: type) -> Tuple[InstrumentedAttribute, ...]:
+    """
+    The columns of `model` a response schema needs: those named by its
+    fields, in field order. Relationship and computed fields are skipped,
+    so a schema declares its projection just by listing its fields.
+    """
+    mapped = inspect(model).column_attrs
+    return tuple(
+        getattr(model, name) for name in schema.model_fields if name in mapped
+    )
+
+
+def select_for(schema: Type[BaseModel], model: type, *extra):
+    """
+    Core select() of just the schema's columns (plus `extra` expressions).
+
+    The rows come back as plain tuples with attribute access, bypassing
+    the identity map, and validate straight into `schema` (e.g. through
+    adapter_response).
+    """
+    return select(*projected_columns(schema, model), *extra)
+
@@ -1,14 +1,67 @@
+from typing import Dict, Optional
+
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DEFAULT_SHARD = "default"
+
+
+def _create_engine(url: str) -> Engine:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite has a single-connection pool
+        return create_engine(url)
+    return create_engine(
+        url, pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW
+    )
+
+
+engine = _create_engine(settings.DATABASE_URL)
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, info={"shard": DEFAULT_SHARD}
+)
+
+# Tenant databases by shard name; organizations are assigned to one each
+engines: Dict[str, Engine] = {DEFAULT_SHARD: engine}
+session_factories: Dict[str, sessionmaker] = {DEFAULT_SHARD: SessionLocal}
+for _name, _url in settings.SHARD_DATABASE_URLS.items():
+    if _name != DEFAULT_SHARD:
+        engines[_name] = _create_engine(_url)
+        session_factories[_name] = sessionmaker(
+            autocommit=False, autoflush=False, bind=engines[_name], info={"shard": _name}
+        )
+
+
+def shard_session(shard: str, org_id: Optional[int] = None) -> Session:
+    """
+    A session on `shard`; bound to the organization `org_id` if given, so
+    that it only sees that organization's rows.
+    """
+    try:
+        factory = session_factories[shard]
+    except KeyError:
+        raise RuntimeError(f"Unknown database shard {shard!r}") from None
+    return factory(info={"org_id": org_id} if org_id is not None else {})
+
+
+def shard_of(db: Session) -> str:
+    return db.info.get("shard", DEFAULT_SHARD)
+
+
+def get_db(request: Request):
+    """
+    Session on the database of the request's organization, scoped to it.
+    """
+    # Imported here: tenancy needs the engines defined above
+    from app.db.tenancy import resolve_org
 
-def get_db():
-    db = SessionLocal()
+    org = resolve_org(request)
+    db = shard_session(org.shard, org.id)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, ORMExecuteState, with_loader_criteria
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import DEFAULT_SHARD, SessionLocal, engines, shard_session
+from app.models.organization import DEFAULT_ORG_ID, Organization, TenantScoped
+
+T = TypeVar("T")
+
+ORG_HEADER = "X-Organization"
+
+
+class Tenant(NamedTuple):
+    id: int
+    slug: str
+    shard: str
+
+
+DEFAULT_TENANT = Tenant(DEFAULT_ORG_ID, "default", DEFAULT_SHARD)
+
+# ("id", 3) / ("slug", "springfield-high") -> Tenant
+_directory = LRUCache(maxsize=10_000, ttl=settings.ORG_CACHE_SECONDS)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_org(state: ORMExecuteState) -> None:
+    """
+    Restrict every ORM SELECT, UPDATE and DELETE of a tenant-bound session
+    to the rows of its organization.
+    """
+    org_id = state.session.info.get("org_id")
+    if org_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(
+            with_loader_criteria(
+                TenantScoped, lambda cls: cls.org_id == org_id, include_aliases=True
+            )
+        )
+
+
+def org_id_of(db: Session) -> int:
+    """
+    Organization of new rows written through `db`.
+    """
+    return db.info.get("org_id") or DEFAULT_ORG_ID
+
+
+def _lookup(column, value) -> Optional[Tenant]:
+    key = (column.key, value)
+    tenant = _directory.get(key)
+    if tenant is None:
+        with SessionLocal() as db:
+            row = db.execute(
+                select(Organization.id, Organization.slug, Organization.shard).where(column == value)
+            ).first()
+        if row is None:
+            return None
+        tenant = Tenant(*row)
+        _directory.set(key, tenant)
+    return tenant
+
+
+def get_tenant(org_id: int) -> Optional[Tenant]:
+    return _lookup(Organization.id, org_id)
+
+
+def get_tenant_by_slug(slug: str) -> Optional[Tenant]:
+    return _lookup(Organization.slug, slug)
+
+
+def forget_tenant(tenant: Tenant) -> None:
+    _directory.pop(("id", tenant.id))
+    _directory.pop(("slug", tenant.slug))
+
+
+def resolve_org(request: Request) -> Tenant:
+    """
+    The organization a request belongs to: the "org" claim of its bearer
+    token, else the X-Organization header (a slug, used to register and
+    log in), else the default organization.
+
+    The token is only read here to pick the database; get_current_user
+    still authenticates it and loads the user from that database.
+    """
+    tenant = None
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(
+                authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+        except JWTError:
+            payload = {}
+        if payload.get("org") is not None:
+            tenant = get_tenant(int(payload["org"]))
+            if tenant is None:
+                raise HTTPException(status_code=401, detail="Unknown organization")
+    if tenant is None:
+        slug = request.headers.get(ORG_HEADER)
+        if slug:
+            tenant = get_tenant_by_slug(slug)
+            if tenant is None:
+                raise HTTPException(status_code=404, detail="Organization not found")
+    tenant = tenant or DEFAULT_TENANT
+    request.state.org = tenant
+    return tenant
+
+
+def refresh_token_tenant(request: Request, refresh_token: str) -> Tenant:
+    """
+    The organization a refresh token was issued in, from its "<org_id>."
+    prefix. Tokens issued before organizations fall back to resolve_org().
+    """
+    prefix, dot, _ = refresh_token.partition(".")
+    if not dot or not prefix.isdigit():
+        return resolve_org(request)
+    tenant = get_tenant(int(prefix))
+    if tenant is None:
+        raise HTTPException(
+            status_code=401, detail="Invalid refresh token", headers={"WWW-Authenticate": "Bearer"}
+        )
+    request.state.org = tenant
+    return tenant
+
+
+def map_shards(fn: Callable[[Session], T]) -> Dict[str, T]:
+    """
+    Run `fn` with an unscoped session on every shard, in parallel, and
+    return its results by shard name. Meant for cross-tenant admin queries.
+    """
+    def run(shard: str) -> T:
+        with shard_session(shard) as db:
+            return fn(db)
+
+    with ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="shard") as pool:
+        futures = {shard: pool.submit(run, shard) for shard in engines}
+        return {shard: future.result() for shard, future in futures.items()}
+
+
+def init_databases() -> None:
+    """
+    Create missing tables on every shard and the default organization.
+    """
+    for shard_engine in engines.values():
+        Base.metadata.create_all(bind=shard_engine)
+    with SessionLocal() as db:
+        if db.get(Organization, DEFAULT_ORG_ID) is None:
+            db.add(Organization(id=DEFAULT_ORG_ID, slug="default", name="Default", shard=DEFAULT_SHARD))
+            db.commit()
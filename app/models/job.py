@@ -0,0 +1,36 @@
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class Job(Base):
+    """
+    A background job run by app.services.jobs. The row is the source of
+    truth: workers claim queued jobs with a conditional UPDATE, so any
+    number of processes can share the table.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(64), nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    # Higher runs first
+    priority = Column(Integer, nullable=False, default=0)
+    # queued, running, succeeded, failed or cancelled
+    status = Column(String(16), nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String(255))
+    result = Column(JSON)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    # Refreshed while running; a stale heartbeat means the worker died
+    heartbeat_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_jobs_status_priority", "status", "priority"),
+    )
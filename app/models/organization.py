@@ -0,0 +1,32 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+# Organization of every row created before tenants existed
+DEFAULT_ORG_ID = 1
+
+
+class Organization(Base):
+    """
+    A tenant (school). The directory lives in the default shard; `shard`
+    names the database holding the organization's users, quizzes and
+    results (a key of SHARD_DATABASE_URLS, or "default").
+    """
+    __tablename__ = "organizations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(64), unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    shard = Column(String(64), nullable=False, default="default")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class TenantScoped:
+    """
+    Mixin for tables partitioned by organization. Tenant-bound sessions
+    only see and change rows of their organization (see app.db.tenancy).
+
+    No foreign key: the organizations table may live in another database.
+    """
+    org_id = Column(Integer, nullable=False, default=DEFAULT_ORG_ID, server_default=str(DEFAULT_ORG_ID), index=True)
@@ -1,11 +1,28 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Boolean, Column, Date, Float, Integer, String, ForeignKey, DateTime, Text, Index, literal_column
+from sqlalchemy.dialects import postgresql  # noqa: F401 - registers to_tsvector()
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.db.base_class import Base
+from app.models.organization import TenantScoped
 
 
-class Quiz(Base):
+def search_vector(*columns):
+    """
+    to_tsvector() over the given text columns.
+
+    Used both for the GIN index definitions and in search queries: the
+    expressions must render identically for PostgreSQL to use the index.
+    """
+    document = func.coalesce(columns[0], literal_column("''"))
+    for column in columns[1:]:
+        document = document.op("||")(literal_column("' '")).op("||")(
+            func.coalesce(column, literal_column("''"))
+        )
+    return func.to_tsvector(literal_column("'english'"), document)
+
+
+class Quiz(TenantScoped, Base):
     __tablename__ = "quizzes"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -15,10 +32,28 @@ class Quiz(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_active = Column(Boolean, default=True)
+    # How questions are delivered to players: fixed, shuffled, sampled or adaptive
+    delivery_mode = Column(String, default="fixed", nullable=False)
+    # Questions drawn per paper in sampled/adaptive mode (all when unset)
+    sample_size = Column(Integer, nullable=True)
+
+    # Full-text search (PostgreSQL only)
+    __table_args__ = (
+        Index(
+            "ix_quizzes_fts",
+            search_vector(title, description),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     # Relationships
     creator = relationship("User")
-    questions = relationship("Question", back_populates="quiz", cascade="all, delete-orphan")
+    questions = relationship(
+        "Question",
+        back_populates="quiz",
+        cascade="all, delete-orphan",
+        order_by=lambda: (Question.order, Question.id),
+    )
     results = relationship("UserQuizResult", back_populates="quiz")
 
 
@@ -29,6 +64,16 @@ class Question(Base):
     quiz_id = Column(Integer, ForeignKey("quizzes.id"))
     text = Column(Text)
     order = Column(Integer, default=0)
+    # 1 (easiest) to 5 (hardest), used by adaptive delivery
+    difficulty = Column(Integer, default=1)
+
+    __table_args__ = (
+        Index(
+            "ix_questions_fts",
+            search_vector(text),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
     
     # Relationships
     quiz = relationship("Quiz", back_populates="questions")
@@ -47,15 +92,74 @@ class Answer(Base):
     question = relationship("Question", back_populates="answers")
 
 
-class UserQuizResult(Base):
+class UserQuizResult(TenantScoped, Base):
     __tablename__ = "user_quiz_results"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     quiz_id = Column(Integer, ForeignKey("quizzes.id"))
     score = Column(Integer)
-    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # On PostgreSQL the table is range-partitioned by month on completed_at
+    # (see alembic/versions/partition_user_quiz_results.py); date-filtered
+    # queries should always constrain completed_at so partitions are pruned
+    __table_args__ = (
+        Index("ix_user_quiz_results_user_completed", "user_id", "completed_at"),
+        Index("ix_user_quiz_results_quiz_completed", "quiz_id", "completed_at"),
+    )
     
     # Relationships
     user = relationship("User")
-    quiz = relationship("Quiz", back_populates="results")
\ No newline at end of file
+    quiz = relationship("Quiz", back_populates="results")
+
+
+class SubmissionKey(Base):
+    """
+    Idempotency-Key of a submission, committed with its result so a retry
+    is answered with the original result instead of a second row.
+
+    Kept outside user_quiz_results because unique constraints on a
+    partitioned table must include the partition key.
+    """
+    __tablename__ = "submission_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of the request body, to reject a key reused for another request
+    request_hash = Column(String(64), nullable=False)
+    result_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+# Rollups of user_quiz_results, updated in the submit transaction so
+# dashboards never aggregate the raw results table
+class UserQuizStats(Base):
+    __tablename__ = "user_quiz_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    total_score = Column(Integer, nullable=False, default=0)
+    best_score = Column(Integer, nullable=False, default=0)
+    last_score = Column(Integer, nullable=False, default=0)
+    last_completed_at = Column(DateTime(timezone=True))
+
+    # Leaderboards read the top best scores of one quiz
+    __table_args__ = (
+        Index("ix_user_quiz_stats_quiz_best", "quiz_id", "best_score"),
+    )
+
+
+class UserProgress(Base):
+    __tablename__ = "user_progress"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    total_score = Column(Integer, nullable=False, default=0)
+    # Indexed so a player's percentile is a range count
+    average_score = Column(Float, nullable=False, default=0.0, index=True)
+    # Consecutive UTC days with at least one submission
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_active_on = Column(Date)
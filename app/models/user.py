@@ -1,21 +1,49 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.db.base_class import Base
+from app.models.organization import TenantScoped
 
 
-class User(Base):
+class User(TenantScoped, Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, nullable=False)
+    username = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Usernames and emails are unique within an organization
+    __table_args__ = (
+        Index("ux_users_org_username", "org_id", "username", unique=True),
+        Index("ux_users_org_email", "org_id", "email", unique=True),
+    )
     
     # Relationships
     quizzes = relationship("Quiz", primaryjoin="User.id == Quiz.created_by")
-    quiz_results = relationship("UserQuizResult", back_populates="user")
\ No newline at end of file
+    quiz_results = relationship("UserQuizResult", back_populates="user")
+
+
+class RefreshToken(Base):
+    """
+    One refresh token of a login session ("family"). Each refresh rotates
+    the token: the presented one is marked used and a new one issued in the
+    same family. Presenting a used token again means it leaked, and the
+    whole family is revoked.
+
+    Only the sha256 of the token is stored.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    used_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True), index=True)
@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobCreate(BaseModel):
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    # Defaults to the priority of the job kind; higher runs first
+    priority: Optional[int] = None
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    params: Dict[str, Any]
+    priority: int
+    status: str
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class OrganizationCreate(BaseModel):
+    slug: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-z0-9][a-z0-9-]*$")
+    name: str
+    # Database the organization's data lives in (a SHARD_DATABASE_URLS key)
+    shard: str = "default"
+
+
+class Organization(BaseModel):
+    id: int
+    slug: str
+    name: str
+    shard: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OrganizationStats(BaseModel):
+    org_id: int
+    slug: Optional[str] = None
+    name: Optional[str] = None
+    shard: str
+    users: int
+    quizzes: int
+    results: int
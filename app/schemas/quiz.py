@@ -1,6 +1,14 @@
+from enum import Enum
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+
+class DeliveryMode(str, Enum):
+    fixed = "fixed"
+    shuffled = "shuffled"
+    sampled = "sampled"
+    adaptive = "adaptive"
 
 
 class AnswerBase(BaseModel):
@@ -12,6 +20,11 @@ class AnswerCreate(AnswerBase):
     pass
 
 
+class AnswerUpsert(AnswerBase):
+    # Existing answer to update; omitted for new answers
+    id: Optional[int] = None
+
+
 class Answer(AnswerBase):
     id: int
     question_id: int
@@ -22,12 +35,19 @@ class Answer(AnswerBase):
 class QuestionBase(BaseModel):
     text: str
     order: Optional[int] = None
+    difficulty: Optional[int] = Field(None, ge=1, le=5)
 
 
 class QuestionCreate(QuestionBase):
     answers: List[AnswerCreate]
 
 
+class QuestionUpsert(QuestionBase):
+    # Existing question to update; omitted for new questions
+    id: Optional[int] = None
+    answers: List[AnswerUpsert]
+
+
 class Question(QuestionBase):
     id: int
     quiz_id: int
@@ -39,12 +59,23 @@ class Question(QuestionBase):
 class QuizBase(BaseModel):
     title: str
     description: Optional[str] = None
+    delivery_mode: DeliveryMode = DeliveryMode.fixed
+    sample_size: Optional[int] = Field(None, ge=1)
 
 
 class QuizCreate(QuizBase):
     questions: List[QuestionCreate]
 
 
+class QuizUpdate(BaseModel):
+    # Omitted fields are left unchanged; questions replace the stored tree
+    title: Optional[str] = None
+    description: Optional[str] = None
+    delivery_mode: Optional[DeliveryMode] = None
+    sample_size: Optional[int] = Field(None, ge=1)
+    questions: Optional[List[QuestionUpsert]] = None
+
+
 class Quiz(QuizBase):
     id: int
     created_by: int
@@ -56,6 +87,43 @@ class Quiz(QuizBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Player-facing projections: no answer key
+class AnswerPublic(BaseModel):
+    id: int
+    text: str
+
+
+class QuestionPublic(BaseModel):
+    id: int
+    text: str
+    difficulty: Optional[int] = None
+    answers: List[AnswerPublic]
+
+
+class QuizPaper(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    delivery_mode: DeliveryMode
+    questions: List[QuestionPublic]
+    # Adaptive papers only: send back with the submission
+    paper_token: Optional[str] = None
+
+
+class QuizSummary(QuizBase):
+    id: int
+    created_by: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    is_active: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class QuizSearchHit(QuizSummary):
+    score: float
+
+
 class AnswerSubmission(BaseModel):
     question_id: int
     answer_id: int
@@ -64,6 +132,8 @@ class AnswerSubmission(BaseModel):
 class QuizSubmission(BaseModel):
     quiz_id: int
     answers: List[AnswerSubmission]
+    # The paper_token of the adaptive paper being answered
+    paper_token: Optional[str] = Field(None, max_length=128)
 
 
 class UserQuizResult(BaseModel):
@@ -73,4 +143,28 @@ class UserQuizResult(BaseModel):
     score: int
     completed_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class QuizStats(BaseModel):
+    quiz_id: int
+    attempts: int
+    average_score: Optional[float] = None
+    best_score: Optional[int] = None
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    best_score: int
+    attempts: int
+
+
+# Precompiled adapters for the hot list/detail responses
+QuizAdapter = TypeAdapter(Quiz)
+QuizListAdapter = TypeAdapter(List[Quiz])
+QuizSummaryListAdapter = TypeAdapter(List[QuizSummary])
+QuizSearchHitListAdapter = TypeAdapter(List[QuizSearchHit])
+UserQuizResultAdapter = TypeAdapter(UserQuizResult)
+UserQuizResultListAdapter = TypeAdapter(List[UserQuizResult])
@@ -1,5 +1,5 @@
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime
 from pydantic import BaseModel, EmailStr, ConfigDict
 
 
@@ -22,6 +22,7 @@ class UserUpdate(UserBase):
 
 class UserInDBBase(UserBase):
     id: Optional[int] = None
+    org_id: Optional[int] = None
     created_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -35,9 +36,36 @@ class UserInDB(UserInDBBase):
     hashed_password: str
 
 
+class QuizProgress(BaseModel):
+    quiz_id: int
+    title: str
+    attempts: int
+    best_score: int
+    last_score: int
+    average_score: float
+    last_completed_at: Optional[datetime] = None
+
+
+class UserSummary(BaseModel):
+    attempts: int
+    quizzes_played: int
+    average_score: Optional[float] = None
+    current_streak: int
+    longest_streak: int
+    last_active_on: Optional[date] = None
+    percentile: Optional[float] = None
+    quizzes: List[QuizProgress]
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenPayload(BaseModel):
@@ -0,0 +1,298 @@
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import partitions
+from app.db.session import DEFAULT_SHARD, shard_of
+from app.models.organization import DEFAULT_ORG_ID
+from app.models.quiz import UserQuizResult
+
+# numpy is only needed for archiving and reading archives
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# 25 bytes per result; scores are percentages so they fit in a byte.
+# Archives written before organizations have no org_id (all default org)
+RESULT_DTYPE = [
+    ("id", "<i8"),
+    ("org_id", "<i4"),
+    ("user_id", "<i4"),
+    ("quiz_id", "<i4"),
+    ("score", "u1"),
+    ("completed_at", "<M8[s]"),
+]
+
+ARCHIVE_RE = re.compile(r"user_quiz_results_(\d{4})_(\d{2})\.npy$")
+
+# Rows fetched from the database per array chunk while archiving a month
+ARCHIVE_CHUNK_SIZE = 10_000
+
+# path -> ((inode, mtime), memory-mapped array). Archives are replaced, not
+# modified, so a file with another inode or mtime (appended to by this or
+# another process) is mapped again
+_mapped: Dict[str, Tuple[Tuple[int, int], "np.ndarray"]] = {}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("numpy is required for result archives (pip install numpy)")
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def shard_directory(directory: str, shard: str) -> str:
+    """
+    Archive directory of one shard: ids are only unique within a shard, so
+    each keeps its own files (the default shard's are in `directory`).
+    """
+    return directory if shard == DEFAULT_SHARD else os.path.join(directory, shard)
+
+
+def _with_org(data: "np.ndarray") -> "np.ndarray":
+    # Upgrade a pre-organization archive to RESULT_DTYPE
+    if "org_id" in data.dtype.names:
+        return data
+    upgraded = np.zeros(len(data), dtype=RESULT_DTYPE)
+    for name in data.dtype.names:
+        upgraded[name] = data[name]
+    upgraded["org_id"] = DEFAULT_ORG_ID
+    return upgraded
+
+
+def _result_chunks(result) -> Iterator["np.ndarray"]:
+    # One RESULT_DTYPE array per ARCHIVE_CHUNK_SIZE rows, so a month is never
+    # held as ORM rows all at once
+    for rows in result.partitions(ARCHIVE_CHUNK_SIZE):
+        yield np.array(
+            [(r.id, r.org_id, r.user_id, r.quiz_id, r.score, _utc_naive(r.completed_at)) for r in rows],
+            dtype=RESULT_DTYPE,
+        )
+
+
+def archive_path(directory: str, month: date) -> str:
+    return os.path.join(directory, f"user_quiz_results_{month.year}_{month.month:02d}.npy")
+
+
+def list_archives(directory: str) -> List[Tuple[date, str]]:
+    if not os.path.isdir(directory):
+        return []
+    archives = []
+    for name in os.listdir(directory):
+        match = ARCHIVE_RE.match(name)
+        if match:
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            archives.append((month, os.path.join(directory, name)))
+    return sorted(archives)
+
+
+def archive_month(db: Session, month: date, directory: str) -> Tuple[str, int]:
+    """
+    Export one month of results to a .npy file and remove them from the
+    database in one transaction (dropping the partition on PostgreSQL).
+    Files go to the shard's subdirectory of `directory`.
+
+    Late rows for a month archived before are appended to its file; rows
+    already in the file are not appended again.
+
+    The file is written under a staging name and only renamed into place
+    once the transaction commits, so a failed commit leaves the rows in
+    the database and out of the stats. A staging file left over from an
+    earlier run (one that committed but stopped before the rename) is
+    merged in by the next run.
+
+    Returns the archive path and the number of rows archived.
+    """
+    _require_numpy()
+    directory = shard_directory(directory, shard_of(db))
+    start, end = month, partitions.add_months(month, 1)
+    columns = (
+        UserQuizResult.id,
+        UserQuizResult.org_id,
+        UserQuizResult.user_id,
+        UserQuizResult.quiz_id,
+        UserQuizResult.score,
+        UserQuizResult.completed_at,
+    )
+    in_month = (UserQuizResult.completed_at >= start, UserQuizResult.completed_at < end)
+    conn = db.connection()
+    name = partitions.partition_name(month)
+    partitioned = name in dict(partitions.list_partitions(conn))
+    path = archive_path(directory, month)
+    staging_path = path + ".tmp"
+
+    chunks = []
+    if partitioned:
+        # The partition is dropped whole once its rows are read
+        chunks.extend(_result_chunks(db.execute(
+            select(*columns).where(*in_month), execution_options={"yield_per": ARCHIVE_CHUNK_SIZE}
+        )))
+        partitions.drop_partition(conn, name)
+    # Whatever is left of the month (every row when unpartitioned, late rows
+    # in the DEFAULT partition otherwise) is removed in the same transaction
+    deleted = db.execute(
+        delete(UserQuizResult).where(*in_month).returning(*columns),
+        execution_options={"synchronize_session": False},
+    )
+    chunks.extend(_result_chunks(deleted))
+    data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=RESULT_DTYPE)
+    if not len(data) and not os.path.exists(staging_path):
+        db.commit()
+        return path, 0
+
+    # The partition read and the delete can both return a row left in the
+    # DEFAULT partition; each id is archived once
+    _, first = np.unique(data["id"], return_index=True)
+    data = data[first]
+    data = data[np.argsort(data, order=("completed_at", "id"))]
+    # Month archived before (e.g. late rows in the default partition), then
+    # an unpromoted staging file; the first copy of each id is kept
+    merged = [_with_org(np.load(previous)) for previous in (path, staging_path) if os.path.exists(previous)]
+    if merged:
+        merged = np.concatenate(merged + [data])
+        _, first = np.unique(merged["id"], return_index=True)
+        merged = merged[np.sort(first)]
+    else:
+        merged = data
+    os.makedirs(directory, exist_ok=True)
+    with open(staging_path, "wb") as f:
+        np.save(f, merged)
+    db.commit()
+    os.replace(staging_path, path)
+    return path, len(data)
+
+
+def archive_old_results(
+    db: Session,
+    retention_months: Optional[int] = None,
+    directory: Optional[str] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Archive every month older than the retention window.
+    """
+    retention_months = settings.RESULTS_RETENTION_MONTHS if retention_months is None else retention_months
+    directory = directory or settings.RESULTS_ARCHIVE_DIR
+    cutoff = partitions.add_months(partitions.month_start(date.today()), -retention_months)
+
+    oldest = db.execute(select(func.min(UserQuizResult.completed_at))).scalar()
+    if oldest is None:
+        return []
+    archived = []
+    for month in partitions.iter_months(oldest, partitions.add_months(cutoff, -1)):
+        path, count = archive_month(db, month, directory)
+        if count:
+            archived.append((path, count))
+    return archived
+
+
+def load_archive(path: str) -> "np.ndarray":
+    """
+    Memory-map an archive; pages are read only when a query touches them.
+    """
+    _require_numpy()
+    stat = os.stat(path)
+    stamp = (stat.st_ino, stat.st_mtime_ns)
+    cached = _mapped.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    array = np.load(path, mmap_mode="r")
+    _mapped[path] = (stamp, array)
+    return array
+
+
+def archived_stats(
+    directory: str,
+    org_id: Optional[int] = None,
+    quiz_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[int, int, Optional[int]]:
+    """
+    (attempts, total score, best score) over the archived results in
+    `directory` (one shard's), optionally of one organization.
+    """
+    attempts, total, best = 0, 0, None
+    for month, path in list_archives(directory):
+        # Skip whole files outside the range without touching their pages
+        if start is not None and partitions.add_months(month, 1) <= _utc_naive(start).date():
+            continue
+        if end is not None and month > _utc_naive(end).date():
+            continue
+        data = load_archive(path)
+        mask = np.ones(len(data), dtype=bool)
+        if org_id is not None:
+            if "org_id" in data.dtype.names:
+                mask &= data["org_id"] == org_id
+            elif org_id != DEFAULT_ORG_ID:
+                continue
+        if quiz_id is not None:
+            mask &= data["quiz_id"] == quiz_id
+        if user_id is not None:
+            mask &= data["user_id"] == user_id
+        if start is not None:
+            mask &= data["completed_at"] >= np.datetime64(_utc_naive(start), "s")
+        if end is not None:
+            mask &= data["completed_at"] < np.datetime64(_utc_naive(end), "s")
+        scores = data["score"][mask]
+        if len(scores):
+            attempts += len(scores)
+            total += int(scores.sum(dtype=np.int64))
+            best = max(best or 0, int(scores.max()))
+    return attempts, total, best
+
+
+def result_stats(
+    db: Session,
+    quiz_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    """
+    Attempts, average and best score across live and archived results.
+    """
+    query = select(
+        func.count(UserQuizResult.id),
+        func.coalesce(func.sum(UserQuizResult.score), 0),
+        func.max(UserQuizResult.score),
+    )
+    if quiz_id is not None:
+        query = query.where(UserQuizResult.quiz_id == quiz_id)
+    if user_id is not None:
+        query = query.where(UserQuizResult.user_id == user_id)
+    if start is not None:
+        query = query.where(UserQuizResult.completed_at >= start)
+    if end is not None:
+        query = query.where(UserQuizResult.completed_at < end)
+    attempts, total, best = db.execute(query).one()
+
+    if np is not None:
+        archived = archived_stats(
+            shard_directory(settings.RESULTS_ARCHIVE_DIR, shard_of(db)),
+            db.info.get("org_id"),
+            quiz_id,
+            user_id,
+            start,
+            end,
+        )
+        attempts += archived[0]
+        total += archived[1]
+        if archived[2] is not None:
+            best = max(best or 0, archived[2])
+
+    return {
+        "attempts": attempts,
+        "average_score": total / attempts if attempts else None,
+        "best_score": best,
+    }
@@ -0,0 +1,323 @@
+import hashlib
+import hmac
+import random
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.core import events, singleflight
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.shared_store import SharedStore, get_shared_store
+from app.db.session import DEFAULT_SHARD, shard_of
+from app.models.quiz import Quiz, Question, UserProgress
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+# (shard, quiz_id) -> QuestionPool, rebuilt when the quiz version changes.
+# With a shared store the cached pool only holds a handle on the mapping.
+pool_cache = LRUCache(maxsize=settings.QUESTION_POOL_CACHE_SIZE)
+# Concurrent cache misses for one quiz version wait on a single load
+pool_flights = singleflight.group("question_pool")
+
+
+def forget_pool(quiz_id: int, shard: str = DEFAULT_SHARD) -> None:
+    pool_cache.pop((shard, quiz_id))
+    # Other workers notice the new quiz version on their own
+    store = get_shared_store()
+    if store:
+        store.delete(f"pool.{shard}", quiz_id)
+
+
+events.subscribe(events.QUIZ_CHANGED, forget_pool)
+
+
+@dataclass(frozen=True)
+class QuestionPool:
+    """
+    Precomputed per-quiz question bank.
+
+    `entries` holds one {"question", "correct"} entry per question in stored
+    order: the answer-key-stripped projection every player-facing paper is
+    cut from, and the ids of its correct answers, which never leave the
+    server. With a shared store it is a view of the mapping that decodes
+    one entry at a time; `question_ids` and `difficulties` are enough to
+    select a paper without decoding the rest.
+    """
+    quiz_id: int
+    version: str
+    title: str
+    description: Optional[str]
+    delivery_mode: str
+    sample_size: Optional[int]
+    question_ids: Tuple[int, ...]
+    difficulties: Tuple[int, ...]
+    entries: Sequence[dict]
+
+    @cached_property
+    def positions(self) -> Dict[int, int]:
+        return {question_id: index for index, question_id in enumerate(self.question_ids)}
+
+    def question(self, index: int) -> dict:
+        return self.entries[index]["question"]
+
+    def correct_answers(self, question_id: int) -> FrozenSet[int]:
+        return frozenset(self.entries[self.positions[question_id]]["correct"])
+
+
+def quiz_version(quiz: Quiz) -> str:
+    stamp = quiz.updated_at or quiz.created_at
+    return stamp.isoformat() if stamp else ""
+
+
+def build_pool(db: Session, quiz: Quiz) -> QuestionPool:
+    """
+    Load a quiz tree in two queries and project it into a QuestionPool.
+    """
+    questions = (
+        db.query(Question)
+        .options(selectinload(Question.answers))
+        .filter(Question.quiz_id == quiz.id)
+        .order_by(Question.order, Question.id)
+        .all()
+    )
+    entries = []
+    for question in questions:
+        answers = sorted(question.answers, key=lambda a: a.id)
+        entries.append({
+            "question": {
+                "id": question.id,
+                "text": question.text,
+                "difficulty": question.difficulty or MIN_DIFFICULTY,
+                "answers": [{"id": a.id, "text": a.text} for a in answers],
+            },
+            "correct": [a.id for a in answers if a.is_correct],
+        })
+
+    return QuestionPool(
+        quiz_id=quiz.id,
+        version=quiz_version(quiz),
+        title=quiz.title,
+        description=quiz.description,
+        delivery_mode=quiz.delivery_mode or "fixed",
+        sample_size=quiz.sample_size,
+        question_ids=tuple(entry["question"]["id"] for entry in entries),
+        difficulties=tuple(entry["question"]["difficulty"] for entry in entries),
+        entries=tuple(entries),
+    )
+
+
+def share_pool(store: SharedStore, shard: str, pool: QuestionPool) -> None:
+    store.put_records(
+        f"pool.{shard}",
+        pool.quiz_id,
+        pool.version,
+        {
+            "title": pool.title,
+            "description": pool.description,
+            "delivery_mode": pool.delivery_mode,
+            "sample_size": pool.sample_size,
+            "question_ids": pool.question_ids,
+            "difficulties": pool.difficulties,
+        },
+        pool.entries,
+    )
+
+
+def shared_pool(
+    store: SharedStore, shard: str, quiz_id: int, version: str
+) -> Optional[QuestionPool]:
+    """
+    A pool backed by the shared mapping, or None if no worker has stored
+    this version yet.
+    """
+    entries = store.get_records(f"pool.{shard}", quiz_id, version)
+    if entries is None:
+        return None
+    header = entries.header
+    return QuestionPool(
+        quiz_id=quiz_id,
+        version=version,
+        title=header["title"],
+        description=header["description"],
+        delivery_mode=header["delivery_mode"],
+        sample_size=header["sample_size"],
+        question_ids=tuple(header["question_ids"]),
+        difficulties=tuple(header["difficulties"]),
+        entries=entries,
+    )
+
+
+def get_pool(db: Session, quiz: Quiz) -> QuestionPool:
+    """
+    Return the cached pool for a quiz, rebuilding it if the quiz changed.
+
+    Concurrent misses for the same quiz version share one load. In
+    multi-process mode pools live in the shared store: each is built once
+    per host and read from the mapping, never copied into a worker.
+    """
+    version = quiz_version(quiz)
+    # Quiz ids are only unique within a shard
+    shard = shard_of(db)
+    pool = pool_cache.get((shard, quiz.id))
+    if pool is not None and pool.version == version:
+        return pool
+
+    def load() -> QuestionPool:
+        store = get_shared_store()
+        if store is None:
+            loaded = build_pool(db, quiz)
+        else:
+            loaded = shared_pool(store, shard, quiz.id, version)
+            if loaded is None:
+                built = build_pool(db, quiz)
+                share_pool(store, shard, built)
+                # Serve from the mapping like every other worker, unless a
+                # newer version replaced the entry in between
+                loaded = shared_pool(store, shard, quiz.id, version) or built
+        pool_cache.set((shard, quiz.id), loaded)
+        return loaded
+
+    pool, _ = pool_flights.do((shard, quiz.id, version), load)
+    return pool
+
+
+def paper_seed(pool: QuestionPool, user_id: int) -> int:
+    """
+    Deterministic per-player seed, so a paper can be regenerated on submit.
+
+    Keyed with SECRET_KEY so players cannot predict each other's papers.
+    """
+    message = f"{pool.quiz_id}:{pool.version}:{user_id}".encode()
+    digest = hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _target_signature(pool: QuestionPool, user_id: int, target: int) -> str:
+    message = f"{pool.quiz_id}:{pool.version}:{user_id}:{target}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def paper_token(pool: QuestionPool, user_id: int, target: int) -> str:
+    """
+    Signed record of the adaptive target a paper was cut for. The player
+    sends it back on submit, so the paper is rebuilt for the same target
+    even if their average score has moved in between.
+    """
+    return f"{target}.{_target_signature(pool, user_id, target)}"
+
+
+def target_from_token(pool: QuestionPool, user_id: int, token: Optional[str]) -> Optional[int]:
+    """
+    The target carried by a paper token, or None if it is missing, was
+    issued for another player or quiz version, or is forged.
+    """
+    target, _, signature = (token or "").partition(".")
+    if not target.isdigit():
+        return None
+    if not hmac.compare_digest(signature, _target_signature(pool, user_id, int(target))):
+        return None
+    return int(target)
+
+
+def difficulty_for_score(average: Optional[float]) -> int:
+    """
+    Map an average percentage score onto the difficulty scale.
+    """
+    if average is None:
+        return (MIN_DIFFICULTY + MAX_DIFFICULTY) // 2
+    span = MAX_DIFFICULTY - MIN_DIFFICULTY
+    return MIN_DIFFICULTY + round(float(average) / 100 * span)
+
+
+def target_difficulties(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Adaptive target difficulty for several players in one query, from the
+    per-user rollups (which also cover archived months).
+    """
+    user_ids = set(user_ids)
+    averages = dict(
+        db.query(UserProgress.user_id, UserProgress.average_score)
+        .filter(UserProgress.user_id.in_(user_ids))
+        .all()
+    )
+    return {user_id: difficulty_for_score(averages.get(user_id)) for user_id in user_ids}
+
+
+def select_questions(
+    pool: QuestionPool, rng: random.Random, target: Optional[int] = None
+) -> List[dict]:
+    # Select by position so only the chosen questions are decoded
+    indexes = list(range(len(pool.question_ids)))
+    count = min(pool.sample_size or len(indexes), len(indexes))
+    difficulties = pool.difficulties
+    mode = pool.delivery_mode
+
+    if mode == "shuffled":
+        rng.shuffle(indexes)
+    elif mode == "sampled":
+        indexes = rng.sample(indexes, count)
+    elif mode == "adaptive":
+        target = MIN_DIFFICULTY if target is None else target
+        # Closest difficulty first, ties broken randomly, then easy to hard
+        ranked = sorted(
+            indexes, key=lambda i: (abs(difficulties[i] - target), rng.random())
+        )
+        indexes = sorted(ranked[:count], key=lambda i: difficulties[i])
+    return [pool.question(index) for index in indexes]
+
+
+def build_paper(
+    pool: QuestionPool, user_id: int, target: Optional[int] = None
+) -> dict:
+    """
+    Cut a player's paper from the pool.
+
+    Fixed-mode quizzes share the stored order; every other mode shuffles the
+    answers of each selected question with the player's seeded PRNG.
+    """
+    rng = random.Random(paper_seed(pool, user_id))
+    questions = select_questions(pool, rng, target)
+    if pool.delivery_mode != "fixed":
+        shuffled = []
+        for question in questions:
+            answers = list(question["answers"])
+            rng.shuffle(answers)
+            shuffled.append({**question, "answers": answers})
+        questions = shuffled
+
+    paper = {
+        "id": pool.quiz_id,
+        "title": pool.title,
+        "description": pool.description,
+        "delivery_mode": pool.delivery_mode,
+        "questions": questions,
+    }
+    if pool.delivery_mode == "adaptive" and target is not None:
+        paper["paper_token"] = paper_token(pool, user_id, target)
+    return paper
+
+
+def paper_for_user(db: Session, pool: QuestionPool, user_id: int) -> dict:
+    target = None
+    if pool.delivery_mode == "adaptive":
+        target = target_difficulties(db, [user_id])[user_id]
+    return build_paper(pool, user_id, target)
+
+
+def score_paper(pool: QuestionPool, paper: dict, answer_map: Dict[int, int]) -> int:
+    """
+    Percentage of the paper's questions answered correctly.
+    """
+    total = len(paper["questions"])
+    if total == 0:
+        return 0
+    correct = sum(
+        1
+        for question in paper["questions"]
+        if answer_map.get(question["id"]) in pool.correct_answers(question["id"])
+    )
+    return int((correct / total) * 100)
@@ -0,0 +1,460 @@
+import csv
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import base  # noqa: F401 - registers every model (process jobs)
+from app.db.instrumentation import query_budget
+from app.db.session import SessionLocal, engines, shard_session
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = (
+    "queued", "running", "succeeded", "failed", "cancelled",
+)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobKind(NamedTuple):
+    fn: Callable[..., Any]
+    # "thread" for I/O-bound work, "process" for CPU-bound work
+    executor: str
+    priority: int
+
+
+JOB_KINDS: Dict[str, JobKind] = {}
+
+
+def job_kind(name: str, executor: str = "thread", priority: int = 0):
+    """
+    Register `fn(db, ctx, **params)` as the job kind `name`. Its return
+    value (JSON-serializable) is stored as the job result.
+
+    Process jobs run in a separate interpreter, so `fn` must be importable
+    at module level and its params and result picklable.
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {executor!r}")
+
+    def decorator(fn):
+        JOB_KINDS[name] = JobKind(fn, executor, priority)
+        return fn
+    return decorator
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """
+    Handed to running jobs to report progress and notice cancellation.
+
+    Writes go through their own short sessions, so they are visible while
+    the job's own transaction is still open, and are throttled to one per
+    `interval` seconds.
+    """
+
+    def __init__(self, job_id: int, interval: float = 0.5) -> None:
+        self.job_id = job_id
+        self.interval = interval
+        self._last_write = 0.0
+        self._cancelled = False
+
+    def progress(self, done: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        """
+        Record progress (`done` out of `total`, or a fraction) and raise
+        JobCancelled if cancellation was requested.
+        """
+        now = time.monotonic()
+        if now - self._last_write < self.interval:
+            return
+        self._last_write = now
+        fraction = done / total if total else done
+        values = {"progress": min(max(fraction, 0.0), 1.0), "heartbeat_at": _now()}
+        if message is not None:
+            values["message"] = message[:255]
+        with SessionLocal() as db:
+            db.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            self._cancelled = bool(db.scalar(select(Job.cancel_requested).where(Job.id == self.job_id)))
+            db.commit()
+        self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self._cancelled:
+            raise JobCancelled()
+
+
+def _execute(job_id: int, kind: str, params: dict) -> Any:
+    with SessionLocal() as db:
+        return JOB_KINDS[kind].fn(db, JobContext(job_id), **params)
+
+
+def _claim(job_id: int) -> Optional[Job]:
+    """
+    Move a queued job to running; None if another worker got it first
+    or it was cancelled meanwhile.
+    """
+    with SessionLocal() as db:
+        now = _now()
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == QUEUED)
+            .values(status=RUNNING, started_at=now, heartbeat_at=now)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return None
+        job = db.get(Job, job_id)
+        db.expunge(job)
+        return job
+
+
+def _finish(job_id: int, status_: str, result: Any = None, error: Optional[str] = None) -> None:
+    values = {"status": status_, "finished_at": _now(), "result": result, "error": error}
+    if status_ == SUCCEEDED:
+        values["progress"] = 1.0
+    with SessionLocal() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
+
+
+class JobRunner:
+    """
+    In-process job runner backed by the jobs table.
+
+    Thread jobs run on `thread_workers` threads; process jobs are handed to
+    a pool of `process_workers` processes, one per dispatcher thread. Each
+    executor has its own priority queue. A housekeeping thread refreshes
+    the heartbeat of running jobs, fails jobs whose worker died, and picks
+    up queued jobs submitted by other processes.
+    """
+
+    def __init__(self, thread_workers: int = 2, process_workers: int = 1, poll_interval: float = 5.0) -> None:
+        self.workers = {"thread": thread_workers, "process": process_workers}
+        self.poll_interval = poll_interval
+        self._queues: Dict[str, List[tuple]] = {"thread": [], "process": []}
+        self._queued: Set[int] = set()
+        self._running: Set[int] = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self.workers["process"]:
+            # Spawned, not forked: the server process has threads and sockets
+            self._pool = ProcessPoolExecutor(
+                self.workers["process"], mp_context=multiprocessing.get_context("spawn")
+            )
+        for executor, count in self.workers.items():
+            for number in range(count):
+                self._spawn(f"jobs-{executor}-{number}", self._work, executor)
+        self._spawn("jobs-housekeeping", self._housekeeping)
+
+    def _spawn(self, name: str, target, *args) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def enqueue(self, job_id: int, kind: str, priority: int) -> None:
+        executor = JOB_KINDS[kind].executor
+        with self._cond:
+            if job_id in self._queued or job_id in self._running:
+                return
+            self._queued.add(job_id)
+            heapq.heappush(self._queues[executor], (-priority, job_id))
+            self._cond.notify_all()
+
+    def _next(self, executor: str) -> Optional[int]:
+        with self._cond:
+            while not self._queues[executor] and not self._stopping:
+                self._cond.wait()
+            if self._stopping:
+                return None
+            _, job_id = heapq.heappop(self._queues[executor])
+            self._queued.discard(job_id)
+            return job_id
+
+    def _work(self, executor: str) -> None:
+        while True:
+            job_id = self._next(executor)
+            if job_id is None:
+                return
+            job = _claim(job_id)
+            if job is None:
+                continue
+            with self._cond:
+                self._running.add(job_id)
+            try:
+                self._run(job, executor)
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
+
+    def _run(self, job: Job, executor: str) -> None:
+        logger.info("Job %s (%s) started", job.id, job.kind)
+        started = time.perf_counter()
+        try:
+            if executor == "process":
+                result = self._pool.submit(_execute, job.id, job.kind, job.params).result()
+            else:
+                result = _execute(job.id, job.kind, job.params)
+        except JobCancelled:
+            _finish(job.id, CANCELLED)
+            logger.info("Job %s (%s) cancelled", job.id, job.kind)
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            _finish(job.id, FAILED, error=f"{type(exc).__name__}: {exc}")
+        else:
+            _finish(job.id, SUCCEEDED, result=result)
+            logger.info("Job %s (%s) done in %.2fs", job.id, job.kind, time.perf_counter() - started)
+
+    def _housekeeping(self) -> None:
+        while True:
+            try:
+                self._poll()
+            except Exception:
+                logger.exception("Job housekeeping failed")
+            with self._cond:
+                if self._cond.wait_for(lambda: self._stopping, self.poll_interval):
+                    return
+
+    def _poll(self) -> None:
+        with self._cond:
+            running = list(self._running)
+        now = _now()
+        with SessionLocal() as db:
+            if running:
+                db.execute(update(Job).where(Job.id.in_(running)).values(heartbeat_at=now))
+            stale = now - timedelta(seconds=self.poll_interval * 3)
+            interrupted = db.execute(
+                update(Job)
+                .where(Job.status == RUNNING, Job.heartbeat_at < stale)
+                .values(status=FAILED, finished_at=now, error="Interrupted: worker stopped")
+            ).rowcount
+            queued = db.execute(select(Job.id, Job.kind, Job.priority).where(Job.status == QUEUED)).all()
+            db.commit()
+        if interrupted:
+            logger.warning("Marked %d interrupted jobs as failed", interrupted)
+        for job_id, kind, priority in queued:
+            if kind in JOB_KINDS:
+                self.enqueue(job_id, kind, priority)
+
+
+runner: Optional[JobRunner] = None
+
+
+def start_runner() -> JobRunner:
+    global runner
+    runner = JobRunner(
+        settings.JOB_THREAD_WORKERS, settings.JOB_PROCESS_WORKERS, settings.JOB_POLL_SECONDS
+    )
+    runner.start()
+    return runner
+
+
+def stop_runner() -> None:
+    if runner is not None:
+        runner.stop()
+
+
+# Job API used by the admin endpoints
+@query_budget(2)
+def submit_job(
+    db: Session,
+    kind: str,
+    params: Optional[dict] = None,
+    priority: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> Job:
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+    job = Job(
+        kind=kind,
+        params=params or {},
+        priority=JOB_KINDS[kind].priority if priority is None else priority,
+        status=QUEUED,
+        created_by=user_id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if runner is not None:
+        runner.enqueue(job.id, job.kind, job.priority)
+    return job
+
+
+@query_budget(1)
+def get_job(db: Session, job_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@query_budget(1)
+def list_jobs(db: Session, status_: Optional[str] = None, limit: int = 50) -> List[Job]:
+    query = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status_ is not None:
+        query = query.where(Job.status == status_)
+    return list(db.scalars(query))
+
+
+@query_budget(4)
+def cancel_job(db: Session, job_id: int) -> Job:
+    """
+    Cancel a queued job outright; ask a running one to stop at its next
+    progress report.
+    """
+    job = get_job(db, job_id)
+    if job.status in FINISHED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=f"Job already {job.status}"
+        )
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == QUEUED)
+        .values(status=CANCELLED, finished_at=_now())
+    )
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == RUNNING)
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _shard_names(shard: Optional[str]) -> List[str]:
+    if shard is not None and shard not in engines:
+        raise ValueError(f"Unknown shard {shard!r}")
+    return [shard] if shard else list(engines)
+
+
+# Built-in job kinds. Maintenance kinds run on every shard in turn unless
+# given one `shard`; `db` is a session on the default shard.
+@job_kind("rebuild_rollups", priority=5)
+def rebuild_rollups_job(
+    db: Session, ctx: JobContext, user_ids: Optional[List[int]] = None, shard: Optional[str] = None
+) -> dict:
+    """
+    Recompute per-user stats and the per-quiz rollups leaderboards read,
+    then drop the leaderboards and percentiles cached from the old rollups
+    in every worker.
+    """
+    from app.services.progress import clear_rollup_caches, rebuild_rollups
+
+    shards = _shard_names(shard)
+    counts = {}
+    for number, name in enumerate(shards):
+        ctx.progress(number, len(shards), f"Rebuilding rollups on {name}")
+        with shard_session(name) as shard_db:
+            counts[name] = rebuild_rollups(shard_db, user_ids)
+    clear_rollup_caches()
+    return {"results": sum(counts.values()), "shards": counts}
+
+
+@job_kind("archive_results", executor="process")
+def archive_results_job(
+    db: Session, ctx: JobContext, retention_months: Optional[int] = None, shard: Optional[str] = None
+) -> dict:
+    """
+    Move months older than the retention window to .npy archives.
+    """
+    from app.services.archive import archive_old_results
+
+    shards = _shard_names(shard)
+    archives = []
+    for number, name in enumerate(shards):
+        ctx.progress(number, len(shards), f"Archiving {name}")
+        with shard_session(name) as shard_db:
+            archives += [
+                {"shard": name, "path": path, "results": count}
+                for path, count in archive_old_results(shard_db, retention_months)
+            ]
+    return {"archives": archives}
+
+
+@job_kind("export_results")
+def export_results_job(
+    db: Session, ctx: JobContext, quiz_id: Optional[int] = None, shard: Optional[str] = None
+) -> dict:
+    """
+    Write live results (optionally of one shard's quiz) to a CSV file.
+    """
+    from sqlalchemy import func
+
+    from app.models.quiz import UserQuizResult
+
+    columns = (
+        UserQuizResult.id, UserQuizResult.org_id, UserQuizResult.user_id,
+        UserQuizResult.quiz_id, UserQuizResult.score, UserQuizResult.completed_at,
+    )
+    query = select(*columns).order_by(UserQuizResult.id)
+    count_query = select(func.count()).select_from(UserQuizResult)
+    if quiz_id is not None:
+        query = query.where(UserQuizResult.quiz_id == quiz_id)
+        count_query = count_query.where(UserQuizResult.quiz_id == quiz_id)
+    shards = _shard_names(shard)
+    total = 0
+    for name in shards:
+        with shard_session(name) as shard_db:
+            total += shard_db.scalar(count_query)
+
+    os.makedirs(settings.JOB_OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(settings.JOB_OUTPUT_DIR, f"job-{ctx.job_id}-results.csv")
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["shard"] + [column.key for column in columns])
+        for name in shards:
+            with shard_session(name) as shard_db:
+                rows = shard_db.execute(query.execution_options(yield_per=5000))
+                for partition in rows.partitions():
+                    writer.writerows((name, *row) for row in partition)
+                    written += len(partition)
+                    ctx.progress(written, total, f"{written}/{total} results")
+    return {"path": path, "rows": written}
+
+
+@job_kind("import_quizzes")
+def import_quizzes_job(db: Session, ctx: JobContext, user_id: int, quizzes: List[dict]) -> dict:
+    """
+    Create many quizzes, owned by `user_id`. Quizzes created before a
+    cancellation or failure are kept.
+    """
+    from app.schemas.quiz import QuizCreate
+    from app.services.quiz import create_quiz
+
+    created = []
+    for number, data in enumerate(quizzes):
+        ctx.progress(number, len(quizzes), f"{number}/{len(quizzes)} quizzes")
+        created.append(create_quiz(db, QuizCreate(**data), user_id).id)
+    return {"created": created}
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.instrumentation import query_budget
+from app.db.session import engines
+from app.db.tenancy import map_shards
+from app.models.organization import Organization
+from app.models.quiz import Quiz, UserQuizResult
+from app.models.user import User
+from app.schemas.organization import OrganizationCreate
+
+
+@query_budget(1)
+def list_organizations(db: Session) -> List[Organization]:
+    return list(db.scalars(select(Organization).order_by(Organization.id)))
+
+
+@query_budget(2)
+def create_organization(db: Session, org_in: OrganizationCreate) -> Organization:
+    if org_in.shard not in engines:
+        raise HTTPException(status_code=400, detail=f"Unknown shard: {org_in.shard}")
+    if db.scalar(select(Organization.id).where(Organization.slug == org_in.slug)) is not None:
+        raise HTTPException(status_code=400, detail="An organization with this slug already exists.")
+    org = Organization(slug=org_in.slug, name=org_in.name, shard=org_in.shard)
+    db.add(org)
+    db.commit()
+    return org
+
+
+@query_budget(3)
+def _shard_counts(db: Session) -> Dict[int, Dict[str, int]]:
+    counts: Dict[int, Dict[str, int]] = defaultdict(lambda: {"users": 0, "quizzes": 0, "results": 0})
+    for name, query in (
+        ("users", select(User.org_id, func.count()).group_by(User.org_id)),
+        ("quizzes", select(Quiz.org_id, func.count()).where(Quiz.is_active == True).group_by(Quiz.org_id)),
+        ("results", select(UserQuizResult.org_id, func.count()).group_by(UserQuizResult.org_id)),
+    ):
+        for org_id, count in db.execute(query):
+            counts[org_id][name] = count
+    return dict(counts)
+
+
+def organization_stats(db: Session) -> List[dict]:
+    """
+    Users, active quizzes and live results per organization, counted on
+    every shard in parallel and merged with the directory in `db`.
+    """
+    directory = {org.id: org for org in list_organizations(db)}
+    by_shard = map_shards(_shard_counts)
+    stats = []
+    for shard, counts in sorted(by_shard.items()):
+        for org_id, values in sorted(counts.items()):
+            org = directory.get(org_id)
+            stats.append({
+                "org_id": org_id,
+                "slug": org.slug if org else None,
+                "name": org.name if org else None,
+                "shard": shard,
+                **values,
+            })
+    return stats
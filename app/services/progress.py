@@ -0,0 +1,436 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import case, delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core import singleflight
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.shared_store import get_shared_store
+from app.db.instrumentation import query_budget
+from app.db.session import shard_of
+from app.models.quiz import Quiz, UserProgress, UserQuizResult, UserQuizStats
+from app.models.user import User
+
+# (shard, org_id, quiz_id, limit) -> leaderboard rows; briefly stale by design
+leaderboard_cache = LRUCache(maxsize=4096, ttl=settings.LEADERBOARD_CACHE_SECONDS)
+leaderboard_flights = singleflight.group("leaderboard")
+# (shard, org_id) -> sorted average scores of its players
+distribution_cache = LRUCache(maxsize=1024, ttl=settings.PERCENTILE_CACHE_SECONDS)
+distribution_flights = singleflight.group("score_distribution")
+# Shared-store log with one record per rollup rebuild: each worker drops the
+# caches above when it grows, instead of serving values from before the
+# rebuild until they expire
+REBUILDS_NAMESPACE = "rollup_rebuilds"
+_rebuilds_offset = 0
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def _upsert(db: Session, table):
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERTS:
+        raise NotImplementedError(f"Result rollups need ON CONFLICT support, not {dialect}")
+    return _UPSERTS[dialect](table)
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _greater(left, right):
+    return case((left > right, left), else_=right)
+
+
+def _fold_pair(
+    pairs: Dict[Tuple[int, int], dict],
+    user_id: int,
+    quiz_id: int,
+    score: int,
+    completed_at: datetime,
+) -> None:
+    pair = pairs.setdefault((user_id, quiz_id), {
+        "user_id": user_id,
+        "quiz_id": quiz_id,
+        "attempts": 0,
+        "total_score": 0,
+        "best_score": 0,
+    })
+    pair["attempts"] += 1
+    pair["total_score"] += score
+    pair["best_score"] = max(pair["best_score"], score)
+    pair["last_score"] = score
+    pair["last_completed_at"] = completed_at
+
+
+def _per_user(values: Dict[int, object]):
+    """
+    A per-user constant inside one upsert: CASE on user_id, with the most
+    common value as the ELSE branch (so a plain value when all agree).
+    """
+    common = Counter(values.values()).most_common(1)[0][0]
+    others = {user_id: value for user_id, value in values.items() if value != common}
+    if not others:
+        return common
+    return case(others, value=UserProgress.user_id, else_=common)
+
+
+def _runs(days: List[date]) -> Tuple[int, int, int]:
+    """
+    (first, last, longest) run of consecutive days in the sorted distinct
+    `days`.
+    """
+    runs = [1]
+    for previous, day in zip(days, days[1:]):
+        if day == previous + timedelta(days=1):
+            runs[-1] += 1
+        else:
+            runs.append(1)
+    return runs[0], runs[-1], max(runs)
+
+
+def apply_results(db: Session, results: Sequence[UserQuizResult]) -> None:
+    """
+    Fold freshly inserted results into the rollup tables.
+
+    Two upserts whatever the batch size or the days it spans; does not
+    commit, so the rollups land in the same transaction as the results
+    themselves.
+    """
+    pairs: Dict[Tuple[int, int], dict] = {}
+    users: Dict[int, dict] = {}
+    days: Dict[int, List[date]] = defaultdict(list)
+    for result in sorted(results, key=lambda r: r.completed_at):
+        _fold_pair(pairs, result.user_id, result.quiz_id, result.score, result.completed_at)
+
+        user = users.setdefault(result.user_id, {
+            "user_id": result.user_id,
+            "attempts": 0,
+            "total_score": 0,
+        })
+        user["attempts"] += 1
+        user["total_score"] += result.score
+        day = _utc_day(result.completed_at)
+        if not days[result.user_id] or days[result.user_id][-1] != day:
+            days[result.user_id].append(day)
+    if not pairs:
+        return
+
+    stmt = _upsert(db, UserQuizStats.__table__)
+    new = stmt.excluded
+    db.execute(
+        stmt.values(list(pairs.values())).on_conflict_do_update(
+            index_elements=["user_id", "quiz_id"],
+            set_={
+                "attempts": UserQuizStats.attempts + new.attempts,
+                "total_score": UserQuizStats.total_score + new.total_score,
+                "best_score": _greater(new.best_score, UserQuizStats.best_score),
+                "last_score": new.last_score,
+                "last_completed_at": new.last_completed_at,
+            },
+        )
+    )
+
+    # Streaks within the batch go in as column values; how the batch joins
+    # the stored streak depends on each user's first day in it
+    first_days, days_before, heads, gaps = {}, {}, {}, set()
+    for user_id, user in users.items():
+        user_days = days[user_id]
+        head, tail, longest = _runs(user_days)
+        user["average_score"] = user["total_score"] / user["attempts"]
+        user["current_streak"] = tail
+        user["longest_streak"] = longest
+        user["last_active_on"] = user_days[-1]
+        first_days[user_id] = user_days[0]
+        days_before[user_id] = user_days[0] - timedelta(days=1)
+        heads[user_id] = head
+        if head < len(user_days):
+            gaps.add(user_id)
+
+    stmt = _upsert(db, UserProgress.__table__)
+    new = stmt.excluded
+    head = _per_user(heads)
+    # A batch starting on the last active day continues the stored streak,
+    # one starting the day after extends it, anything later starts afresh
+    joined = case(
+        (UserProgress.last_active_on == _per_user(first_days), UserProgress.current_streak + head - 1),
+        (UserProgress.last_active_on == _per_user(days_before), UserProgress.current_streak + head),
+        else_=head,
+    )
+    # ... unless the batch itself skips a day, which ends that streak
+    streak = joined
+    if gaps:
+        streak = case((UserProgress.user_id.in_(gaps), new.current_streak), else_=joined)
+    db.execute(
+        stmt.values(list(users.values())).on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "attempts": UserProgress.attempts + new.attempts,
+                "total_score": UserProgress.total_score + new.total_score,
+                "average_score": (UserProgress.total_score + new.total_score)
+                * 1.0
+                / (UserProgress.attempts + new.attempts),
+                "current_streak": streak,
+                "longest_streak": _greater(
+                    _greater(joined, new.longest_streak), UserProgress.longest_streak
+                ),
+                "last_active_on": new.last_active_on,
+            },
+        )
+    )
+
+
+def _iter_results(db: Session, user_ids: Optional[Sequence[int]] = None) -> Iterable[tuple]:
+    """
+    Yield (user_id, quiz_id, score, completed_at) for archived then live
+    results, oldest first.
+    """
+    from app.services import archive
+
+    if archive.np is not None:
+        directory = archive.shard_directory(settings.RESULTS_ARCHIVE_DIR, shard_of(db))
+        for _, path in archive.list_archives(directory):
+            data = archive.load_archive(path)
+            if user_ids is not None:
+                data = data[archive.np.isin(data["user_id"], list(user_ids))]
+            for user_id, quiz_id, score, completed_at in zip(
+                data["user_id"].tolist(),
+                data["quiz_id"].tolist(),
+                data["score"].tolist(),
+                data["completed_at"].tolist(),
+            ):
+                yield user_id, quiz_id, score, completed_at.replace(tzinfo=timezone.utc)
+
+    query = select(
+        UserQuizResult.user_id,
+        UserQuizResult.quiz_id,
+        UserQuizResult.score,
+        UserQuizResult.completed_at,
+    ).order_by(UserQuizResult.completed_at)
+    if user_ids is not None:
+        query = query.where(UserQuizResult.user_id.in_(user_ids))
+    yield from db.execute(query.execution_options(yield_per=10_000))
+
+
+def rebuild_rollups(db: Session, user_ids: Optional[Sequence[int]] = None) -> int:
+    """
+    Recompute the rollups from scratch (all users or `user_ids`),
+    including archived months. Returns the number of results folded in.
+    """
+    pairs: Dict[Tuple[int, int], dict] = {}
+    users: Dict[int, dict] = {}
+    count = 0
+    for user_id, quiz_id, score, completed_at in _iter_results(db, user_ids):
+        count += 1
+        _fold_pair(pairs, user_id, quiz_id, score, completed_at)
+
+        user = users.setdefault(user_id, {
+            "user_id": user_id,
+            "attempts": 0,
+            "total_score": 0,
+            "current_streak": 0,
+            "longest_streak": 0,
+            "last_active_on": None,
+        })
+        user["attempts"] += 1
+        user["total_score"] += score
+        day = _utc_day(completed_at)
+        if day != user["last_active_on"]:
+            if user["last_active_on"] == day - timedelta(days=1):
+                user["current_streak"] += 1
+            else:
+                user["current_streak"] = 1
+            user["longest_streak"] = max(user["longest_streak"], user["current_streak"])
+            user["last_active_on"] = day
+
+    for user in users.values():
+        user["average_score"] = user["total_score"] / user["attempts"]
+
+    stats_delete = delete(UserQuizStats)
+    progress_delete = delete(UserProgress)
+    if user_ids is not None:
+        stats_delete = stats_delete.where(UserQuizStats.user_id.in_(user_ids))
+        progress_delete = progress_delete.where(UserProgress.user_id.in_(user_ids))
+    db.execute(stats_delete)
+    db.execute(progress_delete)
+    if pairs:
+        db.execute(insert(UserQuizStats), list(pairs.values()))
+        db.execute(insert(UserProgress), list(users.values()))
+    db.commit()
+    return count
+
+
+def clear_rollup_caches() -> None:
+    """
+    Drop cached leaderboards and distributions after the rollups were
+    rebuilt, in this worker and (through the shared store) every other one.
+    """
+    leaderboard_cache.clear()
+    distribution_cache.clear()
+    store = get_shared_store()
+    if store:
+        store.append(REBUILDS_NAMESPACE, "all", datetime.now(timezone.utc).isoformat())
+
+
+def _read_rebuilds() -> None:
+    # Rebuilds in other workers, broadcast through the shared store
+    global _rebuilds_offset
+    store = get_shared_store()
+    if store is None:
+        return
+    offset = store.log_size(REBUILDS_NAMESPACE, "all")
+    if offset != _rebuilds_offset:
+        leaderboard_cache.clear()
+        distribution_cache.clear()
+        _rebuilds_offset = offset
+
+
+def _load_score_distribution(db: Session) -> array:
+    return array("d", db.scalars(
+        select(UserProgress.average_score)
+        # Through users so a tenant-bound session ranks within its organization
+        .join(User, User.id == UserProgress.user_id)
+        .order_by(UserProgress.average_score)
+    ))
+
+
+def get_score_distribution(db: Session) -> array:
+    """
+    Sorted average scores of an organization's players, for percentiles.
+
+    Cached for PERCENTILE_CACHE_SECONDS, or until the rollups are rebuilt,
+    so summaries do not count every player on each read; concurrent misses
+    share one load.
+    """
+    _read_rebuilds()
+    key = (shard_of(db), db.info.get("org_id"))
+    averages = distribution_cache.get(key)
+    if averages is None:
+        def load() -> array:
+            loaded = _load_score_distribution(db)
+            distribution_cache.set(key, loaded)
+            return loaded
+
+        averages, _ = distribution_flights.do(key, load)
+    return averages
+
+
+@query_budget(3)
+def get_summary(db: Session, user_id: int) -> dict:
+    """
+    Dashboard for one player, read from the rollup tables only.
+    """
+    progress = db.get(UserProgress, user_id)
+    if progress is None:
+        return {
+            "attempts": 0,
+            "quizzes_played": 0,
+            "average_score": None,
+            "current_streak": 0,
+            "longest_streak": 0,
+            "last_active_on": None,
+            "percentile": None,
+            "quizzes": [],
+        }
+
+    rows = db.execute(
+        select(UserQuizStats, Quiz.title)
+        .join(Quiz, Quiz.id == UserQuizStats.quiz_id)
+        .where(UserQuizStats.user_id == user_id)
+        .order_by(UserQuizStats.last_completed_at.desc(), UserQuizStats.quiz_id)
+    ).all()
+    quizzes = [
+        {
+            "quiz_id": stats.quiz_id,
+            "title": title,
+            "attempts": stats.attempts,
+            "best_score": stats.best_score,
+            "last_score": stats.last_score,
+            "average_score": stats.total_score / stats.attempts,
+            "last_completed_at": stats.last_completed_at,
+        }
+        for stats, title in rows
+    ]
+
+    # The cached distribution may predate this player's latest results, or
+    # their first: rank against the other entries, counting an entry equal
+    # to the player's current average as theirs
+    averages = get_score_distribution(db)
+    below = bisect_left(averages, progress.average_score)
+    others = len(averages)
+    if below < others and averages[below] == progress.average_score:
+        others -= 1
+
+    # A streak is still current if the player was active today or yesterday
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    current_streak = progress.current_streak
+    if progress.last_active_on is None or progress.last_active_on < yesterday:
+        current_streak = 0
+
+    return {
+        "attempts": progress.attempts,
+        "quizzes_played": len(quizzes),
+        "average_score": progress.average_score,
+        "current_streak": current_streak,
+        "longest_streak": progress.longest_streak,
+        "last_active_on": progress.last_active_on,
+        # Share of the other players with a lower average score
+        "percentile": min(100.0, 100.0 * below / others) if others else None,
+        "quizzes": quizzes,
+    }
+
+
+@query_budget(2)
+def _load_leaderboard(db: Session, quiz_id: int, limit: int) -> List[dict]:
+    if db.get(Quiz, quiz_id) is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    rows = db.execute(
+        select(UserQuizStats, User.username)
+        .join(User, User.id == UserQuizStats.user_id)
+        .where(UserQuizStats.quiz_id == quiz_id)
+        # Ties go to whoever got there with fewer attempts
+        .order_by(UserQuizStats.best_score.desc(), UserQuizStats.attempts, UserQuizStats.user_id)
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "rank": rank,
+            "user_id": stats.user_id,
+            "username": username,
+            "best_score": stats.best_score,
+            "attempts": stats.attempts,
+        }
+        for rank, (stats, username) in enumerate(rows, start=1)
+    ]
+
+
+def get_leaderboard(db: Session, quiz_id: int, limit: int = 10) -> List[dict]:
+    """
+    Top players of a quiz by best score, from the rollups.
+
+    Cached for LEADERBOARD_CACHE_SECONDS, or until the rollups are rebuilt;
+    concurrent misses share one load.
+    """
+    # Quiz ids are only unique within a shard, and the 404 for another
+    # organization's quiz only happens on a miss: key by both
+    _read_rebuilds()
+    key = (shard_of(db), db.info.get("org_id"), quiz_id, limit)
+    board = leaderboard_cache.get(key)
+    if board is None:
+        def load() -> List[dict]:
+            loaded = _load_leaderboard(db, quiz_id, limit)
+            leaderboard_cache.set(key, loaded)
+            return loaded
+
+        board, _ = leaderboard_flights.do(key, load)
+    return board
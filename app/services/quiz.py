@@ -1,202 +1,448 @@
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from fastapi import HTTPException
+from sqlalchemy import Row, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
+from app.db.bulk import insert_returning, returning_insert_cost
+from app.db.instrumentation import query_budget
+from app.db.projection import select_for
+from app.db.session import shard_of
+from app.db.tenancy import org_id_of
+from app.models.quiz import Quiz, Question, Answer, SubmissionKey, UserQuizResult
 from app.models.user import User
-from app.models.quiz import Quiz, Question, Answer, QuizResult
+from app.core import events
+from app.core.idempotency import KeyResultArchived, KeyReused
 from app.schemas.quiz import (
-    QuizCreate, 
-    QuestionCreate, 
-    AnswerCreate, 
-    QuizSubmission, 
-    QuizWithQuestions
+    QuizCreate,
+    QuizSubmission,
+    QuizSummary,
+    QuizUpdate,
+    QuestionUpsert,
+    UserQuizResult as UserQuizResultSchema,
 )
+from app.services.delivery import (
+    build_paper,
+    get_pool,
+    score_paper,
+    target_difficulties,
+    target_from_token,
+)
+from app.services.progress import apply_results
+
 
-# Quiz CRUD operations
-def get_quizzes(db: Session, skip: int = 0, limit: int = 100) -> List[Quiz]:
-    return db.query(Quiz).order_by(desc(Quiz.created_at)).offset(skip).limit(limit).all()
+# Quiz reads
+@query_budget(1)
+def get_quizzes(db: Session, skip: int = 0, limit: int = 100) -> List[Row]:
+    """
+    Active quizzes as rows of the QuizSummary columns, not ORM entities.
+    """
+    return db.execute(
+        select_for(QuizSummary, Quiz)
+        .where(Quiz.is_active == True)
+        .order_by(Quiz.id)
+        .offset(skip)
+        .limit(limit)
+    ).all()
 
-def get_quiz(db: Session, quiz_id: int) -> Optional[Quiz]:
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+
+@query_budget(1)
+def get_quiz(db: Session, quiz_id: int, active_only: bool = True) -> Quiz:
+    query = db.query(Quiz).filter(Quiz.id == quiz_id)
+    if active_only:
+        query = query.filter(Quiz.is_active == True)
+    quiz = query.first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     return quiz
 
-def get_quiz_with_questions(db: Session, quiz_id: int) -> QuizWithQuestions:
-    quiz = get_quiz(db, quiz_id)
-    
-    # Eager load questions and answers
-    questions = db.query(Question).filter(Question.quiz_id == quiz_id).all()
-    
-    # Format as QuizWithQuestions schema
-    quiz_with_questions = QuizWithQuestions(
-        id=quiz.id,
-        title=quiz.title,
-        description=quiz.description,
-        created_at=quiz.created_at,
-        user_id=quiz.user_id,
-        questions=[]
+
+@query_budget(3)
+def get_quizzes_with_tree(db: Session, ids: Sequence[int]) -> List[Quiz]:
+    """
+    Load quizzes with their questions and answers in three queries,
+    returned in the order of `ids`.
+    """
+    quizzes = (
+        db.query(Quiz)
+        .options(selectinload(Quiz.questions).selectinload(Question.answers))
+        .filter(Quiz.id.in_(ids))
+        .all()
     )
-    
-    for question in questions:
-        answers = db.query(Answer).filter(Answer.question_id == question.id).all()
-        
-        question_dict = {
-            "id": question.id,
-            "text": question.text,
-            "answers": []
-        }
-        
-        for answer in answers:
-            answer_dict = {
-                "id": answer.id,
-                "text": answer.text,
-                "is_correct": answer.is_correct
-            }
-            question_dict["answers"].append(answer_dict)
-        
-        quiz_with_questions.questions.append(question_dict)
-    
-    return quiz_with_questions
-
-def create_quiz(db: Session, quiz_create: QuizCreate, user_id: int) -> Quiz:
-    # Create quiz
-    db_quiz = Quiz(
-        title=quiz_create.title,
-        description=quiz_create.description,
-        user_id=user_id
+    by_id = {quiz.id: quiz for quiz in quizzes}
+    return [by_id[quiz_id] for quiz_id in ids if quiz_id in by_id]
+
+
+# Quiz writes
+def _question_values(q_data, position: int) -> dict:
+    return {
+        "text": q_data.text,
+        "order": q_data.order if q_data.order is not None else position,
+        "difficulty": q_data.difficulty or 1,
+    }
+
+
+def _create_budget(db: Session, quiz_in: QuizCreate, user_id: int) -> int:
+    # quiz insert + tree reload, plus one statement per page of question
+    # and answer inserts (so 6 for any realistic quiz)
+    answers = sum(len(q.answers) for q in quiz_in.questions)
+    return (
+        4
+        + returning_insert_cost(db, len(quiz_in.questions))
+        + returning_insert_cost(db, answers)
     )
-    db.add(db_quiz)
-    db.commit()
-    db.refresh(db_quiz)
-    
-    # Create questions and answers
-    for question_create in quiz_create.questions:
-        db_question = Question(
-            text=question_create.text,
-            quiz_id=db_quiz.id
-        )
-        db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
-        
-        for answer_create in question_create.answers:
-            db_answer = Answer(
-                text=answer_create.text,
-                is_correct=answer_create.is_correct,
-                question_id=db_question.id
-            )
-            db.add(db_answer)
-    
+
+
+@query_budget(_create_budget)
+def create_quiz(db: Session, quiz_in: QuizCreate, user_id: int) -> Quiz:
+    """
+    Insert a quiz tree with one INSERT per table (per 1000 rows) and one
+    commit.
+    """
+    quiz_id = db.scalar(insert(Quiz).returning(Quiz.id).values(
+        title=quiz_in.title,
+        description=quiz_in.description,
+        created_by=user_id,
+        org_id=org_id_of(db),
+        delivery_mode=quiz_in.delivery_mode.value,
+        sample_size=quiz_in.sample_size,
+    ))
+    if quiz_in.questions:
+        question_ids = insert_returning(db, Question, [
+            {"quiz_id": quiz_id, **_question_values(q_data, position)}
+            for position, q_data in enumerate(quiz_in.questions)
+        ], Question.id)
+        answers = [
+            {"question_id": question_id, "text": a_data.text, "is_correct": a_data.is_correct}
+            for (question_id,), q_data in zip(question_ids, quiz_in.questions)
+            for a_data in q_data.answers
+        ]
+        if answers:
+            db.execute(insert(Answer), answers)
     db.commit()
-    return db_quiz
+    events.publish(events.QUIZ_CHANGED, quiz_id=quiz_id, shard=shard_of(db))
+    return get_quizzes_with_tree(db, [quiz_id])[0]
+
 
-def update_quiz(db: Session, quiz_id: int, quiz_update: QuizCreate, user_id: int) -> Quiz:
-    db_quiz = get_quiz(db, quiz_id)
-    
-    # Check if user is the owner of the quiz
-    if db_quiz.user_id != user_id:
+def check_can_edit(quiz: Quiz, user: User) -> None:
+    # Only the creator or an admin can change the quiz
+    if quiz.created_by != user.id and not user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    
-    # Update quiz attributes
-    for key, value in quiz_update.dict(exclude={"questions"}).items():
-        setattr(db_quiz, key, value)
-    
-    # Remove existing questions and answers
-    questions = db.query(Question).filter(Question.quiz_id == quiz_id).all()
-    for question in questions:
-        db.query(Answer).filter(Answer.question_id == question.id).delete()
-    db.query(Question).filter(Question.quiz_id == quiz_id).delete()
-    
-    # Create new questions and answers
-    for question_create in quiz_update.questions:
-        db_question = Question(
-            text=question_create.text,
-            quiz_id=db_quiz.id
+
+
+def _claim_ids(items) -> set:
+    """
+    Ids the incoming items refer to; an id given twice is rejected rather
+    than merging both items into one row.
+    """
+    ids = set()
+    for item in items:
+        if item.id is None:
+            continue
+        if item.id in ids:
+            raise HTTPException(status_code=400, detail=f"Repeated id {item.id}")
+        ids.add(item.id)
+    return ids
+
+
+def _match(existing: Dict[int, object], item_id: Optional[int], text: str, taken: set):
+    """
+    Find the stored row an incoming item refers to: by id when given,
+    otherwise the first row with the same text that is neither matched yet
+    nor referenced by id elsewhere in the tree.
+    """
+    if item_id is not None:
+        row = existing.get(item_id)
+        if row is None:
+            raise HTTPException(status_code=400, detail=f"Unknown id {item_id}")
+        return row
+    for row in existing.values():
+        if row.id not in taken and row.text == text:
+            return row
+    return None
+
+
+def _replace_budget(
+    db: Session, quiz: Quiz, tree: Sequence[QuestionUpsert], values: Optional[dict] = None
+) -> int:
+    # tree load + one statement per bulk operation, plus a page of new
+    # question inserts
+    return 8 + returning_insert_cost(db, len(tree))
+
+
+@query_budget(_replace_budget)
+def replace_quiz_questions(
+    db: Session,
+    quiz: Quiz,
+    tree: Sequence[QuestionUpsert],
+    values: Optional[dict] = None,
+) -> Quiz:
+    """
+    Sync a quiz's questions and answers with `tree` by diffing stored rows.
+
+    Matched rows keep their ids (so per-answer history stays valid) and are
+    updated only when a field changed; everything else is one bulk INSERT,
+    UPDATE or DELETE per table. The quiz row is updated once, with `values`
+    and a new `updated_at`; the caller owns the commit.
+    """
+    stored = (
+        db.query(Question)
+        .options(selectinload(Question.answers))
+        .filter(Question.quiz_id == quiz.id)
+        .all()
+    )
+    questions = {q.id: q for q in stored}
+    answers = {a.id: a for q in stored for a in q.answers}
+
+    question_updates, answer_updates, answer_inserts = [], [], []
+    new_questions: List[Tuple[dict, Sequence]] = []
+    # Ids named in the tree are claimed up front so text matching skips them
+    kept_questions = _claim_ids(tree)
+    kept_answers = _claim_ids(a_data for q_data in tree for a_data in q_data.answers)
+
+    for position, q_data in enumerate(tree):
+        q_values = _question_values(q_data, position)
+        question = _match(questions, q_data.id, q_data.text, kept_questions)
+        if question is None:
+            # A new question has no answers to refer to yet
+            for a_data in q_data.answers:
+                if a_data.id is not None:
+                    raise HTTPException(status_code=400, detail=f"Unknown id {a_data.id}")
+            new_questions.append(({"quiz_id": quiz.id, **q_values}, q_data.answers))
+            continue
+
+        kept_questions.add(question.id)
+        if any(getattr(question, key) != value for key, value in q_values.items()):
+            question_updates.append({"id": question.id, **q_values})
+
+        own_answers = {a.id: a for a in question.answers}
+        for a_data in q_data.answers:
+            if a_data.id is not None and a_data.id not in own_answers:
+                raise HTTPException(status_code=400, detail=f"Unknown id {a_data.id}")
+            answer = _match(own_answers, a_data.id, a_data.text, kept_answers)
+            a_values = {"text": a_data.text, "is_correct": a_data.is_correct}
+            if answer is None:
+                answer_inserts.append({"question_id": question.id, **a_values})
+                continue
+            kept_answers.add(answer.id)
+            if answer.text != a_data.text or answer.is_correct != a_data.is_correct:
+                answer_updates.append({"id": answer.id, **a_values})
+
+    if new_questions:
+        new_ids = insert_returning(
+            db, Question, [q_values for q_values, _ in new_questions], Question.id
         )
-        db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
-        
-        for answer_create in question_create.answers:
-            db_answer = Answer(
-                text=answer_create.text,
-                is_correct=answer_create.is_correct,
-                question_id=db_question.id
+        for (question_id,), (_, q_answers) in zip(new_ids, new_questions):
+            answer_inserts.extend(
+                {"question_id": question_id, "text": a.text, "is_correct": a.is_correct}
+                for a in q_answers
             )
-            db.add(db_answer)
-    
+    if question_updates:
+        db.execute(update(Question), question_updates)
+    if answer_updates:
+        db.execute(update(Answer), answer_updates)
+    if answer_inserts:
+        db.execute(insert(Answer), answer_inserts)
+
+    stale_answers = set(answers) - kept_answers
+    stale_questions = set(questions) - kept_questions
+    if stale_answers:
+        db.execute(delete(Answer).where(Answer.id.in_(stale_answers)))
+    if stale_questions:
+        db.execute(delete(Question).where(Question.id.in_(stale_questions)))
+
+    _touch_quiz(db, quiz, values)
+    return quiz
+
+
+def _touch_quiz(db: Session, quiz: Quiz, values: Optional[dict] = None) -> None:
+    db.execute(update(Quiz).where(Quiz.id == quiz.id).values(
+        **(values or {}), updated_at=datetime.now(timezone.utc)
+    ))
+    # Bulk statements bypass the identity map
+    db.expire_all()
+
+
+def _update_budget(db: Session, quiz: Quiz, quiz_in: QuizUpdate, user: User) -> int:
+    if quiz_in.questions is None:
+        return 4
+    return 3 + _replace_budget(db, quiz, quiz_in.questions)
+
+
+@query_budget(_update_budget)
+def update_quiz(db: Session, quiz: Quiz, quiz_in: QuizUpdate, user: User) -> Quiz:
+    """
+    Apply a partial update in one transaction and invalidate cached copies.
+    """
+    check_can_edit(quiz, user)
+    quiz_id = quiz.id
+    values = quiz_in.model_dump(exclude_unset=True, exclude={"questions"})
+    # title and delivery_mode cannot be cleared
+    for key in ("title", "delivery_mode"):
+        if key in values and values[key] is None:
+            del values[key]
+    if "delivery_mode" in values:
+        values["delivery_mode"] = values["delivery_mode"].value
+
+    if quiz_in.questions is not None:
+        replace_quiz_questions(db, quiz, quiz_in.questions, values)
+    else:
+        _touch_quiz(db, quiz, values)
     db.commit()
-    db.refresh(db_quiz)
-    return db_quiz
-
-def delete_quiz(db: Session, quiz_id: int, user_id: int) -> Dict[str, str]:
-    db_quiz = get_quiz(db, quiz_id)
-    
-    # Check if user is the owner of the quiz
-    if db_quiz.user_id != user_id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    
-    # Delete related questions and answers
-    questions = db.query(Question).filter(Question.quiz_id == quiz_id).all()
-    for question in questions:
-        db.query(Answer).filter(Answer.question_id == question.id).delete()
-    db.query(Question).filter(Question.quiz_id == quiz_id).delete()
-    
-    # Delete quiz
-    db.delete(db_quiz)
+
+    events.publish(events.QUIZ_CHANGED, quiz_id=quiz_id, shard=shard_of(db))
+    return get_quizzes_with_tree(db, [quiz_id])[0]
+
+
+@query_budget(1)
+def delete_quiz(db: Session, quiz: Quiz, user: User) -> None:
+    """
+    Soft delete a quiz.
+    """
+    check_can_edit(quiz, user)
+    quiz_id = quiz.id
+    quiz.is_active = False
     db.commit()
-    
-    return {"message": "Quiz deleted successfully"}
-
-def submit_quiz(db: Session, quiz_id: int, submission: QuizSubmission, user_id: int) -> Dict[str, Any]:
-    quiz = get_quiz(db, quiz_id)
-    
-    # Get all questions for this quiz
-    questions = db.query(Question).filter(Question.quiz_id == quiz_id).all()
-    
-    # Validate all questions were answered
-    if len(submission.answers) != len(questions):
-        raise HTTPException(status_code=400, detail="All questions must be answered")
-    
-    # Calculate score
-    total_questions = len(questions)
-    correct_answers = 0
-    
-    for answer_submission in submission.answers:
-        # Get correct answer for this question
-        correct_answer = db.query(Answer).filter(
-            Answer.question_id == answer_submission.question_id,
-            Answer.is_correct == True
-        ).first()
-        
-        if not correct_answer:
-            raise HTTPException(status_code=500, detail="Question has no correct answer")
-        
-        if answer_submission.answer_id == correct_answer.id:
-            correct_answers += 1
-    
-    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-    
-    # Save quiz result
-    quiz_result = QuizResult(
-        quiz_id=quiz_id,
-        user_id=user_id,
-        score=score
+    events.publish(events.QUIZ_CHANGED, quiz_id=quiz_id, shard=shard_of(db))
+
+
+# Submissions and results
+def _score_budget(db: Session, batch, keys=None) -> int:
+    # quizzes + targets + result inserts + two rollup upserts (+ key insert),
+    # plus a cold pool load per quiz
+    return (
+        4
+        + (1 if keys else 0)
+        + 2 * len({submission.quiz_id for _, submission in batch})
+        + returning_insert_cost(db, len(batch))
     )
-    db.add(quiz_result)
-    db.commit()
-    db.refresh(quiz_result)
-    
-    return {
-        "quiz_id": quiz_id,
-        "user_id": user_id,
-        "score": score,
-        "correct_answers": correct_answers,
-        "total_questions": total_questions
+
+
+@query_budget(_score_budget)
+def score_submissions(
+    db: Session,
+    batch: Sequence[Tuple[int, QuizSubmission]],
+    keys: Optional[Sequence[Tuple[str, str]]] = None,
+) -> List[UserQuizResult]:
+    """
+    Score (user_id, submission) pairs and store all results in one INSERT.
+
+    Each player's paper is regenerated from the cached question pool, so
+    scoring needs no per-answer queries. `keys` optionally holds an
+    (idempotency key, request hash) pair per submission, stored in the same
+    transaction; a duplicate key raises IntegrityError.
+    """
+    quiz_ids = {submission.quiz_id for _, submission in batch}
+    quizzes = {
+        quiz.id: quiz
+        for quiz in db.query(Quiz).filter(Quiz.id.in_(quiz_ids), Quiz.is_active == True)
     }
+    if len(quizzes) != len(quiz_ids):
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    pools = {quiz_id: get_pool(db, quiz) for quiz_id, quiz in quizzes.items()}
+    # Adaptive papers are rebuilt for the target they were issued with;
+    # only submissions without a valid paper token fall back to the live one
+    issued = {}
+    for index, (user_id, submission) in enumerate(batch):
+        pool = pools[submission.quiz_id]
+        if pool.delivery_mode == "adaptive":
+            issued[index] = target_from_token(pool, user_id, submission.paper_token)
+    live_users = {batch[index][0] for index, target in issued.items() if target is None}
+    targets = target_difficulties(db, live_users) if live_users else {}
+
+    rows = []
+    for index, (user_id, submission) in enumerate(batch):
+        pool = pools[submission.quiz_id]
+        target = issued.get(index)
+        if target is None:
+            target = targets.get(user_id)
+        paper = build_paper(pool, user_id, target)
+        answer_map = {a.question_id: a.answer_id for a in submission.answers}
+        rows.append({
+            "user_id": user_id,
+            "quiz_id": submission.quiz_id,
+            "org_id": org_id_of(db),
+            "score": score_paper(pool, paper, answer_map),
+        })
+
+    results = [result for (result,) in insert_returning(db, UserQuizResult, rows)]
+    if keys:
+        db.execute(insert(SubmissionKey), [
+            {"user_id": result.user_id, "key": key, "request_hash": request_hash, "result_id": result.id}
+            for result, (key, request_hash) in zip(results, keys)
+        ])
+    # Rollups are updated in the same transaction as the results
+    apply_results(db, results)
+    # Detach so the committed rows stay loaded instead of being refreshed one by one
+    for result in results:
+        db.expunge(result)
+    db.commit()
+    return results
+
+
+@query_budget(1)
+def get_result_by_key(
+    db: Session, user_id: int, key: str
+) -> Optional[Tuple[str, Optional[UserQuizResult]]]:
+    """
+    (request hash, result) stored for a user's Idempotency-Key, if any. The
+    result is None once it has been archived: the key outlives its row.
+    """
+    row = db.execute(
+        select(SubmissionKey.request_hash, UserQuizResult)
+        .outerjoin(UserQuizResult, UserQuizResult.id == SubmissionKey.result_id)
+        .where(SubmissionKey.user_id == user_id, SubmissionKey.key == key)
+    ).first()
+    return tuple(row) if row else None
+
+
+def submit_idempotent(
+    db: Session, user_id: int, submission: QuizSubmission, key: str, request_hash: str
+) -> Tuple[UserQuizResult, bool]:
+    """
+    Score a submission once per (user, key); returns (result, replayed).
+
+    Covers retries that reach another worker process or arrive after the
+    in-memory store forgot the key; the primary key on submission_keys
+    settles concurrent duplicates. A key whose result has since been
+    archived is answered with 409 rather than scored again.
+    """
+    stored = get_result_by_key(db, user_id, key)
+    if stored is None:
+        try:
+            [result] = score_submissions(db, [(user_id, submission)], keys=[(key, request_hash)])
+            return result, False
+        except IntegrityError:
+            # Lost the race to a concurrent duplicate: answer with its result
+            db.rollback()
+            stored = get_result_by_key(db, user_id, key)
+            if stored is None:
+                raise
+    stored_hash, result = stored
+    if stored_hash != request_hash:
+        raise KeyReused()
+    if result is None:
+        raise KeyResultArchived()
+    return result, True
+
 
-def get_user_quiz_results(db: Session, user_id: int) -> List[QuizResult]:
-    return db.query(QuizResult).filter(QuizResult.user_id == user_id).all()
\ No newline at end of file
+@query_budget(1)
+def get_user_quiz_results(
+    db: Session,
+    user_id: int,
+    quiz_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Row]:
+    query = select_for(UserQuizResultSchema, UserQuizResult).where(UserQuizResult.user_id == user_id)
+    if quiz_id is not None:
+        query = query.where(UserQuizResult.quiz_id == quiz_id)
+    # Bounds on completed_at let PostgreSQL prune monthly partitions
+    if start is not None:
+        query = query.where(UserQuizResult.completed_at >= start)
+    if end is not None:
+        query = query.where(UserQuizResult.completed_at < end)
+    return db.execute(query.order_by(UserQuizResult.id)).all()
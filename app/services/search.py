@@ -0,0 +1,379 @@
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Row, desc, func, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from app.core import events
+from app.core.config import settings
+from app.core.shared_store import LogTruncated, get_shared_store
+from app.db.projection import select_for
+from app.db.session import DEFAULT_SHARD, shard_of
+from app.models.quiz import Quiz, Question, search_vector
+from app.schemas.quiz import QuizSummary
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# (quiz_id, title, description, question texts)
+Document = Tuple[int, Optional[str], Optional[str], Iterable[str]]
+
+# Relative weight of a term found in each field
+FIELD_WEIGHTS = {"title": 3.0, "description": 2.0, "question": 1.0}
+
+# Minimum trigram similarity for a fuzzy term match
+FUZZY_THRESHOLD = 0.4
+# Fuzzy candidates considered per query term
+FUZZY_CANDIDATES = 5
+# Terms found in more than this share of quizzes are ignored when the query
+# has rarer terms (they barely change the ranking but dominate the cost)
+COMMON_TERM_RATIO = 0.2
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    In-process inverted index over quiz titles, descriptions and questions.
+
+    Postings map a token to {quiz_id: field-weighted term frequency}. Fuzzy
+    matching works on the vocabulary, not the documents: each token is
+    indexed by its trigrams, so a misspelt query term is expanded to the
+    closest known tokens before postings are scored.
+    """
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.vocabulary_trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.doc_tokens: Dict[int, Set[str]] = {}
+        # Heaviest postings of common tokens, dropped when the token changes
+        self.top_postings: Dict[str, List[Tuple[int, float]]] = {}
+        # Quizzes changed since they were indexed
+        self.dirty: Set[int] = set()
+        # How far the shared change log of the shard has been read
+        self.log_offset = 0
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    def add(
+        self,
+        quiz_id: int,
+        title: Optional[str],
+        description: Optional[str],
+        questions: Iterable[str] = (),
+    ) -> None:
+        weights: Dict[str, float] = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += FIELD_WEIGHTS["title"]
+        for token in tokenize(description):
+            weights[token] += FIELD_WEIGHTS["description"]
+        for text in questions:
+            for token in tokenize(text):
+                weights[token] += FIELD_WEIGHTS["question"]
+
+        with self._lock:
+            self._remove(quiz_id)
+            for token, weight in weights.items():
+                postings = self.postings[token]
+                if not postings:
+                    for gram in trigrams(token):
+                        self.vocabulary_trigrams[gram].add(token)
+                postings[quiz_id] = weight
+                self.top_postings.pop(token, None)
+            self.doc_tokens[quiz_id] = set(weights)
+
+    def remove(self, quiz_id: int) -> None:
+        with self._lock:
+            self._remove(quiz_id)
+
+    def replace(self, documents: Iterable[Document], log_offset: int = 0) -> None:
+        """
+        Rebuild the index from `documents`, dropping everything indexed and
+        every pending change; `log_offset` is where reading the shared
+        change log resumes. Changes queued meanwhile wait for the rebuild
+        and are applied on top of it.
+        """
+        with self._lock:
+            self.postings.clear()
+            self.vocabulary_trigrams.clear()
+            self.doc_tokens.clear()
+            self.top_postings.clear()
+            self.dirty.clear()
+            for document in documents:
+                self.add(*document)
+            self.log_offset = log_offset
+            self.loaded = True
+
+    def invalidate(self, quiz_ids: Iterable[int], log_offset: Optional[int] = None) -> None:
+        """
+        Queue quizzes for reindexing, and record how far the shared change
+        log has been read if they came from it.
+        """
+        with self._lock:
+            self.dirty.update(quiz_ids)
+            if log_offset is not None:
+                self.log_offset = log_offset
+
+    def reindex(self, documents: Callable[[Set[int]], Iterable[Document]]) -> int:
+        """
+        Reindex the queued quizzes from `documents(quiz_ids)`; queued quizzes
+        it does not return are removed. Returns how many were queued.
+        """
+        with self._lock:
+            if not self.dirty:
+                return 0
+            dirty, self.dirty = self.dirty, set()
+            found = set()
+            for document in documents(dirty):
+                self.add(*document)
+                found.add(document[0])
+            for quiz_id in dirty - found:
+                self._remove(quiz_id)
+            return len(dirty)
+
+    def _remove(self, quiz_id: int) -> None:
+        for token in self.doc_tokens.pop(quiz_id, ()):
+            postings = self.postings[token]
+            postings.pop(quiz_id, None)
+            self.top_postings.pop(token, None)
+            if not postings:
+                del self.postings[token]
+                for gram in trigrams(token):
+                    self.vocabulary_trigrams[gram].discard(token)
+
+    def expand(self, term: str) -> List[Tuple[str, float]]:
+        """
+        Known tokens matching `term`, with their similarity in (0, 1].
+        """
+        if term in self.postings:
+            return [(term, 1.0)]
+        grams = trigrams(term)
+        overlap: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for token in self.vocabulary_trigrams.get(gram, ()):
+                overlap[token] += 1
+        scored = []
+        for token, shared in overlap.items():
+            similarity = shared / (len(grams) + len(token) + 1 - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((token, similarity))
+        return heapq.nlargest(FUZZY_CANDIDATES, scored, key=lambda item: item[1])
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """
+        Return up to `limit` (quiz_id, score) pairs, best first.
+        """
+        with self._lock:
+            total = len(self.doc_tokens) or 1
+            matches = {}
+            for term in set(tokenize(query)):
+                for token, similarity in self.expand(term):
+                    postings = self.postings[token]
+                    boost = similarity * math.log(1 + total / len(postings))
+                    matches[token] = max(matches.get(token, 0.0), boost)
+
+            rare = {
+                token: boost
+                for token, boost in matches.items()
+                if len(self.postings[token]) <= total * COMMON_TERM_RATIO
+            }
+            scores: Dict[int, float] = defaultdict(float)
+            if rare:
+                for token, boost in rare.items():
+                    for quiz_id, weight in self.postings[token].items():
+                        scores[quiz_id] += boost * weight
+            else:
+                # Only common terms: score the union of each term's heaviest
+                # postings instead of scanning most of the index
+                candidates = {
+                    quiz_id
+                    for token in matches
+                    for quiz_id, _ in self._top_postings(token, limit * 10)
+                }
+                for quiz_id in candidates:
+                    scores[quiz_id] = sum(
+                        boost * self.postings[token].get(quiz_id, 0.0)
+                        for token, boost in matches.items()
+                    )
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def _top_postings(self, token: str, count: int) -> List[Tuple[int, float]]:
+        top = self.top_postings.get(token)
+        if top is None or len(top) < min(count, len(self.postings[token])):
+            top = heapq.nlargest(count, self.postings[token].items(), key=lambda item: item[1])
+            self.top_postings[token] = top
+        return top
+
+
+# Shared-store log of changed quiz ids, one per shard
+CHANGES_NAMESPACE = "search_changes"
+
+# One index per (shard, organization): tenants only search their own quizzes
+_indexes: Dict[Tuple[str, Optional[int]], SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(db: Session) -> SearchIndex:
+    key = (shard_of(db), db.info.get("org_id"))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SearchIndex()
+        return _indexes[key]
+
+
+def _quiz_documents(db: Session, quiz_ids: Optional[Iterable[int]] = None) -> Iterable[Document]:
+    """
+    Yield the documents of active quizzes.
+    """
+    quiz_query = select(Quiz.id, Quiz.title, Quiz.description).where(Quiz.is_active == True)
+    question_query = select(Question.quiz_id, Question.text).join(Quiz).where(
+        Quiz.is_active == True
+    )
+    if quiz_ids is not None:
+        quiz_ids = list(quiz_ids)
+        quiz_query = quiz_query.where(Quiz.id.in_(quiz_ids))
+        question_query = question_query.where(Question.quiz_id.in_(quiz_ids))
+
+    questions: Dict[int, List[str]] = defaultdict(list)
+    for quiz_id, text in db.execute(question_query):
+        questions[quiz_id].append(text)
+    for quiz_id, title, description in db.execute(quiz_query):
+        yield quiz_id, title, description, questions.get(quiz_id, ())
+
+
+def _read_changes(db: Session, index: SearchIndex) -> None:
+    # Quizzes changed by other workers, broadcast through the shared store
+    store = get_shared_store()
+    if store is None:
+        return
+    try:
+        changed, offset = store.read_log(CHANGES_NAMESPACE, shard_of(db), index.log_offset)
+    except LogTruncated:
+        # Changes this index has not seen were dropped: only a full load
+        # can catch up
+        index.loaded = False
+        return
+    index.invalidate(changed, offset)
+
+
+def load_index(db: Session) -> None:
+    """
+    Build the in-memory index of the session's organization on first use,
+    then apply pending changes, including those made in other workers.
+
+    A full load also truncates the shard's change log once it outgrows
+    SEARCH_CHANGE_LOG_MAX_BYTES: the index no longer needs those records,
+    and other workers still behind them load in full too.
+    """
+    index = index_for(db)
+    if index.loaded:
+        _read_changes(db, index)
+    if not index.loaded:
+        store = get_shared_store()
+        # Changes from here on are applied on top of the load
+        offset = 0
+        if store:
+            offset = store.truncate_log(
+                CHANGES_NAMESPACE, shard_of(db), settings.SEARCH_CHANGE_LOG_MAX_BYTES
+            )
+        index.replace(_quiz_documents(db), offset)
+        return
+    index.reindex(lambda quiz_ids: _quiz_documents(db, quiz_ids))
+
+
+def mark_dirty(quiz_id: int, shard: str = DEFAULT_SHARD) -> None:
+    """
+    Queue a changed quiz for reindexing on the next search, in this worker
+    and (through the shared store) every other one.
+    """
+    with _indexes_lock:
+        indexes = [index for (index_shard, _), index in _indexes.items() if index_shard == shard]
+    # Indexes of other organizations on the shard simply won't find it
+    for index in indexes:
+        index.invalidate([quiz_id])
+    store = get_shared_store()
+    if store and store.append(CHANGES_NAMESPACE, shard, quiz_id) > settings.SEARCH_CHANGE_LOG_MAX_BYTES:
+        # The log has outgrown its limit: the next search here loads in full
+        # and truncates it
+        for index in indexes:
+            index.loaded = False
+
+
+events.subscribe(events.QUIZ_CHANGED, mark_dirty)
+
+
+# PostgreSQL full-text search; these expressions match the GIN indexes on
+# the models so the planner can use them
+def quiz_tsvector():
+    return search_vector(Quiz.title, Quiz.description)
+
+
+def question_tsvector():
+    return search_vector(Question.text)
+
+
+def _search_postgres(db: Session, query: str, limit: int) -> List[Tuple[Row, float]]:
+    tsquery = func.websearch_to_tsquery(literal_column("'english'"), query)
+    question_rank = (
+        select(
+            Question.quiz_id,
+            func.max(func.ts_rank(question_tsvector(), tsquery)).label("rank"),
+        )
+        .where(question_tsvector().op("@@")(tsquery))
+        .group_by(Question.quiz_id)
+        .subquery()
+    )
+    rank = (
+        func.ts_rank(quiz_tsvector(), tsquery) * 2
+        + func.coalesce(question_rank.c.rank, 0)
+    ).label("rank")
+    rows = db.execute(
+        select_for(QuizSummary, Quiz, rank)
+        .outerjoin(question_rank, question_rank.c.quiz_id == Quiz.id)
+        .where(
+            Quiz.is_active == True,
+            or_(quiz_tsvector().op("@@")(tsquery), question_rank.c.quiz_id.isnot(None)),
+        )
+        .order_by(desc(rank))
+        .limit(limit)
+    )
+    return [(quiz, float(quiz.rank)) for quiz in rows]
+
+
+def _search_memory(db: Session, query: str, limit: int) -> List[Tuple[Row, float]]:
+    load_index(db)
+    hits = index_for(db).search(query, limit)
+    if not hits:
+        return []
+    quizzes = {
+        quiz.id: quiz
+        for quiz in db.execute(
+            select_for(QuizSummary, Quiz).where(
+                Quiz.id.in_([quiz_id for quiz_id, _ in hits]), Quiz.is_active == True
+            )
+        )
+    }
+    return [(quizzes[quiz_id], score) for quiz_id, score in hits if quiz_id in quizzes]
+
+
+def search_quizzes(db: Session, query: str, limit: int = 20) -> List[Tuple[Row, float]]:
+    """
+    Ranked quiz search: tsvector/GIN on PostgreSQL, the in-memory index elsewhere.
+    Returns (row of the QuizSummary columns, score) pairs.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, query, limit)
+    return _search_memory(db, query, limit)
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import create_access_token, revoked_sessions
+from app.db.instrumentation import query_budget
+from app.db.session import engines, shard_session
+from app.db.tenancy import org_id_of
+from app.models.user import RefreshToken, User
+
+logger = logging.getLogger(__name__)
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def hash_token(token: str) -> str:
+    # Refresh tokens are 256 random bits: a fast hash is enough, no bcrypt
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timezone-aware columns back naive (in UTC)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _access_ttl() -> timedelta:
+    return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def issue_tokens(db: Session, user_id: int, family_id: Optional[str] = None) -> dict:
+    """
+    Add a new refresh token to the session `family_id` (a new session if
+    None) and return it with a matching access token. Does not commit.
+    """
+    family_id = family_id or secrets.token_hex(16)
+    # Prefixed with the organization so a refresh can be routed to its
+    # database without an access token (see tenancy.refresh_token_tenant)
+    refresh_token = f"{org_id_of(db)}.{secrets.token_urlsafe(32)}"
+    db.add(RefreshToken(
+        user_id=user_id,
+        family_id=family_id,
+        token_hash=hash_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    access_token = create_access_token(
+        # "org" routes later requests to the organization's database
+        data={"sub": str(user_id), "sid": family_id, "org": org_id_of(db)},
+        expires_delta=_access_ttl(),
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(_access_ttl().total_seconds()),
+    }
+
+
+@query_budget(1)
+def login(db: Session, user: User) -> dict:
+    """
+    Start a new session for an authenticated user.
+    """
+    tokens = issue_tokens(db, user.id)
+    db.commit()
+    return tokens
+
+
+@query_budget(1)
+def revoke_family(db: Session, family_id: str) -> None:
+    """
+    Revoke every refresh token of a session and, in memory, its access
+    tokens. Does not commit.
+    """
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    revoked_sessions.add(family_id, ttl=_access_ttl().total_seconds())
+
+
+@query_budget(3)
+def refresh(db: Session, refresh_token: str) -> dict:
+    """
+    Exchange a refresh token for a new access and refresh token pair.
+
+    The presented token is used up. Presenting it again is treated as theft:
+    the whole session is revoked, so both the thief and the legitimate
+    client have to log in again.
+    """
+    row = db.execute(
+        select(RefreshToken, User.is_active)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_token(refresh_token))
+    ).first()
+    if row is None:
+        raise _invalid_refresh_token()
+    token, is_active = row
+    now = datetime.now(timezone.utc)
+    if token.revoked_at is not None or _aware(token.expires_at) <= now or not is_active:
+        raise _invalid_refresh_token()
+
+    # Claim the token atomically, so two concurrent refreshes with the same
+    # token cannot both succeed
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == token.id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if not claimed:
+        logger.warning(
+            "Refresh token reuse for user %s; revoking session %s", token.user_id, token.family_id
+        )
+        revoke_family(db, token.family_id)
+        db.commit()
+        raise _invalid_refresh_token()
+
+    tokens = issue_tokens(db, token.user_id, token.family_id)
+    db.commit()
+    return tokens
+
+
+@query_budget(2)
+def logout(db: Session, refresh_token: str) -> None:
+    """
+    Revoke the session a refresh token belongs to. Unknown tokens are
+    ignored, so logging out twice is harmless.
+    """
+    family_id = db.scalar(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_token(refresh_token))
+    )
+    if family_id is not None:
+        revoke_family(db, family_id)
+        db.commit()
+
+
+def load_revocations(db: Session) -> int:
+    """
+    Add every session revoked recently enough for its access tokens to be
+    still valid to the in-memory revocation list, including revocations
+    made by other worker processes. Returns how many were loaded.
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        select(RefreshToken.family_id, func.max(RefreshToken.revoked_at))
+        .where(RefreshToken.revoked_at > now - _access_ttl())
+        .group_by(RefreshToken.family_id)
+    ).all()
+    for family_id, revoked_at in rows:
+        remaining = (_aware(revoked_at) + _access_ttl() - now).total_seconds()
+        if remaining > 0:
+            revoked_sessions.add(family_id, ttl=remaining)
+    return len(rows)
+
+
+def start_revocation_sync(interval: float) -> threading.Thread:
+    """
+    Load recent revocations now and then every `interval` seconds (0: only
+    once) in the background, so a logout handled by one worker process
+    reaches the others without adding a query to authenticated requests.
+
+    The same thread forgets revocations whose access tokens have all
+    expired, once per access token lifetime (pruning rebuilds the filter).
+    """
+    def run() -> None:
+        pruned_at = time.monotonic()
+        loaded = False
+        while True:
+            if interval > 0 or not loaded:
+                # Refresh tokens live in each organization's shard
+                for shard in engines:
+                    try:
+                        with shard_session(shard) as db:
+                            load_revocations(db)
+                    except Exception:
+                        logger.exception("Loading token revocations from %s failed", shard)
+                loaded = True
+            lifetime = _access_ttl().total_seconds()
+            if time.monotonic() - pruned_at >= lifetime:
+                revoked_sessions.prune()
+                pruned_at = time.monotonic()
+            time.sleep(interval if interval > 0 else lifetime)
+
+    thread = threading.Thread(target=run, name="revocation-sync", daemon=True)
+    thread.start()
+    return thread
@@ -1,111 +1,96 @@
-from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import HTTPException
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
-from app.models.user import User
-from app.schemas.user import UserCreate, UserInDB
 from app.core.config import settings
+from app.core.security import get_password_hash, revoked_sessions, verify_password
+from app.db.instrumentation import query_budget
+from app.db.tenancy import org_id_of
+from app.models.user import User
+from app.schemas.user import UserCreate
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
-
-# Password functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
 
 # User CRUD operations
+@query_budget(1)
 def get_user(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
+
+@query_budget(1)
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
+
+@query_budget(1)
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
-def create_user(db: Session, user: UserCreate) -> User:
-    # Check if user already exists
-    db_user = get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already taken")
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+
+@query_budget(1)
+def get_user_by_login(db: Session, login: str) -> Optional[User]:
+    """
+    Find a user by username or email in one query, preferring the username.
+    """
+    users = db.query(User).filter(
+        or_(User.username == login, User.email == login)
+    ).all()
+    for user in users:
+        if user.username == login:
+            return user
+    return users[0] if users else None
+
+
+@query_budget(3)
+def create_user(db: Session, user_in: UserCreate) -> User:
+    # Check username and email uniqueness in one query
+    existing = db.query(User).filter(
+        or_(User.username == user_in.username, User.email == user_in.email)
+    ).all()
+    for user in existing:
+        if user.username == user_in.username:
+            raise HTTPException(
+                status_code=400,
+                detail="The user with this username already exists in the system.",
+            )
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail="The user with this email already exists in the system.",
+        )
+
     db_user = User(
-        email=user.email,
-        username=user.username,
-        hashed_password=hashed_password
+        username=user_in.username,
+        email=user_in.email,
+        hashed_password=get_password_hash(user_in.password),
+        is_active=True,
+        org_id=org_id_of(db),
     )
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
+
+def authenticate_user(db: Session, login: str, password: str) -> Optional[User]:
+    user = get_user_by_login(db, login)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
         return None
     return user
 
-# JWT token functions
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = get_user(db, user_id=int(user_id))
-    if user is None:
-        raise credentials_exception
-    return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
-
-def get_optional_current_user(token: Optional[str] = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_optional_current_user(token: Optional[str], db: Session) -> Optional[User]:
     if token is None:
         return None
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("sid") in revoked_sessions:
             return None
-        user = get_user(db, user_id=int(user_id))
-        return user
-    except JWTError:
-        return None
\ No newline at end of file
+        return get_user(db, user_id=int(user_id))
+    except (JWTError, ValueError):
+        return None
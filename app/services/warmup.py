@@ -0,0 +1,242 @@
+import importlib
+import inspect
+import logging
+import pkgutil
+import threading
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import DEFAULT_SHARD, engines, shard_session
+from app.models.quiz import Quiz, UserQuizStats
+
+logger = logging.getLogger(__name__)
+
+STEPS = ("schemas", "db_pool", "quizzes", "search")
+
+
+class WarmupState:
+    """
+    Progress of the startup warm-up, reported by /healthz/ready.
+    """
+
+    def __init__(self) -> None:
+        self.status = "pending"
+        self.steps = {step: "pending" for step in STEPS}
+        self.quizzes_total = 0
+        self.quizzes_done = 0
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("done", "disabled")
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "steps": dict(self.steps),
+            "quizzes": f"{self.quizzes_done}/{self.quizzes_total}",
+            "attempts": self.attempts,
+            "error": self.error,
+            "duration": self.duration,
+        }
+
+
+state = WarmupState()
+
+
+def warm_schemas(app=None) -> int:
+    """
+    Make sure every schema in app.schemas is fully built, and build the
+    OpenAPI document so the first /docs request does not pay for it.
+    """
+    import app.schemas as schemas_package
+
+    built = 0
+    for module_info in pkgutil.iter_modules(schemas_package.__path__):
+        module = importlib.import_module(f"{schemas_package.__name__}.{module_info.name}")
+        for _, value in inspect.getmembers(module):
+            if inspect.isclass(value) and issubclass(value, BaseModel) and value is not BaseModel:
+                value.model_rebuild()
+                value.model_json_schema()
+                built += 1
+            elif isinstance(value, TypeAdapter):
+                value.json_schema()
+                built += 1
+    if app is not None:
+        app.openapi()
+    return built
+
+
+def warm_db_pool(connections: int) -> int:
+    """
+    Open `connections` pooled connections per shard at once so they stay in
+    the pool.
+    """
+    opened = []
+    try:
+        for shard_engine in engines.values():
+            size = getattr(shard_engine.pool, "size", lambda: connections)()
+            for _ in range(min(connections, size)):
+                conn = shard_engine.connect()
+                opened.append(conn)
+                conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+
+def popular_quiz_ids(db: Session, limit: int) -> List[int]:
+    """
+    The `limit` most attempted active quizzes, topped up with the newest.
+    """
+    ids = list(db.scalars(
+        select(UserQuizStats.quiz_id)
+        .join(Quiz, Quiz.id == UserQuizStats.quiz_id)
+        .where(Quiz.is_active == True)
+        .group_by(UserQuizStats.quiz_id)
+        .order_by(func.sum(UserQuizStats.attempts).desc())
+        .limit(limit)
+    ))
+    if len(ids) < limit:
+        ids += db.scalars(
+            select(Quiz.id)
+            .where(Quiz.is_active == True, Quiz.id.notin_(ids))
+            .order_by(Quiz.id.desc())
+            .limit(limit - len(ids))
+        )
+    return ids
+
+
+def warm_quizzes(db: Session, limit: int) -> int:
+    """
+    Load the question pools (quiz trees and answer keys) of popular quizzes
+    of the shard `db` is on.
+    """
+    from app.services.delivery import get_pool
+
+    quiz_ids = popular_quiz_ids(db, limit)
+    state.quizzes_total += len(quiz_ids)
+    done = 0
+    for quiz in db.query(Quiz).filter(Quiz.id.in_(quiz_ids)):
+        get_pool(db, quiz)
+        state.quizzes_done += 1
+        done += 1
+    return done
+
+
+def warm_all_quizzes(limit: int) -> int:
+    """
+    warm_quizzes() on every shard, `limit` quizzes each.
+    """
+    warmed = 0
+    for shard in engines:
+        with shard_session(shard) as db:
+            warmed += warm_quizzes(db, limit)
+    return warmed
+
+
+def warm_search() -> int:
+    """
+    Build the search index of every organization, so no search builds one
+    on the request path. PostgreSQL searches through its GIN indexes instead.
+    """
+    from app.models.organization import Organization
+    from app.services.search import load_index
+
+    with shard_session(DEFAULT_SHARD) as db:
+        orgs = db.execute(select(Organization.id, Organization.shard)).all()
+    built = 0
+    for org_id, shard in orgs:
+        if shard not in engines:
+            continue
+        with shard_session(shard, org_id) as db:
+            if db.get_bind().dialect.name != "postgresql":
+                load_index(db)
+                built += 1
+    return built
+
+
+def warmup_steps(app=None) -> dict:
+    return {
+        "schemas": lambda: warm_schemas(app),
+        "db_pool": lambda: warm_db_pool(settings.WARMUP_DB_CONNECTIONS),
+        "quizzes": lambda: warm_all_quizzes(settings.WARMUP_QUIZ_COUNT),
+        "search": warm_search,
+    }
+
+
+def run_steps(app=None) -> None:
+    """
+    Run the warm-up steps that have not finished yet.
+    """
+    for step, run in warmup_steps(app).items():
+        if state.steps[step] in ("done", "skipped"):
+            continue
+        if step == "quizzes" and not settings.PRIMARY_WORKER:
+            # Pools live in the shared store; the primary worker loads them
+            # and the others map them on first use
+            state.steps[step] = "skipped"
+            continue
+        if step == "quizzes":
+            state.quizzes_total = state.quizzes_done = 0
+        state.steps[step] = "running"
+        step_started = time.perf_counter()
+        try:
+            result = run()
+        except Exception:
+            state.steps[step] = "failed"
+            raise
+        state.steps[step] = "done"
+        logger.info(
+            "Warm-up %s done in %.2fs%s", step, time.perf_counter() - step_started,
+            f" ({result})" if result is not None else "",
+        )
+
+
+def run_warmup(app=None) -> None:
+    """
+    Run every warm-up step, recording progress in `state`.
+
+    A failed step (say, the database is not reachable yet) is retried with
+    exponential backoff until the warm-up succeeds; steps that finished are
+    not run again.
+    """
+    if not settings.WARMUP_ENABLED:
+        state.status = "disabled"
+        return
+    started = time.perf_counter()
+    delay = settings.WARMUP_RETRY_SECONDS
+    while True:
+        state.status = "running"
+        state.attempts += 1
+        try:
+            run_steps(app)
+        except Exception as exc:
+            logger.exception("Warm-up failed; retrying in %.1fs", delay)
+            state.status = "retrying"
+            state.error = str(exc)
+            time.sleep(delay)
+            delay = min(delay * 2, settings.WARMUP_RETRY_MAX_SECONDS)
+            continue
+        state.status = "done"
+        state.error = None
+        state.duration = round(time.perf_counter() - started, 3)
+        return
+
+
+def start_warmup(app=None) -> threading.Thread:
+    """
+    Run the warm-up in the background; the server accepts requests (and
+    reports not ready) meanwhile.
+    """
+    thread = threading.Thread(target=run_warmup, args=(app,), name="warmup", daemon=True)
+    thread.start()
+    return thread
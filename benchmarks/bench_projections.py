@@ -0,0 +1,138 @@
+"""
+Rows per second and peak memory of the list endpoints' queries, loading
+full ORM entities versus the response schema's column projection.
+
+Seeds a fresh SQLite database, then for the quiz list (QuizSummary) and
+the result history (UserQuizResult) times query + serialization to JSON
+bytes three ways: full entities, load_only() entities and a core select()
+of tuples. Peak memory is measured with tracemalloc in a separate pass.
+
+Usage:
+    python benchmarks/bench_projections.py [rows] [repeats]
+    python benchmarks/bench_projections.py 20000 5
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORY = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, DIRECTORY, True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DIRECTORY}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import load_only as load_only_option  # noqa: E402
+
+from app.db import base  # noqa: E402,F401 - registers every model
+from app.db.base_class import Base  # noqa: E402
+from app.db.projection import projected_columns, select_for  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.quiz import Quiz, UserQuizResult  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.schemas.quiz import (  # noqa: E402
+    QuizSummary,
+    QuizSummaryListAdapter,
+    UserQuizResult as UserQuizResultSchema,
+    UserQuizResultListAdapter,
+)
+
+DESCRIPTION = "A quiz description long enough to matter. " * 20
+
+
+def seed(rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "id": 1, "email": "bench@example.com", "username": "bench",
+            "hashed_password": "x" * 60, "is_active": True,
+        }])
+        conn.execute(insert(Quiz), [
+            {
+                "title": f"Quiz {n}", "description": DESCRIPTION, "created_by": 1,
+                "created_at": now, "is_active": True, "delivery_mode": "fixed",
+            }
+            for n in range(rows)
+        ])
+        conn.execute(insert(UserQuizResult), [
+            {"user_id": 1, "quiz_id": n % rows + 1, "score": n % 101, "completed_at": now - timedelta(minutes=n)}
+            for n in range(rows)
+        ])
+
+
+def variants(rows: int):
+    def entities(model, adapter, order):
+        def run(db):
+            return adapter.dump_json(adapter.validate_python(
+                db.query(model).order_by(order).limit(rows).all(), from_attributes=True,
+            ))
+        return run
+
+    def load_only(model, schema, adapter, order):
+        option = load_only_option(*projected_columns(schema, model))
+
+        def run(db):
+            return adapter.dump_json(adapter.validate_python(
+                db.query(model).options(option).order_by(order).limit(rows).all(),
+                from_attributes=True,
+            ))
+        return run
+
+    def tuples(model, schema, adapter, order):
+        def run(db):
+            return adapter.dump_json(adapter.validate_python(
+                db.execute(select_for(schema, model).order_by(order).limit(rows)).all(),
+                from_attributes=True,
+            ))
+        return run
+
+    for name, model, schema, adapter in (
+        ("quizzes", Quiz, QuizSummary, QuizSummaryListAdapter),
+        ("results", UserQuizResult, UserQuizResultSchema, UserQuizResultListAdapter),
+    ):
+        yield name, "entities", entities(model, adapter, model.id)
+        yield name, "load_only", load_only(model, schema, adapter, model.id)
+        yield name, "select", tuples(model, schema, adapter, model.id)
+
+
+def measure(run, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            run(db)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            db.close()
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        run(db)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return best, peak
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    seed(rows)
+    print(f"{rows} rows per query, best of {repeats}")
+    print("endpoint  variant       rows/s   peak MB")
+    for name, variant, run in variants(rows):
+        seconds, peak = measure(run, repeats)
+        print(f"{name:<9} {variant:<10} {rows / seconds:>9.0f}  {peak / 2**20:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Query latency of the in-memory quiz search index.
+
+Builds an index over synthetic quizzes (title, description and ten
+questions each) and reports build time and p50/p95/max latency for exact,
+multi-term and misspelt queries.
+
+Usage:
+    python benchmarks/bench_search.py [quiz_count]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services.search import SearchIndex  # noqa: E402
+
+TOPICS = [
+    "geography", "history", "physics", "chemistry", "biology", "football",
+    "cricket", "music", "cinema", "literature", "astronomy", "mathematics",
+    "programming", "painting", "architecture", "economics", "philosophy",
+]
+WORDS = [
+    "capital", "river", "mountain", "war", "king", "atom", "cell", "planet",
+    "goal", "album", "novel", "theorem", "algorithm", "museum", "market",
+    "empire", "ocean", "galaxy", "molecule", "symphony", "director", "poet",
+]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 500)) for _ in range(words))
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    index = SearchIndex()
+
+    start = time.perf_counter()
+    for quiz_id in range(1, count + 1):
+        topic = rng.choice(TOPICS)
+        index.add(
+            quiz_id,
+            f"{topic.title()} quiz {quiz_id}",
+            f"A {topic} quiz about {sentence(rng, 6)}",
+            [sentence(rng, 8) for _ in range(10)],
+        )
+    print(f"indexed {count} quizzes in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        "exact": ["river42", "galaxy7 planet13", "symphony250"],
+        "topic": ["astronomy", "cricket", "philosophy"],
+        "fuzzy": ["rivr42", "galxy7", "symphny250", "astronmy"],
+        "common": ["quiz river42", "quiz"],
+    }
+    for kind, terms in queries.items():
+        timings = []
+        for _ in range(20):
+            for term in terms:
+                started = time.perf_counter()
+                index.search(term, limit=20)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{kind:>6}: p50 {statistics.median(timings):6.2f} ms  "
+              f"p95 {p95:6.2f} ms  max {timings[-1]:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Serialization CPU and bytes on the wire for quiz list responses.
+
+Compares the default FastAPI path (response_model validation, jsonable_encoder
+and json.dumps) against orjson and the precompiled TypeAdapters, then reports
+the payload size raw, gzipped and brotli-compressed.
+
+Usage:
+    python benchmarks/bench_serialization.py
+"""
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from typing import List  # noqa: E402
+
+from app.schemas.quiz import Quiz as QuizSchema, QuizListAdapter  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_quizzes(count: int, questions: int = 10, answers: int = 4):
+    """
+    Build ORM-like objects shaped like the Quiz/Question/Answer models.
+    """
+    now = datetime.utcnow()
+    quizzes = []
+    answer_id = question_id = 0
+    for quiz_id in range(1, count + 1):
+        qs = []
+        for q in range(questions):
+            question_id += 1
+            ans = []
+            for a in range(answers):
+                answer_id += 1
+                ans.append(SimpleNamespace(
+                    id=answer_id, question_id=question_id,
+                    text=f"Answer {a} for question {q}", is_correct=a == 0,
+                ))
+            qs.append(SimpleNamespace(
+                id=question_id, quiz_id=quiz_id, order=q,
+                text=f"Question {q} of quiz {quiz_id}: which option is right?",
+                answers=ans,
+            ))
+        quizzes.append(SimpleNamespace(
+            id=quiz_id, title=f"Quiz {quiz_id}",
+            description="A general knowledge quiz " * 4,
+            created_by=1, created_at=now, updated_at=None, is_active=True,
+            questions=qs,
+        ))
+    return quizzes
+
+
+def timeit(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main() -> None:
+    # Adapter built per call mimics the work FastAPI does without caching it
+    uncached = lambda: TypeAdapter(List[QuizSchema])  # noqa: E731
+
+    print(f"{'quizzes':>8} {'default ms':>11} {'orjson ms':>10} {'adapter ms':>11} "
+          f"{'raw B':>10} {'gzip B':>10} {'br B':>10}")
+    for count in (1, 10, 100, 1000):
+        quizzes = make_quizzes(count)
+        repeat = max(3, 2000 // (count * 10))
+
+        def default_path():
+            models = uncached().validate_python(quizzes, from_attributes=True)
+            return json.dumps(jsonable_encoder(models)).encode()
+
+        def orjson_path():
+            models = QuizListAdapter.validate_python(quizzes, from_attributes=True)
+            return orjson.dumps(QuizListAdapter.dump_python(models, mode="json"))
+
+        def adapter_path():
+            models = QuizListAdapter.validate_python(quizzes, from_attributes=True)
+            return QuizListAdapter.dump_json(models)
+
+        body = adapter_path()
+        gz = len(gzip.compress(body, compresslevel=6))
+        br = len(brotli.compress(body, quality=4)) if brotli else float("nan")
+        orjson_ms = timeit(orjson_path, repeat) if orjson else float("nan")
+        print(f"{count:>8} {timeit(default_path, repeat):>11.2f} {orjson_ms:>10.2f} "
+              f"{timeit(adapter_path, repeat):>11.2f} {len(body):>10} {gz:>10} {br:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Throughput and memory per worker of the pre-fork server (serve.py).
+
+For each worker count, starts serve.py on a fresh SQLite database, creates
+quizzes over HTTP, then hammers GET /api/quiz/{id} from keep-alive client
+threads. Reports requests/second and, per worker, RSS, PSS (RSS with
+shared pages divided among the processes sharing them) and private memory.
+
+Usage:
+    python benchmarks/bench_workers.py [worker_counts] [seconds]
+    python benchmarks/bench_workers.py 1,2,4 10
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_THREADS = 32
+QUIZ_COUNT = 50
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def wait_until_up(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            if request(conn, "GET", "/")[0] == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def seed(port: int) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    json_headers = {"Content-Type": "application/json"}
+    request(conn, "POST", "/api/users/register", json.dumps(
+        {"email": "bench@example.com", "username": "bench", "password": "bench"}
+    ), json_headers)
+    _, body = request(
+        conn, "POST", "/api/users/token", "username=bench&password=bench",
+        {"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": "Bearer " + json.loads(body)["access_token"]}
+    quiz_ids = []
+    for number in range(QUIZ_COUNT):
+        quiz = {
+            "title": f"Benchmark quiz {number}",
+            "delivery_mode": "shuffled",
+            "questions": [
+                {
+                    "text": f"Question {q}",
+                    "answers": [
+                        {"text": f"Answer {a}", "is_correct": a == 0} for a in range(4)
+                    ],
+                }
+                for q in range(20)
+            ],
+        }
+        _, body = request(conn, "POST", "/api/quiz/", json.dumps(quiz), {**headers, **json_headers})
+        quiz_ids.append(json.loads(body)["id"])
+    return {"headers": headers, "quiz_ids": quiz_ids}
+
+
+def load(port: int, state: dict, seconds: float) -> float:
+    stop = time.monotonic() + seconds
+    counts = []
+
+    def client(offset: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        done = 0
+        ids = state["quiz_ids"]
+        while time.monotonic() < stop:
+            status, _ = request(conn, "GET", f"/api/quiz/{ids[(offset + done) % len(ids)]}", headers=state["headers"])
+            if status == 200:
+                done += 1
+        counts.append(done)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENT_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def memory(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    values["Private"] = values.pop("Private_Clean") + values.pop("Private_Dirty")
+    return values
+
+
+def worker_pids(master: int) -> list:
+    with open(f"/proc/{master}/task/{master}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def run(workers: int, seconds: float) -> None:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{directory}/bench.db",
+            SECRET_KEY="benchmark",
+            RATE_LIMIT_ENABLED="false",
+            MAX_CONCURRENT_REQUESTS="1000",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(port)
+            state = seed(port)
+            load(port, state, 1)  # warm every worker's cache
+            rps = load(port, state, seconds)
+            usage = [memory(pid) for pid in worker_pids(server.pid)]
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+    def average(key):
+        return sum(u[key] for u in usage) / len(usage)
+
+    print(f"{workers:>7}  {rps:9.0f}  {average('Rss'):8.1f}  "
+          f"{average('Pss'):8.1f}  {average('Private'):8.1f}")
+
+
+def main() -> None:
+    counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1, 2, 4]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{os.cpu_count()} cores, {CLIENT_THREADS} client threads, {seconds:.0f}s per run")
+    print("workers      req/s   RSS MB   PSS MB  priv MB  (per worker)")
+    for workers in counts:
+        run(workers, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,56 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.endpoints import quiz, user
+from app.api.endpoints import admin, debug, health, quiz, user
+from app.core.compression import CompressionMiddleware
+from app.core.profiler import ProfilerMiddleware
+from app.core.ratelimit import AdmissionControlMiddleware, default_max_concurrency
 from app.core.config import settings
-from app.db.session import engine
-from app.db.base_class import Base 
+from app.db.tenancy import init_databases
+from app.services.jobs import start_runner, stop_runner
+from app.services.tokens import start_revocation_sync
+from app.services.warmup import start_warmup
+
+# Create tables on every shard, and the default organization
+init_databases()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threads for sync endpoints; admission control is sized against this
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    # Warm caches in the background; /healthz/ready reports progress
+    start_warmup(app)
+    # Revoked sessions are checked in each worker's memory; keep its list in
+    # sync
+    start_revocation_sync(settings.REVOCATION_SYNC_SECONDS)
+    # Jobs run in one worker per host (serve.py designates it)
+    if settings.JOBS_ENABLED and settings.PRIMARY_WORKER:
+        start_runner()
+    yield
+    stop_runner()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Quiz Game API",
     description="A simple quiz game API built with FastAPI and PostgreSQL",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Per-request SQL/CPU profiling for development (innermost, so it measures
+# the handler and not time spent queueing)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilerMiddleware,
+        repeat_threshold=settings.PROFILE_REPEAT_THRESHOLD,
+        cpu_interval=settings.PROFILE_CPU_INTERVAL_MS / 1000,
+    )
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -25,9 +60,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses above the configured size thresholds
+app.add_middleware(
+    CompressionMiddleware,
+    gzip_minimum_size=settings.GZIP_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSLEVEL,
+    brotli_minimum_size=settings.BROTLI_MINIMUM_SIZE,
+    brotli_quality=settings.BROTLI_QUALITY,
+    maximum_buffer_size=settings.COMPRESSION_MAX_BUFFER_SIZE,
+)
+
+# Shed load with 503 when API requests queue longer than the latency SLO
+app.add_middleware(
+    AdmissionControlMiddleware,
+    max_concurrency=settings.MAX_CONCURRENT_REQUESTS or default_max_concurrency(),
+    max_queue_wait=settings.MAX_QUEUE_WAIT_MS / 1000,
+    retry_after=settings.SHED_RETRY_AFTER_SECONDS,
+)
+
 # Include routers
 app.include_router(quiz.router, prefix="/api/quiz", tags=["quiz"])
 app.include_router(user.router, prefix="/api/users", tags=["users"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(health.router, prefix="/healthz", tags=["health"])
+if settings.PROFILING_ENABLED:
+    app.include_router(debug.router, prefix="/debug", tags=["debug"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
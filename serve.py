@@ -0,0 +1,263 @@
+"""
+Production entry point: preload the app once, then fork worker processes
+that share the listening socket.
+
+Usage:
+    python serve.py [--bind 0.0.0.0:8000] [--workers N]
+
+Signals (to the master process):
+    HUP         rolling restart: start fresh workers, then drain the old ones
+    USR2        upgrade: start a new master running the code on disk on the
+                same socket; send TERM to the old master once it is up
+    TERM, INT   graceful shutdown: stop accepting, drain, exit
+    TTIN, TTOU  add / remove one worker
+
+Workers drain in-flight requests for up to GRACEFUL_TIMEOUT seconds
+before they are killed. Workers that die are replaced.
+
+One worker at a time is the primary: it runs the background job runner and
+loads the shared question pools on warm-up. When it exits or is replaced,
+the next worker started takes over.
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("serve")
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        return os.cpu_count() or 1
+
+
+def shared_cache_dir() -> str:
+    # tmpfs keeps the shared store in memory where available
+    parent = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    return tempfile.mkdtemp(prefix="quiz-api-", dir=parent)
+
+
+# Set for a master started by USR2: the listening socket it inherits
+LISTEN_FD_ENV = "QUIZ_API_LISTEN_FD"
+
+
+def bind_socket(address: str) -> socket.socket:
+    if os.environ.get(LISTEN_FD_ENV):
+        sock = socket.socket(fileno=int(os.environ.pop(LISTEN_FD_ENV)))
+        sock.set_inheritable(True)
+        return sock
+    host, _, port = address.rpartition(":")
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host.strip("[]") or "0.0.0.0", int(port)))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    """
+    Pre-fork process manager in the style of gunicorn's arbiter.
+    """
+
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: int) -> None:
+        self.app = app
+        self.sock = sock
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.workers: Dict[int, float] = {}
+        # pid -> deadline for workers that were asked to stop
+        self.draining: Dict[int, float] = {}
+        self.signals: List[int] = []
+        self.stopping = False
+        # pid of the worker running the background tasks
+        self.primary: Optional[int] = None
+
+    def spawn_worker(self) -> None:
+        primary = self.primary is None
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            if primary:
+                self.primary = pid
+            return
+        try:
+            self.run_worker(primary)
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            os._exit(1)
+        os._exit(0)
+
+    def run_worker(self, primary: bool) -> None:
+        import uvicorn
+        from app.core.config import settings
+        from app.db.session import engines
+
+        for sig in (signal.SIGHUP, signal.SIGUSR2, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        # uvicorn re-raises the signal it stopped on once drained; ignore it
+        # so the worker exits normally afterwards
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Connections must never be shared with the master or other workers
+        for shard_engine in engines.values():
+            shard_engine.dispose(close=False)
+        settings.PRIMARY_WORKER = primary
+
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            timeout_graceful_shutdown=self.graceful_timeout,
+            access_log=False,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop_worker(self, pid: int) -> None:
+        if pid in self.workers:
+            del self.workers[pid]
+            if pid == self.primary:
+                self.primary = None
+            self.draining[pid] = time.monotonic() + self.graceful_timeout
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                logger.warning("Worker %s exited unexpectedly (status %s)", pid, status)
+            if pid == self.primary:
+                self.primary = None
+            self.draining.pop(pid, None)
+
+    def adjust_workers(self) -> None:
+        while len(self.workers) < self.worker_count:
+            self.spawn_worker()
+        while len(self.workers) > self.worker_count:
+            # The oldest worker goes, unless it runs the background tasks
+            others = [pid for pid in self.workers if pid != self.primary]
+            self.stop_worker(min(others, key=self.workers.get))
+
+    def kill_overdue(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self.draining.items()):
+            if now > deadline:
+                logger.warning("Worker %s did not drain in time; killing it", pid)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.draining[pid] = float("inf")
+
+    def handle_signal(self, sig: int, frame) -> None:
+        self.signals.append(sig)
+
+    def handle_signals(self) -> None:
+        while self.signals:
+            sig = self.signals.pop(0)
+            if sig in (signal.SIGTERM, signal.SIGINT):
+                logger.info("Shutting down: draining %d workers", len(self.workers))
+                self.stopping = True
+                for pid in list(self.workers):
+                    self.stop_worker(pid)
+            elif sig == signal.SIGHUP:
+                logger.info("Reloading: replacing %d workers", len(self.workers))
+                old = list(self.workers)
+                # The first new worker takes over the background tasks; the
+                # old primary's running jobs finish while it drains
+                self.primary = None
+                for _ in range(self.worker_count):
+                    self.spawn_worker()
+                # The new workers accept on the same socket while the old
+                # ones finish their in-flight requests
+                for pid in old:
+                    self.stop_worker(pid)
+            elif sig == signal.SIGUSR2:
+                self.exec_new_master()
+            elif sig == signal.SIGTTIN:
+                self.worker_count += 1
+            elif sig == signal.SIGTTOU and self.worker_count > 1:
+                self.worker_count -= 1
+
+    def exec_new_master(self) -> None:
+        if os.fork():
+            return
+        logger.info("Starting a new master from %s", sys.argv[0])
+        env = dict(os.environ, **{LISTEN_FD_ENV: str(self.sock.fileno())})
+        # The new code gets its own shared store; the old one is removed
+        # with the old master
+        env.pop("SHARED_CACHE_DIR", None)
+        os.execve(sys.executable, [sys.executable] + sys.argv, env)
+
+    def run(self) -> None:
+        for sig in (
+            signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR2,
+            signal.SIGTTIN, signal.SIGTTOU,
+        ):
+            signal.signal(sig, self.handle_signal)
+        # Keep the preloaded objects out of the cyclic GC so collections in
+        # the workers do not write to (and un-share) their pages
+        gc.collect()
+        gc.freeze()
+
+        logger.info("Master %s starting %d workers", os.getpid(), self.worker_count)
+        while True:
+            self.handle_signals()
+            self.reap()
+            if self.stopping:
+                if not self.workers and not self.draining:
+                    return
+            else:
+                self.adjust_workers()
+            self.kill_overdue()
+            time.sleep(0.1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bind", default="0.0.0.0:8000")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    own_cache_dir = None
+    if not os.environ.get("SHARED_CACHE_DIR"):
+        own_cache_dir = os.environ["SHARED_CACHE_DIR"] = shared_cache_dir()
+
+    # Preload: import the application (models, routes, schemas) once in the
+    # master; the workers inherit it copy-on-write
+    from main import app
+    from app.core.config import settings
+    from app.db.session import engines
+
+    for shard_engine in engines.values():
+        shard_engine.dispose()
+    workers = args.workers or settings.WORKERS or available_cores()
+    sock = bind_socket(args.bind)
+    try:
+        Master(app, sock, workers, settings.GRACEFUL_TIMEOUT).run()
+    finally:
+        sock.close()
+        if own_cache_dir:
+            shutil.rmtree(own_cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
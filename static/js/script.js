@@ -3,6 +3,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const state = {
         user: null,
         token: localStorage.getItem('token'),
+        refreshToken: localStorage.getItem('refreshToken'),
         currentQuiz: null,
         currentQuizData: null,
         currentQuestionIndex: 0,
@@ -68,6 +69,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // API endpoints
     const API = {
         login: '/api/users/token',
+        refresh: '/api/users/token/refresh',
+        logout: '/api/users/logout',
         register: '/api/users/register',
         quizzes: '/api/quiz/quizzes',
         quiz: (id) => `/api/quiz/quizzes/${id}`,
@@ -154,9 +157,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error('Login failed');
             }
 
-            const data = await response.json();
-            localStorage.setItem('token', data.access_token);
-            state.token = data.access_token;
+            storeTokens(await response.json());
             
             // Get user info
             await fetchUserInfo();
@@ -201,13 +202,63 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function storeTokens(data) {
+        localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refreshToken', data.refresh_token);
+        state.token = data.access_token;
+        state.refreshToken = data.refresh_token;
+    }
+
+    // Access tokens are short-lived: renew with the refresh token (no password).
+    // Refresh tokens work once, so concurrent callers share one refresh
+    let pendingRefresh = null;
+
+    function refreshSession() {
+        if (!state.refreshToken) {
+            return Promise.resolve(false);
+        }
+        if (!pendingRefresh) {
+            pendingRefresh = fetch(API.refresh, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ refresh_token: state.refreshToken })
+            })
+                .then(async response => {
+                    if (!response.ok) {
+                        return false;
+                    }
+                    storeTokens(await response.json());
+                    return true;
+                })
+                .catch(() => false)
+                .finally(() => {
+                    pendingRefresh = null;
+                });
+        }
+        return pendingRefresh;
+    }
+
+    // fetch() with the access token; on 401 refresh the session once and retry
+    async function authFetch(url, options = {}) {
+        const request = () => {
+            const headers = { ...(options.headers || {}) };
+            if (state.token) {
+                headers['Authorization'] = `Bearer ${state.token}`;
+            }
+            return fetch(url, { ...options, headers });
+        };
+        const response = await request();
+        if (response.status === 401 && await refreshSession()) {
+            return request();
+        }
+        return response;
+    }
+
     async function fetchUserInfo() {
         try {
-            const response = await fetch('/api/users/me', {
-                headers: {
-                    'Authorization': `Bearer ${state.token}`
-                }
-            });
+            const response = await authFetch('/api/users/me');
 
             if (!response.ok) {
                 throw new Error('Failed to fetch user info');
@@ -222,8 +273,19 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function handleLogout() {
+        if (state.refreshToken) {
+            fetch(API.logout, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ refresh_token: state.refreshToken })
+            });
+        }
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
         state.token = null;
+        state.refreshToken = null;
         state.user = null;
         updateAuthUI();
         showHome();
@@ -246,7 +308,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // Quiz Functions
     async function fetchQuizzes() {
         try {
-            const response = await fetch(API.quizzes);
+            const response = await authFetch(API.quizzes);
             if (!response.ok) {
                 throw new Error('Failed to fetch quizzes');
             }
@@ -282,7 +344,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function loadQuiz(quizId) {
         try {
-            const response = await fetch(API.quiz(quizId));
+            const response = await authFetch(API.quiz(quizId));
             if (!response.ok) {
                 throw new Error('Failed to load quiz');
             }
@@ -371,19 +433,14 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         
         try {
-            const headers = {
-                'Content-Type': 'application/json'
-            };
-            
-            if (state.token) {
-                headers['Authorization'] = `Bearer ${state.token}`;
-            }
-            
-            const response = await fetch(API.submitQuiz(state.currentQuiz), {
+            const response = await authFetch(API.submitQuiz(state.currentQuiz), {
                 method: 'POST',
-                headers: headers,
+                headers: {
+                    'Content-Type': 'application/json'
+                },
                 body: JSON.stringify({
-                    answers: state.userAnswers
+                    answers: state.userAnswers,
+                    paper_token: state.currentQuizData.paper_token
                 })
             });
             
@@ -413,11 +470,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!state.token) return;
         
         try {
-            const response = await fetch(API.userResults, {
-                headers: {
-                    'Authorization': `Bearer ${state.token}`
-                }
-            });
+            const response = await authFetch(API.userResults);
             
             if (!response.ok) {
                 throw new Error('Failed to load results');
@@ -564,11 +617,10 @@ document.addEventListener('DOMContentLoaded', () => {
         
         try {
             // First create the quiz
-            const quizResponse = await fetch(API.quizzes, {
+            const quizResponse = await authFetch(API.quizzes, {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${state.token}`
+                    'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
                     title: title,
@@ -584,11 +636,10 @@ document.addEventListener('DOMContentLoaded', () => {
             
             // Then add questions
             for (const question of questions) {
-                const questionResponse = await fetch(API.questions(quizData.id), {
+                const questionResponse = await authFetch(API.questions(quizData.id), {
                     method: 'POST',
                     headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': `Bearer ${state.token}`
+                        'Content-Type': 'application/json'
                     },
                     body: JSON.stringify(question)
                 });
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Settings are read at import time: point the app at a throwaway SQLite
+# database and enforce query budgets before anything imports it
+_directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/test.db"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["ENFORCE_QUERY_BUDGETS"] = "true"
+# A second shard, so tenant routing is exercised across databases
+os.environ["SHARD_DATABASE_URLS"] = f'{{"eu": "sqlite:///{_directory}/eu.db"}}'
+os.environ["RESULTS_ARCHIVE_DIR"] = os.path.join(_directory, "archive")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core import idempotency, ratelimit  # noqa: E402
+from app.db import base  # noqa: E402,F401 - registers every model
+from app.db.base_class import Base  # noqa: E402
+from app.db import tenancy  # noqa: E402
+from app.db.session import SessionLocal, engines  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.delivery import pool_cache  # noqa: E402
+from app.services import tokens  # noqa: E402
+from app.services.progress import distribution_cache, leaderboard_cache  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for shard_engine in engines.values():
+        shard_engine.dispose()
+    shutil.rmtree(_directory, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    for shard_engine in engines.values():
+        Base.metadata.drop_all(bind=shard_engine)
+    tenancy.init_databases()
+    # Organization ids are reused from test to test
+    tenancy._directory.clear()
+    pool_cache.clear()
+    leaderboard_cache.clear()
+    distribution_cache.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="player@example.com", username="player", hashed_password="x", is_admin=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """
+    HTTP client for the app, without its lifespan (warm-up, job runner).
+    Rate limits and idempotency keys start empty.
+    """
+    from main import app
+
+    monkeypatch.setattr(ratelimit, "_backend", ratelimit.MemoryRateLimitBackend())
+    monkeypatch.setattr(idempotency, "_backend", idempotency.MemoryIdempotencyBackend())
+    return TestClient(app)
+
+
+def auth_headers(db, user) -> dict:
+    """
+    Bearer headers for `user`, from a real login.
+    """
+    # Loaded as the login endpoint would have it, not expired by a commit
+    db.refresh(user)
+    return {"Authorization": f"Bearer {tokens.login(db, user)['access_token']}"}
@@ -0,0 +1,160 @@
+"""
+Archiving a month moves its results to a .npy file, quiz stats keep
+counting them, and late or already archived rows are neither lost nor
+counted twice.
+"""
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db import partitions
+from app.models.quiz import UserQuizResult
+from app.schemas.quiz import QuizCreate
+from app.services import archive
+from app.services import quiz as quiz_service
+
+MARCH = date(2026, 3, 1)
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULTS_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "_mapped", {})
+    return str(tmp_path)
+
+
+@pytest.fixture
+def quiz_id(db, user):
+    return quiz_service.create_quiz(db, QuizCreate(title="Capitals", questions=[]), user.id).id
+
+
+def add_results(db, user_id, quiz_id, *results):
+    """
+    Store (day of month, score) results in March, then one in April.
+    """
+    for day, score in results:
+        db.add(UserQuizResult(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            score=score,
+            completed_at=datetime(2026, 3, day, 12, tzinfo=timezone.utc),
+        ))
+    db.add(UserQuizResult(
+        user_id=user_id, quiz_id=quiz_id, score=10, completed_at=datetime(2026, 4, 2, tzinfo=timezone.utc)
+    ))
+    db.commit()
+
+
+def live(db):
+    return db.scalar(select(func.count()).select_from(UserQuizResult))
+
+
+def test_archived_month_still_counts(db, user, quiz_id, directory):
+    add_results(db, user.id, quiz_id, (3, 40), (20, 90))
+    before = archive.result_stats(db, quiz_id=quiz_id)
+
+    path, count = archive.archive_month(db, MARCH, directory)
+    assert count == 2
+    assert path == os.path.join(directory, "user_quiz_results_2026_03.npy")
+    assert live(db) == 1
+    assert archive.result_stats(db, quiz_id=quiz_id) == before == {
+        "attempts": 3, "average_score": 140 / 3, "best_score": 90,
+    }
+
+    assert archive.archived_stats(directory, quiz_id=quiz_id) == (2, 130, 90)
+    assert archive.archived_stats(directory, quiz_id=quiz_id + 1) == (0, 0, None)
+    assert archive.archived_stats(directory, user_id=user.id + 1) == (0, 0, None)
+    # Ranges filter within a file and skip files outside them
+    start = datetime(2026, 3, 10, tzinfo=timezone.utc)
+    assert archive.archived_stats(directory, start=start) == (1, 90, 90)
+    assert archive.archived_stats(directory, end=start) == (1, 40, 40)
+    assert archive.archived_stats(directory, start=datetime(2026, 4, 1)) == (0, 0, None)
+
+
+def test_late_rows_are_appended_once(db, user, quiz_id, directory):
+    add_results(db, user.id, quiz_id, (3, 40))
+    path, _ = archive.archive_month(db, MARCH, directory)
+    assert archive.archived_stats(directory) == (1, 40, 40)
+
+    # A late row for the archived month: the mapped file is replaced, so the
+    # next read maps it again
+    add_results(db, user.id, quiz_id, (30, 70))
+    assert archive.archive_month(db, MARCH, directory) == (path, 1)
+    assert archive.archived_stats(directory) == (2, 110, 70)
+    assert archive.archive_month(db, MARCH, directory) == (path, 0)
+    assert archive.archived_stats(directory) == (2, 110, 70)
+
+
+def test_rerun_after_failed_commit_does_not_duplicate(db, user, quiz_id, directory, monkeypatch):
+    add_results(db, user.id, quiz_id, (3, 40), (4, 60))
+    commit = db.commit
+    monkeypatch.setattr(db, "commit", lambda: (_ for _ in ()).throw(RuntimeError("lost connection")))
+    with pytest.raises(RuntimeError):
+        archive.archive_month(db, MARCH, directory)
+    db.rollback()
+    monkeypatch.setattr(db, "commit", commit)
+
+    # The rows are still in the database and the file was not put in place,
+    # so nothing is counted twice
+    assert live(db) == 3
+    assert not os.path.exists(archive.archive_path(directory, MARCH))
+    assert archive.archived_stats(directory) == (0, 0, None)
+    assert archive.result_stats(db, quiz_id=quiz_id)["attempts"] == 3
+
+    assert archive.archive_month(db, MARCH, directory)[1] == 2
+    assert archive.archived_stats(directory) == (2, 100, 60)
+    assert live(db) == 1
+
+
+def test_rerun_after_stopping_before_the_rename(db, user, quiz_id, directory, monkeypatch):
+    add_results(db, user.id, quiz_id, (3, 40), (4, 60))
+    monkeypatch.setattr(archive.os, "replace", lambda src, dst: (_ for _ in ()).throw(OSError("killed")))
+    with pytest.raises(OSError):
+        archive.archive_month(db, MARCH, directory)
+    monkeypatch.undo()
+
+    # Committed: the rows are only in the staging file until the next run
+    assert live(db) == 1
+    assert archive.archived_stats(directory) == (0, 0, None)
+    path, count = archive.archive_month(db, MARCH, directory)
+    assert count == 0
+    assert not os.path.exists(path + ".tmp")
+    assert archive.archived_stats(directory) == (2, 100, 60)
+
+
+def test_month_is_read_in_chunks(db, user, quiz_id, directory, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_CHUNK_SIZE", 2)
+    add_results(db, user.id, quiz_id, (9, 50), (3, 40), (20, 90), (3, 70), (12, 60))
+    path, count = archive.archive_month(db, MARCH, directory)
+    assert count == 5
+    data = archive.load_archive(path)
+    assert list(data["score"]) == [40, 70, 50, 60, 90]
+    assert len(set(data["id"])) == 5
+
+
+def test_partition_and_default_rows_are_archived_together(db, user, quiz_id, directory, monkeypatch):
+    """
+    On PostgreSQL the month's partition is dropped whole; rows that landed in
+    the DEFAULT partition (inserted before the month's partition existed) are
+    deleted in the same transaction.
+    """
+    add_results(db, user.id, quiz_id, (3, 40), (4, 60))
+    in_partition = set(db.scalars(select(UserQuizResult.id).where(UserQuizResult.score != 10)))
+    add_results(db, user.id, quiz_id, (5, 80))
+    name = partitions.partition_name(MARCH)
+    dropped = []
+
+    def drop_partition(conn, partition):
+        dropped.append(partition)
+        db.execute(delete(UserQuizResult).where(UserQuizResult.id.in_(in_partition)))
+
+    monkeypatch.setattr(partitions, "list_partitions", lambda conn: [(name, MARCH)])
+    monkeypatch.setattr(partitions, "drop_partition", drop_partition)
+
+    assert archive.archive_month(db, MARCH, directory)[1] == 3
+    assert dropped == [name]
+    assert archive.archived_stats(directory) == (3, 180, 80)
+    assert live(db) == 2
@@ -0,0 +1,108 @@
+"""
+Responses are compressed with Brotli or GZip as Accept-Encoding allows,
+and left alone when they are small, already encoded, files, or too large
+to buffer.
+"""
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware
+
+PAYLOAD = {"questions": [{"text": f"Question {n}", "answers": ["Paris", "Lyon"]} for n in range(50)]}
+BODY = json.dumps(PAYLOAD).encode()
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    export = tmp_path_factory.mktemp("files") / "results.json"
+    export.write_bytes(BODY)
+    app = FastAPI()
+
+    @app.get("/json")
+    def payload():
+        return PAYLOAD
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream(chunks: int = 4):
+        return StreamingResponse((BODY for _ in range(chunks)), media_type="application/json")
+
+    @app.get("/file")
+    def file():
+        return FileResponse(export, media_type="application/json")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    middleware_app = CompressionMiddleware(
+        app, gzip_minimum_size=500, brotli_minimum_size=500, maximum_buffer_size=len(BODY) * 8
+    )
+    return TestClient(middleware_app)
+
+
+def get(client, path, accept):
+    return client.get(path, headers={"Accept-Encoding": accept})
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+])
+def test_negotiation(client, accept, encoding):
+    response = get(client, "/json", accept)
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.json() == PAYLOAD
+
+
+@pytest.mark.parametrize("accept", ["identity", "", "br;q=0, gzip;q=0", "deflate"])
+def test_nothing_acceptable_is_sent_as_is(client, accept):
+    response = get(client, "/json", accept)
+    assert "content-encoding" not in response.headers
+    assert response.json() == PAYLOAD
+
+
+def test_body_below_the_threshold_is_sent_as_is(client):
+    response = get(client, "/small", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+
+def test_streamed_body_is_compressed_whole(client):
+    response = get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY * 4
+
+
+def test_stream_too_large_to_buffer_passes_through(client):
+    response = get(client, "/stream?chunks=20", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY * 20
+
+
+def test_file_response_is_untouched(client):
+    response = get(client, "/file", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == BODY
+
+
+def test_encoded_response_is_untouched(client):
+    response = client.get("/encoded", headers={"Accept-Encoding": "br"})
+    # Still gzip, as the endpoint sent it, not compressed again
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == PAYLOAD
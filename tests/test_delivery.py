@@ -0,0 +1,101 @@
+"""
+Papers served to players carry no answer key, and are scored against the
+paper the player was actually given.
+"""
+import orjson
+import pytest
+
+from app.models.quiz import UserProgress
+from app.schemas.quiz import QuizCreate, QuizSubmission
+from app.services import delivery, quiz as quiz_service
+
+
+def make_quiz(db, user, mode, sample_size=None):
+    quiz_in = QuizCreate(
+        title="Capitals",
+        delivery_mode=mode,
+        sample_size=sample_size,
+        questions=[
+            {
+                "text": f"Question {n}",
+                "difficulty": n % 5 + 1,
+                "answers": [
+                    {"text": f"Answer {a}", "is_correct": a == 0} for a in range(4)
+                ],
+            }
+            for n in range(10)
+        ],
+    )
+    return quiz_service.create_quiz(db, quiz_in, user.id)
+
+
+def answer_key(quiz):
+    return {q.id: next(a.id for a in q.answers if a.is_correct) for q in quiz.questions}
+
+
+def wrong_answers(quiz):
+    return {q.id: next(a.id for a in q.answers if not a.is_correct) for q in quiz.questions}
+
+
+@pytest.mark.parametrize("mode,sample_size,served", [
+    ("fixed", None, 10),
+    ("shuffled", None, 10),
+    ("sampled", 4, 4),
+    ("adaptive", 4, 4),
+])
+def test_paper_has_no_answer_key(db, user, mode, sample_size, served):
+    quiz = make_quiz(db, user, mode, sample_size)
+    pool = delivery.get_pool(db, quiz)
+    paper = delivery.paper_for_user(db, pool, user.id)
+
+    assert len(paper["questions"]) == served
+    assert b"correct" not in orjson.dumps(paper)
+    for question in paper["questions"]:
+        assert set(question) == {"id", "text", "difficulty", "answers"}
+        assert all(set(answer) == {"id", "text"} for answer in question["answers"])
+
+
+@pytest.mark.parametrize("mode,sample_size", [
+    ("fixed", None),
+    ("shuffled", None),
+    ("sampled", 4),
+    ("adaptive", 4),
+])
+def test_score_follows_the_served_paper(db, user, mode, sample_size):
+    quiz = make_quiz(db, user, mode, sample_size)
+    correct, wrong = answer_key(quiz), wrong_answers(quiz)
+    pool = delivery.get_pool(db, quiz)
+    paper = delivery.paper_for_user(db, pool, user.id)
+    served = [question["id"] for question in paper["questions"]]
+
+    # Three of the served questions right, the rest wrong; questions that
+    # were not served do not count even when answered correctly
+    answers = {question_id: wrong[question_id] for question_id in served}
+    for question_id in served[:3]:
+        answers[question_id] = correct[question_id]
+    for question_id in set(correct) - set(served):
+        answers[question_id] = correct[question_id]
+    expected = int(3 / len(served) * 100)
+    assert delivery.score_paper(pool, paper, answers) == expected
+
+    submission = QuizSubmission(
+        quiz_id=quiz.id,
+        paper_token=paper.get("paper_token"),
+        answers=[{"question_id": q, "answer_id": a} for q, a in answers.items()],
+    )
+    [result] = quiz_service.score_submissions(db, [(user.id, submission)])
+    assert result.score == expected
+
+
+def test_adaptive_target_follows_the_rollups(db, user):
+    quiz = make_quiz(db, user, "adaptive", 2)
+    pool = delivery.get_pool(db, quiz)
+    # No history yet: the middle of the scale
+    assert delivery.target_difficulties(db, [user.id]) == {user.id: 3}
+
+    db.add(UserProgress(user_id=user.id, attempts=4, total_score=400, average_score=100.0))
+    db.commit()
+    assert delivery.target_difficulties(db, [user.id]) == {user.id: 5}
+    paper = delivery.paper_for_user(db, pool, user.id)
+    assert [question["difficulty"] for question in paper["questions"]] == [5, 5]
+    assert delivery.target_from_token(pool, user.id, paper["paper_token"]) == 5
@@ -0,0 +1,130 @@
+"""
+Submissions with an Idempotency-Key are scored once; retries are answered
+with the stored result.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core import idempotency
+from app.core.config import settings
+from app.db import partitions
+from app.models.quiz import UserQuizResult
+from app.schemas.quiz import QuizCreate, QuizSubmission
+from app.services import archive
+from app.services import quiz as quiz_service
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def quiz(db, user):
+    quiz_in = QuizCreate(
+        title="Capitals",
+        questions=[{"text": "Capital of France?", "answers": [
+            {"text": "Paris", "is_correct": True},
+            {"text": "Lyon", "is_correct": False},
+        ]}],
+    )
+    return quiz_service.create_quiz(db, quiz_in, user.id)
+
+
+def results(db):
+    return db.scalar(select(func.count()).select_from(UserQuizResult))
+
+
+def body(quiz, answer):
+    question = quiz.questions[0]
+    return {
+        "quiz_id": quiz.id,
+        "answers": [{"question_id": question.id, "answer_id": question.answers[answer].id}],
+    }
+
+
+def test_replay_returns_the_stored_response(db, user, quiz, client):
+    headers = {**auth_headers(db, user), "Idempotency-Key": "attempt-1"}
+    first = client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    replay = client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers)
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert results(db) == 1
+
+    # Another worker (or this one after forgetting the key) finds the key
+    # in the database
+    idempotency.set_idempotency_backend(idempotency.MemoryIdempotencyBackend())
+    replay = client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert results(db) == 1
+
+
+def test_key_reused_for_another_request(db, user, quiz, client):
+    headers = {**auth_headers(db, user), "Idempotency-Key": "attempt-1"}
+    client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers)
+
+    response = client.post("/api/quiz/submit", json=body(quiz, 1), headers=headers)
+    assert response.status_code == 422
+    idempotency.set_idempotency_backend(idempotency.MemoryIdempotencyBackend())
+    response = client.post("/api/quiz/submit", json=body(quiz, 1), headers=headers)
+    assert response.status_code == 422
+    assert results(db) == 1
+
+
+def test_concurrent_duplicate_settles_on_one_row(db, user, quiz, monkeypatch):
+    submission = QuizSubmission(**body(quiz, 0))
+    fingerprint = idempotency.request_fingerprint(submission.model_dump_json().encode())
+    first, replayed = quiz_service.submit_idempotent(db, user.id, submission, "attempt-1", fingerprint)
+    assert not replayed
+
+    # The second request looked the key up before the first committed
+    lookup = quiz_service.get_result_by_key
+    lookups = []
+
+    def racing_lookup(db, user_id, key):
+        lookups.append(key)
+        return None if len(lookups) == 1 else lookup(db, user_id, key)
+
+    monkeypatch.setattr(quiz_service, "get_result_by_key", racing_lookup)
+    second, replayed = quiz_service.submit_idempotent(db, user.id, submission, "attempt-1", fingerprint)
+
+    # Its insert hit the primary key on submission_keys and was rolled back
+    assert len(lookups) == 2
+    assert replayed
+    assert second.id == first.id
+    assert results(db) == 1
+
+
+def test_key_of_an_archived_result(db, user, quiz, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULTS_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive, "_mapped", {})
+    headers = {**auth_headers(db, user), "Idempotency-Key": "attempt-1"}
+    assert client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers).status_code == 200
+    archive.archive_month(db, partitions.month_start(date.today()), str(tmp_path))
+    assert results(db) == 0
+
+    # The key is still known but its row is gone: a conflict, not a 500 and
+    # not a second result
+    idempotency.set_idempotency_backend(idempotency.MemoryIdempotencyBackend())
+    response = client.post("/api/quiz/submit", json=body(quiz, 0), headers=headers)
+    assert response.status_code == 409
+    assert results(db) == 0
+
+    # The same when the lookup missed and the insert hits the archived key
+    submission = QuizSubmission(**body(quiz, 0))
+    fingerprint = idempotency.request_fingerprint(submission.model_dump_json().encode())
+    lookup = quiz_service.get_result_by_key
+    lookups = []
+
+    def racing_lookup(db, user_id, key):
+        lookups.append(key)
+        return None if len(lookups) == 1 else lookup(db, user_id, key)
+
+    monkeypatch.setattr(quiz_service, "get_result_by_key", racing_lookup)
+    with pytest.raises(idempotency.KeyResultArchived):
+        quiz_service.submit_idempotent(db, user.id, submission, "attempt-1", fingerprint)
+    assert len(lookups) == 2
+    assert results(db) == 0
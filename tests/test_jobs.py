@@ -0,0 +1,188 @@
+"""
+Background jobs: each queued job is claimed by one runner only, can be
+cancelled queued or running, is failed when its worker stops
+heartbeating, and CPU-bound kinds run in the process pool.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+
+from app.models.job import Job
+from app.services import jobs
+
+
+@pytest.fixture
+def runners():
+    started = []
+
+    def start(thread_workers=2, process_workers=0, poll_interval=60.0):
+        runner = jobs.JobRunner(thread_workers, process_workers, poll_interval)
+        runner.start()
+        started.append(runner)
+        return runner
+
+    yield start
+    for runner in started:
+        runner.stop()
+
+
+@pytest.fixture
+def ran(monkeypatch):
+    """
+    Register the thread job kind "record", which notes every run.
+    """
+    ran = []
+
+    def record(db, ctx, n):
+        ran.append(n)
+        time.sleep(0.01)
+        return {"n": n}
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "record", jobs.JobKind(record, "thread", 0))
+    return ran
+
+
+def status(db, job_id):
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def wait_for(db, job_id, statuses=jobs.FINISHED, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = status(db, job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"job {job_id} still {job.status}")
+
+
+def test_two_runners_never_claim_the_same_job(db, runners, ran):
+    submitted = [jobs.submit_job(db, "record", {"n": n}).id for n in range(20)]
+    first, second = runners(), runners()
+    # Both hear of every job, as when two server processes poll the table
+    for job_id in submitted:
+        first.enqueue(job_id, "record", 0)
+        second.enqueue(job_id, "record", 0)
+
+    for job_id in submitted:
+        assert wait_for(db, job_id).status == jobs.SUCCEEDED
+    assert Counter(ran) == Counter(range(20))
+    assert [status(db, job_id).result for job_id in submitted] == [{"n": n} for n in range(20)]
+
+
+def test_higher_priority_runs_first(db, runners, ran):
+    low = jobs.submit_job(db, "record", {"n": 1}, priority=0)
+    high = jobs.submit_job(db, "record", {"n": 2}, priority=9)
+    runner = jobs.JobRunner(thread_workers=1, process_workers=0)
+    runner.enqueue(low.id, "record", low.priority)
+    runner.enqueue(high.id, "record", high.priority)
+    runner.start()
+    try:
+        wait_for(db, low.id)
+    finally:
+        runner.stop()
+    assert ran == [2, 1]
+
+
+def test_cancel_queued_job(db, runners, ran):
+    job = jobs.submit_job(db, "record", {"n": 1})
+    assert jobs.cancel_job(db, job.id).status == jobs.CANCELLED
+
+    runner = runners()
+    runner.enqueue(job.id, "record", 0)
+    other = jobs.submit_job(db, "record", {"n": 2})
+    runner.enqueue(other.id, "record", 0)
+    wait_for(db, other.id)
+    # The cancelled job could not be claimed
+    assert ran == [2]
+    assert status(db, job.id).status == jobs.CANCELLED
+    with pytest.raises(jobs.HTTPException) as raised:
+        jobs.cancel_job(db, job.id)
+    assert raised.value.status_code == 409
+
+
+def test_cancel_running_job(db, runners, monkeypatch):
+    started = threading.Event()
+
+    def spin(db, ctx):
+        started.set()
+        for _ in range(600):
+            ctx.progress(0.5)
+            time.sleep(0.01)
+        return "not cancelled"
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "spin", jobs.JobKind(spin, "thread", 0))
+    job = jobs.submit_job(db, "spin")
+    runners().enqueue(job.id, "spin", 0)
+    assert started.wait(10)
+
+    assert jobs.cancel_job(db, job.id).cancel_requested
+    job = wait_for(db, job.id)
+    # Stopped at a progress report, well before the loop ran out
+    assert job.status == jobs.CANCELLED
+    assert job.result is None
+    assert job.progress == 0.5
+
+
+def test_heartbeat_and_stale_jobs(db):
+    runner = jobs.JobRunner(thread_workers=0, process_workers=0, poll_interval=1.0)
+    old = jobs._now() - timedelta(minutes=5)
+    alive = Job(kind="record", status=jobs.RUNNING, started_at=old, heartbeat_at=old)
+    stale = Job(kind="record", status=jobs.RUNNING, started_at=old, heartbeat_at=old)
+    db.add_all([alive, stale])
+    db.commit()
+    runner._running.add(alive.id)
+
+    runner._poll()
+    alive, stale = status(db, alive.id), status(db, stale.id)
+    # This runner's job was heartbeated; the other's worker is gone
+    assert alive.status == jobs.RUNNING
+    assert alive.heartbeat_at.replace(tzinfo=None) > old.replace(tzinfo=None)
+    assert stale.status == jobs.FAILED
+    assert stale.error == "Interrupted: worker stopped"
+    assert stale.finished_at is not None
+
+
+def test_poll_picks_up_jobs_queued_elsewhere(db, ran):
+    runner = jobs.JobRunner(thread_workers=1, process_workers=0, poll_interval=0.1)
+    # Submitted while this process had no runner
+    job = jobs.submit_job(db, "record", {"n": 7})
+    unknown = Job(kind="not-registered-here", status=jobs.QUEUED, params={})
+    db.add(unknown)
+    db.commit()
+
+    runner.start()
+    try:
+        assert wait_for(db, job.id).status == jobs.SUCCEEDED
+    finally:
+        runner.stop()
+    assert ran == [7]
+    # Kinds this process does not know are left for one that does
+    assert status(db, unknown.id).status == jobs.QUEUED
+
+
+def test_process_job_runs_in_the_pool(db, runners):
+    runner = runners(thread_workers=0, process_workers=1)
+    job = jobs.submit_job(db, "archive_results", {"shard": "default"})
+    runner.enqueue(job.id, job.kind, job.priority)
+
+    job = wait_for(db, job.id, timeout=60)
+    assert job.status == jobs.SUCCEEDED, job.error
+    assert job.result == {"archives": []}
+    assert job.progress == 1.0
+
+
+def test_failed_job_records_the_error(db, runners, monkeypatch):
+    def broken(db, ctx):
+        raise ValueError("no such quiz")
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "broken", jobs.JobKind(broken, "thread", 0))
+    job = jobs.submit_job(db, "broken")
+    runners().enqueue(job.id, "broken", 0)
+    job = wait_for(db, job.id)
+    assert job.status == jobs.FAILED
+    assert job.error == "ValueError: no such quiz"
@@ -0,0 +1,110 @@
+"""
+The request profiler flags repeated statement shapes (N+1s) with their
+call sites, and stays out of the way unless enabled and asked for.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import main
+from app.core import profiler
+from app.core.config import settings
+from app.core.profiler import ProfilerMiddleware, statement_shape
+from app.db.session import SessionLocal
+from app.models.quiz import Question, Quiz
+from app.schemas.quiz import QuizCreate
+from app.services import quiz as quiz_service
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    profiles = profiler.deque(maxlen=10)
+    monkeypatch.setattr(profiler, "profiles", profiles)
+    return profiles
+
+
+@pytest.fixture
+def quizzes(db, user):
+    for n in range(5):
+        quiz_in = QuizCreate(title=f"Quiz {n}", questions=[{"text": f"Question {n}", "answers": []}])
+        quiz_service.create_quiz(db, quiz_in, user.id)
+
+
+@pytest.fixture
+def profiled(quizzes):
+    app = FastAPI()
+
+    @app.get("/quizzes")
+    def list_with_questions():
+        with SessionLocal() as db:
+            # One query per quiz for its questions: a deliberate N+1
+            return {
+                quiz_id: list(db.scalars(select(Question.text).where(Question.quiz_id == quiz_id)))
+                for quiz_id in db.scalars(select(Quiz.id).order_by(Quiz.id))
+            }
+
+    return TestClient(ProfilerMiddleware(app, repeat_threshold=3))
+
+
+def test_statement_shape():
+    assert statement_shape("SELECT * FROM quizzes WHERE id = ?") == statement_shape(
+        "SELECT *   FROM quizzes\nWHERE id = 42"
+    )
+    assert statement_shape("WHERE id IN (?, ?, ?)") == statement_shape("WHERE id IN (?)")
+    assert statement_shape("WHERE id = %(id_1)s") == "WHERE id = ?"
+
+
+def test_n_plus_one_is_reported(profiled, profiles):
+    response = profiled.get("/quizzes", headers={"X-Profile": "sql"})
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert response.headers["X-Profile-Queries"] == "6"
+    assert response.headers["X-Profile-N-Plus-One"] == "1"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+    [report] = profiles
+    assert report["id"] == response.headers["X-Profile-Id"]
+    assert report["path"] == "/quizzes" and report["status"] == 200
+    [suspect] = report["repeated"]
+    assert suspect["count"] == 5
+    assert "FROM questions" in suspect["shape"]
+    # Blamed on the line in the endpoint that issues the query
+    [(caller, count)] = suspect["callers"].items()
+    assert caller.startswith("tests/test_profiler.py:")
+    assert count == 5
+
+
+def test_cpu_mode_samples(profiled, profiles):
+    response = profiled.get("/quizzes", params={"_profile": "cpu"})
+    assert response.headers["X-Profile-N-Plus-One"] == "1"
+    assert profiles[0]["cpu"]["interval_ms"] == 1.0
+
+
+def test_below_the_threshold_is_not_reported(profiled, profiles, db):
+    db.execute(Quiz.__table__.delete().where(Quiz.title != "Quiz 0"))
+    db.commit()
+    response = profiled.get("/quizzes", headers={"X-Profile": "sql"})
+    assert response.headers["X-Profile-Queries"] == "2"
+    assert response.headers["X-Profile-N-Plus-One"] == "0"
+    assert profiles[0]["repeated"] == []
+
+
+@pytest.mark.parametrize("value", [None, "0", "off"])
+def test_requests_not_asking_are_not_profiled(profiled, profiles, value):
+    headers = {"X-Profile": value} if value else {}
+    response = profiled.get("/quizzes", headers=headers)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert len(profiles) == 0
+
+
+def test_profiler_is_off_when_disabled(db, user, client, profiles):
+    assert not settings.PROFILING_ENABLED
+    assert not any(m.cls is ProfilerMiddleware for m in main.app.user_middleware)
+    response = client.get("/api/quiz/", headers={**auth_headers(db, user), "X-Profile": "sql"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert len(profiles) == 0
+    assert client.get("/debug/profiles").status_code == 404
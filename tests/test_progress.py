@@ -0,0 +1,201 @@
+"""
+Result rollups: streaks across day boundaries, percentiles, and rebuilding
+the rollups from the raw results.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.core.shared_store import SharedStore
+from app.db.bulk import insert_returning
+from app.db.instrumentation import QueryCollector
+from app.models.quiz import UserProgress, UserQuizResult, UserQuizStats
+from app.models.user import User
+from app.schemas.quiz import QuizCreate
+from app.services import progress, quiz as quiz_service
+
+START = date(2026, 3, 1)
+
+
+@pytest.fixture
+def quiz_id(db, user):
+    return quiz_service.create_quiz(db, QuizCreate(title="Capitals", questions=[]), user.id).id
+
+
+def submit(db, quiz_id, *results):
+    """
+    Store (user_id, day offset, score) results as one batch and fold them
+    into the rollups; returns the number of rollup statements.
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "quiz_id": quiz_id,
+            "score": score,
+            "completed_at": datetime.combine(START + timedelta(days=day), time(23, 30), timezone.utc),
+        }
+        for user_id, day, score in results
+    ]
+    stored = [result for (result,) in insert_returning(db, UserQuizResult, rows)]
+    with QueryCollector() as queries:
+        progress.apply_results(db, stored)
+    db.commit()
+    return queries.count
+
+
+def streaks(db, user_id):
+    db.expire_all()
+    row = db.get(UserProgress, user_id)
+    return row.current_streak, row.longest_streak, row.last_active_on - START
+
+
+def snapshot(db):
+    db.expire_all()
+    return (
+        [
+            (p.user_id, p.attempts, p.total_score, p.average_score, p.current_streak,
+             p.longest_streak, p.last_active_on)
+            for p in db.scalars(select(UserProgress).order_by(UserProgress.user_id))
+        ],
+        [
+            (s.user_id, s.quiz_id, s.attempts, s.total_score, s.best_score, s.last_score)
+            for s in db.scalars(select(UserQuizStats).order_by(UserQuizStats.user_id))
+        ],
+    )
+
+
+def test_streaks_across_batches(db, user, quiz_id):
+    submit(db, quiz_id, (user.id, 0, 50))
+    submit(db, quiz_id, (user.id, 1, 50))
+    assert streaks(db, user.id) == (2, 2, timedelta(days=1))
+    # The same day keeps the streak
+    submit(db, quiz_id, (user.id, 1, 50))
+    assert streaks(db, user.id) == (2, 2, timedelta(days=1))
+    submit(db, quiz_id, (user.id, 2, 50))
+    assert streaks(db, user.id) == (3, 3, timedelta(days=2))
+    # A missed day starts a new streak
+    submit(db, quiz_id, (user.id, 4, 50))
+    assert streaks(db, user.id) == (1, 3, timedelta(days=4))
+
+
+def test_batch_spanning_days(db, user, quiz_id):
+    submit(db, quiz_id, (user.id, 0, 50))
+    # Crossing midnight extends the stored streak, in the same two statements
+    assert submit(db, quiz_id, (user.id, 1, 50), (user.id, 2, 50), (user.id, 3, 50)) == 2
+    assert streaks(db, user.id) == (4, 4, timedelta(days=3))
+
+    # A backfill with a gap: the streak before the gap still counts
+    # towards the longest one, the current one restarts after it
+    assert submit(db, quiz_id, (user.id, 4, 50), (user.id, 5, 50), (user.id, 7, 50), (user.id, 8, 50)) == 2
+    assert streaks(db, user.id) == (2, 6, timedelta(days=8))
+
+
+def test_new_players_in_a_spanning_batch(db, user, quiz_id):
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.commit()
+
+    submit(db, quiz_id, (user.id, 0, 10), (other.id, 1, 20), (other.id, 2, 30), (user.id, 2, 40))
+    assert streaks(db, user.id) == (1, 1, timedelta(days=2))
+    assert streaks(db, other.id) == (2, 2, timedelta(days=2))
+    assert db.get(UserProgress, other.id).average_score == 25
+
+
+def test_percentile(db, user, quiz_id, monkeypatch):
+    players = [user]
+    for n in range(3):
+        player = User(email=f"p{n}@example.com", username=f"p{n}", hashed_password="x")
+        db.add(player)
+        players.append(player)
+    db.commit()
+    submit(db, quiz_id, *[(player.id, 0, score) for player, score in zip(players, (10, 40, 70, 100))])
+
+    percentiles = [progress.get_summary(db, player.id)["percentile"] for player in players]
+    assert percentiles == pytest.approx([0, 100 / 3, 200 / 3, 100])
+
+    # The distribution is cached: summaries only read the player's rollups
+    with QueryCollector() as queries:
+        progress.get_summary(db, user.id)
+    assert queries.count == 2
+
+
+def test_percentile_from_a_stale_distribution(db, user, quiz_id):
+    others = [User(email=f"p{n}@example.com", username=f"p{n}", hashed_password="x") for n in range(2)]
+    db.add_all(others)
+    db.commit()
+    submit(db, quiz_id, (others[0].id, 0, 10), (others[1].id, 0, 20))
+    assert progress.get_summary(db, others[0].id)["percentile"] == 0
+
+    # The cached distribution does not have the player's first result yet:
+    # they rank against both cached players, never above 100
+    submit(db, quiz_id, (user.id, 1, 90))
+    assert progress.get_summary(db, user.id)["percentile"] == 100
+    # Other players are ranked as before
+    assert progress.get_summary(db, others[1].id)["percentile"] == 100
+
+    progress.distribution_cache.clear()
+    assert progress.get_summary(db, user.id)["percentile"] == 100
+    assert progress.get_summary(db, others[1].id)["percentile"] == 50
+
+
+def test_percentile_of_a_lone_player(db, user, quiz_id):
+    submit(db, quiz_id, (user.id, 0, 80))
+    assert progress.get_summary(db, user.id)["percentile"] is None
+
+
+def test_rebuild_matches_incremental_rollups(db, user, quiz_id):
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.commit()
+    second_quiz = quiz_service.create_quiz(db, QuizCreate(title="Rivers", questions=[]), user.id).id
+    submit(db, quiz_id, (user.id, 0, 10), (other.id, 0, 90))
+    submit(db, quiz_id, (user.id, 1, 30), (user.id, 2, 50))
+    submit(db, second_quiz, (user.id, 4, 70), (other.id, 5, 20))
+    incremental = snapshot(db)
+
+    assert progress.rebuild_rollups(db) == 6
+    assert snapshot(db) == incremental
+
+
+def test_rebuild_in_another_worker_clears_the_caches(db, user, quiz_id, tmp_path, monkeypatch):
+    store = SharedStore(str(tmp_path))
+    monkeypatch.setattr(progress, "get_shared_store", lambda: store)
+    monkeypatch.setattr(progress, "_rebuilds_offset", 0)
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.commit()
+    submit(db, quiz_id, (user.id, 0, 10), (other.id, 0, 90))
+    assert progress.get_summary(db, user.id)["percentile"] == 0
+    assert progress.get_leaderboard(db, quiz_id)[0]["username"] == "other"
+
+    # Rollups corrected by hand, then rebuilt by a job in another worker:
+    # this worker only hears of it through the shared store
+    db.get(UserQuizStats, (user.id, quiz_id)).best_score = 100
+    db.get(UserProgress, user.id).average_score = 100
+    db.commit()
+    assert progress.get_leaderboard(db, quiz_id)[0]["username"] == "other"
+    store.append(progress.REBUILDS_NAMESPACE, "all", "rebuilt")
+
+    assert progress.get_leaderboard(db, quiz_id)[0]["username"] == user.username
+    assert progress.get_summary(db, user.id)["percentile"] == 100
+
+    # A rebuild here is broadcast too
+    progress.clear_rollup_caches()
+    assert store.log_size(progress.REBUILDS_NAMESPACE, "all") > progress._rebuilds_offset
+
+
+def test_rebuild_selected_users(db, user, quiz_id):
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.commit()
+    submit(db, quiz_id, (user.id, 0, 10), (other.id, 0, 90))
+    # Rollups drift, e.g. after results were corrected by hand
+    db.get(UserProgress, user.id).attempts = 99
+    db.get(UserProgress, other.id).attempts = 99
+    db.commit()
+
+    assert progress.rebuild_rollups(db, [user.id]) == 1
+    db.expire_all()
+    assert db.get(UserProgress, user.id).attempts == 1
+    assert db.get(UserProgress, other.id).attempts == 99
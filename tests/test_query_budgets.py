@@ -0,0 +1,106 @@
+"""
+Statement counts of the hot service functions. The counts are fixed: a
+function whose statements grow with its input (an N+1) fails here.
+"""
+import pytest
+from sqlalchemy import select
+
+from app.db.instrumentation import QueryBudgetExceeded, QueryCollector, query_budget
+from app.models.quiz import Quiz
+from app.schemas.quiz import QuizCreate, QuizSubmission, QuizUpdate
+from app.services import progress, quiz as quiz_service
+
+
+def make_quiz(questions: int, answers: int = 3) -> QuizCreate:
+    return QuizCreate(
+        title="Capitals",
+        questions=[
+            {
+                "text": f"Question {n}",
+                "answers": [
+                    {"text": f"Answer {a}", "is_correct": a == 0} for a in range(answers)
+                ],
+            }
+            for n in range(questions)
+        ],
+    )
+
+
+def count(fn, *args, **kwargs):
+    with QueryCollector() as queries:
+        result = fn(*args, **kwargs)
+    return queries.count, result
+
+
+@pytest.mark.parametrize("questions", [1, 25, 250])
+def test_create_quiz(db, user, questions):
+    quiz_in = make_quiz(questions)
+    assert quiz_service.create_quiz.query_budget(db, quiz_in, user.id) == 6
+    statements, quiz = count(quiz_service.create_quiz, db, quiz_in, user.id)
+    assert statements == 6
+    assert [q.text for q in quiz.questions] == [f"Question {n}" for n in range(questions)]
+    assert all(len(q.answers) == 3 for q in quiz.questions)
+
+
+@pytest.mark.parametrize("questions", [1, 40])
+def test_update_quiz_questions(db, user, questions):
+    created = quiz_service.create_quiz(db, make_quiz(2), user.id)
+    quiz = quiz_service.get_quiz(db, created.id)
+    db.refresh(user)
+    tree = [
+        {"text": f"New {n}", "answers": [{"text": "Yes", "is_correct": True}]}
+        for n in range(questions)
+    ]
+    statements, updated = count(
+        quiz_service.update_quiz, db, quiz, QuizUpdate(questions=tree), user
+    )
+    # tree load (2), question and answer inserts, answer and question
+    # deletes, quiz update, tree reload (3)
+    assert statements == 10
+    assert [q.text for q in updated.questions] == [f"New {n}" for n in range(questions)]
+
+
+@pytest.mark.parametrize("batch", [1, 30])
+def test_score_submissions(db, user, batch):
+    quiz = quiz_service.create_quiz(db, make_quiz(5), user.id)
+    submission = QuizSubmission(quiz_id=quiz.id, answers=[])
+    # Cold: loads the question pool (two queries) on top
+    cold, _ = count(quiz_service.score_submissions, db, [(user.id, submission)])
+    assert cold == 6
+    # quiz lookup, result insert, two rollup upserts
+    statements, results = count(
+        quiz_service.score_submissions, db, [(user.id, submission)] * batch
+    )
+    assert statements == 4
+    assert len(results) == batch
+    assert [r.id for r in results] == sorted(r.id for r in results)
+
+
+@pytest.mark.parametrize("quizzes", [1, 20])
+def test_quiz_reads(db, user, quizzes):
+    ids = [quiz_service.create_quiz(db, make_quiz(3), user.id).id for _ in range(quizzes)]
+    assert count(quiz_service.get_quizzes, db)[0] == 1
+    statements, loaded = count(quiz_service.get_quizzes_with_tree, db, ids)
+    assert statements == 3
+    assert [quiz.id for quiz in loaded] == ids
+
+
+def test_progress_reads(db, user):
+    quiz_id = quiz_service.create_quiz(db, make_quiz(3), user.id).id
+    user_id = user.id
+    quiz_service.score_submissions(db, [(user_id, QuizSubmission(quiz_id=quiz_id, answers=[]))])
+    db.expunge_all()
+    assert count(progress.get_summary, db, user_id)[0] == 3
+    assert count(progress.get_leaderboard, db, quiz_id)[0] == 2
+    # Served from the cache
+    assert count(progress.get_leaderboard, db, quiz_id)[0] == 0
+
+
+def test_budget_exceeded(db):
+    @query_budget(1)
+    def two_queries(db):
+        db.execute(select(Quiz.id))
+        db.execute(select(Quiz.id))
+
+    with pytest.raises(QueryBudgetExceeded):
+        two_queries(db)
@@ -0,0 +1,108 @@
+"""
+PATCHing a quiz's questions keeps the ids of rows that survive the edit
+and updates changed rows in place.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.db.instrumentation import QueryCollector
+from app.schemas.quiz import QuizCreate, QuizUpdate
+from app.services import quiz as quiz_service
+
+
+@pytest.fixture
+def quiz(db, user):
+    quiz_in = QuizCreate(
+        title="Capitals",
+        questions=[
+            {
+                "text": f"Question {n}",
+                "answers": [
+                    {"text": f"Answer {a}", "is_correct": a == 0} for a in range(3)
+                ],
+            }
+            for n in range(2)
+        ],
+    )
+    return quiz_service.create_quiz(db, quiz_in, user.id)
+
+
+def tree_of(quiz):
+    return [
+        {
+            "id": q.id,
+            "text": q.text,
+            "answers": [{"id": a.id, "text": a.text, "is_correct": a.is_correct} for a in q.answers],
+        }
+        for q in quiz.questions
+    ]
+
+
+def patch(db, user, quiz, tree):
+    return quiz_service.update_quiz(
+        db, quiz_service.get_quiz(db, quiz.id), QuizUpdate(questions=tree), user
+    )
+
+
+def test_unchanged_rows_keep_their_ids(db, user, quiz):
+    question_ids = [q.id for q in quiz.questions]
+    answer_ids = [[a.id for a in q.answers] for q in quiz.questions]
+    tree = tree_of(quiz)
+    tree[0]["text"] = "Question 0, reworded"
+    tree[0]["answers"][1]["is_correct"] = True
+    # Matched by text when the id is left out
+    del tree[1]["id"]
+    del tree[1]["answers"][2]["id"]
+
+    with QueryCollector() as queries:
+        updated = patch(db, user, quiz, tree)
+
+    assert [q.id for q in updated.questions] == question_ids
+    assert [[a.id for a in q.answers] for q in updated.questions] == answer_ids
+    assert updated.questions[0].text == "Question 0, reworded"
+    assert [a.is_correct for a in updated.questions[0].answers] == [True, True, False]
+    # Edits are UPDATEs; nothing is deleted and inserted again
+    statements = [statement.lstrip().split()[0].upper() for statement, _ in queries.statements]
+    assert "UPDATE" in statements
+    assert "DELETE" not in statements
+    assert "INSERT" not in statements
+
+
+def test_removed_rows_are_deleted(db, user, quiz):
+    before = tree_of(quiz)
+    tree = tree_of(quiz)[:1]
+    tree[0]["answers"] = tree[0]["answers"][:2] + [{"text": "Answer 3", "is_correct": False}]
+
+    updated = patch(db, user, quiz, tree)
+
+    assert [q.id for q in updated.questions] == [before[0]["id"]]
+    answers = updated.questions[0].answers
+    assert [a.id for a in answers[:2]] == [a["id"] for a in before[0]["answers"][:2]]
+    assert answers[2].text == "Answer 3"
+    assert answers[2].id not in {a["id"] for q in before for a in q["answers"]}
+
+
+@pytest.mark.parametrize("repeat", ["question", "answer"])
+def test_repeated_ids_are_rejected(db, user, quiz, repeat):
+    before = tree_of(quiz)
+    tree = tree_of(quiz)
+    if repeat == "question":
+        tree[1]["id"] = tree[0]["id"]
+    else:
+        tree[0]["answers"][1]["id"] = tree[0]["answers"][0]["id"]
+
+    with pytest.raises(HTTPException) as raised:
+        patch(db, user, quiz, tree)
+    assert raised.value.status_code == 400
+    db.rollback()
+    assert tree_of(quiz_service.get_quizzes_with_tree(db, [quiz.id])[0]) == before
+
+
+def test_unknown_ids_are_rejected(db, user, quiz):
+    tree = tree_of(quiz)
+    # An answer id belonging to the other question
+    tree[0]["answers"][0]["id"] = tree[1]["answers"][0]["id"]
+
+    with pytest.raises(HTTPException) as raised:
+        patch(db, user, quiz, tree)
+    assert raised.value.status_code == 400
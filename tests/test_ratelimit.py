@@ -0,0 +1,109 @@
+"""
+Token buckets refill at their configured rate, the IP limit is checked
+before a user's own, and admission control sheds requests that would wait
+too long.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core import ratelimit
+from app.core.config import settings
+from app.schemas.quiz import QuizCreate
+from app.services import quiz as quiz_service
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_parse_limit():
+    assert ratelimit.parse_limit("10/minute") == (10 / 60, 10)
+    assert ratelimit.parse_limit("5 / seconds") == (5, 5)
+
+
+def test_bucket_exhaustion_and_refill(clock):
+    backend = ratelimit.MemoryRateLimitBackend()
+    # A full bucket allows a burst of its capacity
+    assert [backend.hit("k", 1.0, 3) for _ in range(3)] == [0, 0, 0]
+    assert backend.hit("k", 1.0, 3) == pytest.approx(1.0)
+
+    clock[0] += 0.5
+    assert backend.hit("k", 1.0, 3) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert backend.hit("k", 1.0, 3) == 0
+    assert backend.hit("k", 1.0, 3) > 0
+
+    # Refills stop at capacity, and buckets are independent
+    clock[0] += 60
+    assert [backend.hit("k", 1.0, 3) for _ in range(4)][-1] > 0
+    assert backend.hit("other", 1.0, 3) == 0
+
+
+def test_rejections_carry_retry_after(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_backend", ratelimit.MemoryRateLimitBackend())
+    monkeypatch.setitem(settings.RATE_LIMITS, "login", "1/minute")
+    ratelimit.check_rate_limit("login", "user:1:ann")
+    with pytest.raises(ratelimit.HTTPException) as raised:
+        ratelimit.check_rate_limit("login", "user:1:ann")
+    assert raised.value.status_code == 429
+    assert raised.value.headers["Retry-After"] == "60"
+
+
+def test_ip_rejections_keep_the_user_quota(db, user, client, monkeypatch):
+    quiz = quiz_service.create_quiz(db, QuizCreate(title="Capitals", questions=[]), user.id)
+    headers = auth_headers(db, user)
+    monkeypatch.setitem(settings.RATE_LIMITS, "submit", "2/minute")
+    monkeypatch.setitem(settings.IP_RATE_LIMITS, "submit", "1/minute")
+
+    def submit():
+        return client.post("/api/quiz/submit", json={"quiz_id": quiz.id, "answers": []}, headers=headers)
+
+    assert submit().status_code == 200
+    assert submit().status_code == 429
+    # Without the IP limit the user still has the token it did not spend
+    monkeypatch.delitem(settings.IP_RATE_LIMITS, "submit")
+    assert submit().status_code == 200
+    assert submit().status_code == 429
+
+
+def test_admission_control_sheds_with_retry_after():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/api/slow")
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/healthz")
+    async def health():
+        return {"ok": True}
+
+    middleware = ratelimit.AdmissionControlMiddleware(
+        app, max_concurrency=1, max_queue_wait=0.05, retry_after=7
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            first = asyncio.create_task(http.get("/api/slow"))
+            await asyncio.sleep(0.01)
+            shed = await http.get("/api/slow")
+            # Outside the API prefix requests are not limited
+            health = await http.get("/healthz")
+            release.set()
+            return await first, shed, health
+
+    first, shed, health = asyncio.run(run())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "7"
+    assert health.status_code == 200
+    assert middleware.stats == {"admitted": 1, "shed": 1}
@@ -0,0 +1,156 @@
+"""
+In-memory search indexes follow changes made in other workers and are
+built at warm-up rather than by the first search; the shared change log
+is truncated once indexes no longer need it; misspelt terms still match,
+and title matches rank first.
+"""
+import os
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.shared_store import LogTruncated, SharedStore
+from app.db.session import shard_session
+from app.models.organization import Organization
+from app.models.quiz import Quiz
+from app.schemas.quiz import QuizCreate
+from app.services import quiz as quiz_service, search, warmup
+
+
+@pytest.fixture(autouse=True)
+def indexes(monkeypatch):
+    monkeypatch.setattr(search, "_indexes", {})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SharedStore(str(tmp_path))
+    monkeypatch.setattr(search, "get_shared_store", lambda: store)
+    return store
+
+
+def titles(db, query):
+    return [quiz.title for quiz, _ in search.search_quizzes(db, query)]
+
+
+def test_changes_in_other_workers_reach_the_index(db, user, store):
+    quiz = quiz_service.create_quiz(db, QuizCreate(title="Alpine lakes", questions=[]), user.id)
+    assert titles(db, "alpine") == ["Alpine lakes"]
+
+    # Another worker renames the quiz: only the shared change log tells us
+    db.execute(update(Quiz).where(Quiz.id == quiz.id).values(title="Coastal cliffs"))
+    db.commit()
+    store.append(search.CHANGES_NAMESPACE, "default", quiz.id)
+
+    assert titles(db, "coastal") == ["Coastal cliffs"]
+    assert titles(db, "alpine") == []
+
+
+def test_truncated_change_log(store):
+    for quiz_id in (1, 2, 3):
+        store.append(search.CHANGES_NAMESPACE, "default", quiz_id)
+    assert store.read_log(search.CHANGES_NAMESPACE, "default") == ([1, 2, 3], 6)
+    assert store.truncate_log(search.CHANGES_NAMESPACE, "default", max_bytes=6) == 6
+    assert store.read_log(search.CHANGES_NAMESPACE, "default", 2) == ([2, 3], 6)
+
+    # Offsets carry on past the truncation; readers behind it are told
+    assert store.truncate_log(search.CHANGES_NAMESPACE, "default") == 6
+    store.append(search.CHANGES_NAMESPACE, "default", 4)
+    assert store.log_size(search.CHANGES_NAMESPACE, "default") == 8
+    assert store.read_log(search.CHANGES_NAMESPACE, "default", 6) == ([4], 8)
+    assert store.read_log(search.CHANGES_NAMESPACE, "default", 8) == ([], 8)
+    with pytest.raises(LogTruncated):
+        store.read_log(search.CHANGES_NAMESPACE, "default", 2)
+
+
+def test_full_load_truncates_the_change_log(db, user, store, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_CHANGE_LOG_MAX_BYTES", 8)
+    log_path = store._path(search.CHANGES_NAMESPACE, "default", "log")
+    quiz = quiz_service.create_quiz(db, QuizCreate(title="Alpine lakes", questions=[]), user.id)
+    assert titles(db, "alpine") == ["Alpine lakes"]
+
+    # Another worker keeps editing the quiz, then loads its index in full
+    # and truncates the log past this worker's offset
+    db.execute(update(Quiz).where(Quiz.id == quiz.id).values(title="Coastal cliffs"))
+    db.commit()
+    for _ in range(5):
+        store.append(search.CHANGES_NAMESPACE, "default", quiz.id)
+    end = store.truncate_log(search.CHANGES_NAMESPACE, "default", settings.SEARCH_CHANGE_LOG_MAX_BYTES)
+    assert os.path.getsize(log_path) < 8
+
+    # This worker can no longer read what it missed, so it loads in full
+    assert titles(db, "coastal") == ["Coastal cliffs"]
+    index = search.index_for(db)
+    assert index.log_offset == end
+
+    # Its own changes grow the log past the limit: its next search loads
+    # in full and truncates the log
+    for title in ("Glaciers", "Deserts", "Volcanoes", "Islands", "Oceans"):
+        quiz_service.create_quiz(db, QuizCreate(title=title, questions=[]), user.id)
+    assert not index.loaded
+    assert titles(db, "oceans") == ["Oceans"]
+    assert index.loaded
+    assert os.path.getsize(log_path) < 8
+    assert index.log_offset == store.log_size(search.CHANGES_NAMESPACE, "default") > end
+
+
+def test_warmup_builds_every_organization(db):
+    db.add(Organization(slug="springfield", name="Springfield"))
+    db.commit()
+
+    assert warmup.warm_search() == 2
+    for org_id in (1, 2):
+        with shard_session("default", org_id) as org_db:
+            assert search.index_for(org_db).loaded
+
+
+def test_misspelt_terms_match_fuzzily(db, user):
+    quiz_service.create_quiz(
+        db, QuizCreate(title="European capitals", description="Cities and flags", questions=[]), user.id
+    )
+    quiz_service.create_quiz(db, QuizCreate(title="Alpine lakes", questions=[]), user.id)
+
+    assert titles(db, "capitls") == ["European capitals"]
+    assert titles(db, "eurpean citys") == ["European capitals"]
+    assert titles(db, "xylophone") == []
+
+
+def test_title_matches_outrank_body_matches(db, user):
+    quiz_service.create_quiz(
+        db,
+        QuizCreate(title="Geography", questions=[{"text": "Which rivers cross Paris?", "answers": []}]),
+        user.id,
+    )
+    quiz_service.create_quiz(db, QuizCreate(title="Rivers", questions=[]), user.id)
+    quiz_service.create_quiz(
+        db, QuizCreate(title="Mountains", description="Famous rivers too", questions=[]), user.id
+    )
+    for title in ("Capitals", "Flags", "Islands", "Deserts", "Lakes", "Volcanoes", "Oceans"):
+        quiz_service.create_quiz(db, QuizCreate(title=title, questions=[]), user.id)
+
+    # Title before description before question text
+    assert titles(db, "rivers") == ["Rivers", "Mountains", "Geography"]
+    scores = [score for _, score in search.search_quizzes(db, "rivers")]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_replace_and_invalidate():
+    index = search.SearchIndex()
+    index.replace([(1, "Alpine lakes", None, ()), (2, "Coastal cliffs", None, ())], log_offset=7)
+    assert index.loaded and index.log_offset == 7
+    assert [quiz_id for quiz_id, _ in index.search("alpine")] == [1]
+
+    index.invalidate([1, 3], log_offset=9)
+    assert index.log_offset == 9
+    # Quiz 1 changed, quiz 3 is gone
+    assert index.reindex(lambda quiz_ids: [(1, "Glaciers", None, ())]) == 2
+    assert index.search("alpine") == []
+    assert [quiz_id for quiz_id, _ in index.search("glaciers")] == [1]
+    assert index.reindex(lambda quiz_ids: pytest.fail("nothing is queued")) == 0
+
+    # A rebuild drops what was indexed before and the pending changes
+    index.invalidate([2])
+    index.replace([(4, "Deserts", None, ())])
+    assert len(index) == 1 and not index.dirty
+    assert index.search("coastal") == []
@@ -0,0 +1,82 @@
+"""
+serve.py keeps exactly one primary worker, which alone runs the background
+job runner.
+"""
+import signal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import serve
+from app.core.config import settings
+
+
+@pytest.fixture
+def master(monkeypatch):
+    """
+    A master whose workers are pids handed out by a fake fork.
+    """
+    pids = iter(range(100, 200))
+    monkeypatch.setattr(serve.os, "fork", lambda: next(pids))
+    monkeypatch.setattr(serve.os, "kill", lambda pid, sig: None)
+    return serve.Master(app=None, sock=None, workers=3, graceful_timeout=30)
+
+
+def spawn(master, count):
+    for _ in range(count):
+        master.spawn_worker()
+
+
+def test_first_worker_is_primary(master):
+    spawn(master, 3)
+    assert master.primary == 100
+
+
+def test_replacement_of_a_dead_primary_takes_over(master, monkeypatch):
+    spawn(master, 3)
+    exited = iter([(100, 9), (0, 0)])
+    monkeypatch.setattr(serve.os, "waitpid", lambda pid, options: next(exited))
+    master.reap()
+    assert master.primary is None
+    spawn(master, 1)
+    assert master.primary == 103
+
+    # A worker that is not the primary leaves it alone
+    master.stop_worker(101)
+    spawn(master, 1)
+    assert master.primary == 103
+
+
+def test_reload_hands_over_to_a_new_worker(master):
+    spawn(master, 3)
+    master.signals.append(signal.SIGHUP)
+    master.handle_signals()
+    assert sorted(master.workers) == [103, 104, 105]
+    assert sorted(master.draining) == [100, 101, 102]
+    assert master.primary == 103
+
+
+def test_scaling_down_keeps_the_primary(master):
+    master.adjust_workers()
+    master.worker_count = 2
+    master.adjust_workers()
+    assert master.primary == 100
+    assert sorted(master.workers) == [100, 102]
+
+    master.worker_count = 3
+    master.adjust_workers()
+    assert sorted(master.workers) == [100, 102, 103]
+    assert master.primary == 100
+
+
+@pytest.mark.parametrize("primary", [True, False])
+def test_lifespan_starts_the_runner_in_the_primary_only(db, monkeypatch, primary):
+    started = []
+    monkeypatch.setattr(settings, "PRIMARY_WORKER", primary)
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", False)
+    monkeypatch.setattr(settings, "REVOCATION_SYNC_SECONDS", 0)
+    monkeypatch.setattr(main, "start_runner", lambda: started.append(1))
+    with TestClient(main.app):
+        pass
+    assert started == ([1] if primary else [])
@@ -0,0 +1,99 @@
+"""
+Question pools read from the shared store cut the same papers as pools
+built in memory, without parsing the entry up front.
+"""
+import gc
+import os
+
+import pytest
+
+from app.core import shared_store
+from app.core.shared_store import MappedRecords, SharedStore
+from app.schemas.quiz import QuizCreate
+from app.services import delivery, quiz as quiz_service
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SharedStore(str(tmp_path))
+    monkeypatch.setattr(delivery, "get_shared_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def quiz(db, user):
+    quiz_in = QuizCreate(
+        title="Capitals",
+        delivery_mode="adaptive",
+        sample_size=4,
+        questions=[
+            {
+                "text": f"Question {n}",
+                "difficulty": n % 5 + 1,
+                "answers": [
+                    {"text": f"Answer {a}", "is_correct": a == 0} for a in range(3)
+                ],
+            }
+            for n in range(12)
+        ],
+    )
+    return quiz_service.create_quiz(db, quiz_in, user.id)
+
+
+def test_pool_is_read_from_the_mapping(db, store, quiz):
+    pool = delivery.get_pool(db, quiz)
+    assert isinstance(pool.entries, MappedRecords)
+
+    built = delivery.build_pool(db, quiz)
+    assert pool.question_ids == built.question_ids
+    for user_id in range(1, 10):
+        for target in (1, 3, 5):
+            paper = delivery.build_paper(pool, user_id, target)
+            assert paper == delivery.build_paper(built, user_id, target)
+            answers = {q["id"]: q["answers"][0]["id"] for q in paper["questions"]}
+            assert delivery.score_paper(pool, paper, answers) == delivery.score_paper(
+                built, paper, answers
+            )
+
+    # Another worker maps the same entry instead of rebuilding it
+    delivery.pool_cache.clear()
+    assert delivery.shared_pool(store, "default", quiz.id, pool.version) is not None
+    assert isinstance(delivery.get_pool(db, quiz).entries, MappedRecords)
+
+
+def test_records_miss_on_another_version(store):
+    store.put_records("pool.default", 1, "v1", {"title": "t"}, [{"n": 0}, {"n": 1}])
+    records = store.get_records("pool.default", 1, "v1")
+    assert len(records) == 2
+    assert records[-1] == {"n": 1}
+    assert records.header["title"] == "t"
+    assert store.get_records("pool.default", 1, "v2") is None
+
+    store.delete("pool.default", 1)
+    assert store.get_records("pool.default", 1, "v1") is None
+    # Mappings taken before the delete stay readable
+    assert records[0] == {"n": 0}
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+@pytest.mark.parametrize("size", [10, 8000])
+def test_cached_pools_do_not_hold_descriptors(store, monkeypatch, size):
+    monkeypatch.setattr(shared_store, "MAX_MAPPED_ENTRIES", 8)
+    # Small entries and large ones (about 18 bytes a record)
+    for key in range(60):
+        store.put_records("pool.default", key, "v1", {}, [{"n": n} for n in range(size)])
+    before = open_fds()
+
+    held = [store.get_records("pool.default", key, "v1") for key in range(60)]
+    assert all(records[size - 1] == {"n": size - 1} for records in held)
+    assert open_fds() - before <= 8
+
+    # Mappings given back make room for new ones
+    del held
+    gc.collect()
+    assert shared_store._mapped_entries == 0
+    assert open_fds() <= before
@@ -0,0 +1,90 @@
+"""
+Concurrent calls for one key run the function once and share its value or
+its exception; the counters are reported at /healthz/metrics.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core import singleflight
+
+WAITERS = 8
+
+
+@pytest.fixture
+def flight(monkeypatch):
+    monkeypatch.setattr(singleflight, "_groups", {})
+    return singleflight.group("test")
+
+
+def run_concurrently(flight, fn, key="k"):
+    """
+    Start WAITERS calls for `key`, release `fn` once all of them are in,
+    and return each call's (value, shared) or exception.
+    """
+    release = threading.Event()
+    runs = []
+
+    def leader_fn():
+        runs.append(1)
+        assert release.wait(10)
+        return fn()
+
+    def call():
+        try:
+            return flight.do(key, leader_fn)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(WAITERS) as pool:
+        futures = [pool.submit(call) for _ in range(WAITERS)]
+        # Every caller has registered: one leader, the rest waiting on it
+        while flight.stats["calls"] < WAITERS:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result(10) for future in futures]
+    return runs, results
+
+
+def test_concurrent_misses_run_once(flight):
+    value = object()
+    runs, results = run_concurrently(flight, lambda: value)
+    assert runs == [1]
+    assert all(result[0] is value for result in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * (WAITERS - 1)
+    assert flight.stats == {"calls": WAITERS, "executions": 1, "coalesced": WAITERS - 1}
+
+
+def test_exception_reaches_every_waiter_and_releases_the_key(flight):
+    def fail():
+        raise ValueError("database is down")
+
+    runs, results = run_concurrently(flight, fail)
+    assert runs == [1]
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._calls == {}
+
+    # The next call runs again instead of replaying the failure
+    assert flight.do("k", lambda: 42) == (42, False)
+    assert flight.stats["executions"] == 2
+
+
+def test_keys_are_independent(flight):
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    # Nothing is cached once a call completes
+    assert flight.do("a", lambda: 3) == (3, False)
+    assert flight.stats["coalesced"] == 0
+
+
+def test_counters_are_reported_at_metrics(flight, client):
+    run_concurrently(flight, lambda: None)
+    singleflight.group("other").do("k", lambda: None)
+
+    metrics = client.get("/healthz/metrics").json()["singleflight"]
+    assert metrics == {
+        "test": {"calls": WAITERS, "executions": 1, "coalesced": WAITERS - 1},
+        "other": {"calls": 1, "executions": 1, "coalesced": 0},
+    }
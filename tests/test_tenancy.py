@@ -0,0 +1,126 @@
+"""
+Organizations never see each other's quizzes, whether they share a
+database shard or not.
+"""
+import pytest
+from sqlalchemy import update
+
+from app.db.session import shard_session
+from app.models.organization import Organization
+from app.models.quiz import Quiz
+from app.models.user import User
+from app.schemas.quiz import QuizCreate
+from app.services import quiz as quiz_service
+from tests.conftest import auth_headers
+
+
+def capitals() -> QuizCreate:
+    return QuizCreate(
+        title="Capitals",
+        description="European capitals",
+        questions=[{"text": "Capital of France?", "answers": [
+            {"text": "Paris", "is_correct": True},
+            {"text": "Lyon", "is_correct": False},
+        ]}],
+    )
+
+
+def deleted_quiz(db, user_id):
+    draft = quiz_service.create_quiz(db, QuizCreate(title="Draft", questions=[]), user_id)
+    db.execute(update(Quiz).where(Quiz.id == draft.id).values(is_active=False))
+    db.commit()
+
+
+@pytest.fixture
+def quiz(db, user):
+    # After a deleted one, so its id is not the first on a fresh shard
+    deleted_quiz(db, user.id)
+    return quiz_service.create_quiz(db, capitals(), user.id)
+
+
+def make_org(db, slug, shard):
+    org = Organization(slug=slug, name=slug.title(), shard=shard)
+    db.add(org)
+    db.commit()
+    return org
+
+
+def join(db, shard):
+    """
+    A player of a new organization on `shard`: the id of a quiz of their
+    own and their auth headers.
+    """
+    org = make_org(db, "springfield", shard)
+    with shard_session(org.shard, org.id) as org_db:
+        player = User(
+            org_id=org.id, email="bart@example.com", username="bart", hashed_password="x", is_admin=True
+        )
+        org_db.add(player)
+        org_db.commit()
+        own = quiz_service.create_quiz(
+            org_db, QuizCreate(title="Rivers", questions=[]), player.id
+        )
+        return own.id, auth_headers(org_db, player)
+
+
+@pytest.fixture(params=["default", "eu"])
+def outsider(request, db, quiz):
+    """
+    Another organization on the same shard as `quiz` or on another one.
+    """
+    return join(db, request.param)
+
+
+def test_same_id_on_another_shard(db, user, client):
+    quiz = quiz_service.create_quiz(db, capitals(), user.id)
+    own, headers = join(db, "eu")
+    assert own == quiz.id
+    response = client.get(f"/api/quiz/{quiz.id}", headers=headers)
+    assert response.json()["title"] == "Rivers"
+
+
+def test_quiz_of_another_organization_is_not_found(client, quiz, outsider):
+    own, headers = outsider
+    assert client.get(f"/api/quiz/{quiz.id}", headers=headers).status_code == 404
+    assert client.patch(
+        f"/api/quiz/{quiz.id}", json={"title": "Hijacked"}, headers=headers
+    ).status_code == 404
+    assert client.get(f"/api/quiz/{quiz.id}/leaderboard", headers=headers).status_code == 404
+    assert client.get(f"/api/quiz/{quiz.id}/stats", headers=headers).status_code == 404
+    assert client.post(
+        "/api/quiz/submit", json={"quiz_id": quiz.id, "answers": []}, headers=headers
+    ).status_code == 404
+    assert client.delete(f"/api/quiz/{quiz.id}", headers=headers).status_code == 404
+
+
+def test_lists_and_search_stay_within_the_organization(db, user, client, quiz, outsider):
+    own, headers = outsider
+    assert [q["title"] for q in client.get("/api/quiz/", headers=headers).json()] == ["Rivers"]
+    assert client.get("/api/quiz/search", params={"q": "capitals"}, headers=headers).json() == []
+    assert client.get("/api/quiz/search", params={"q": "europe"}, headers=headers).json() == []
+
+    # The owner's view is unchanged by the outsider's requests
+    headers = auth_headers(db, user)
+    assert [q["title"] for q in client.get("/api/quiz/", headers=headers).json()] == ["Capitals"]
+    hits = client.get("/api/quiz/search", params={"q": "capitals"}, headers=headers).json()
+    assert [hit["title"] for hit in hits] == ["Capitals"]
+    response = client.get(f"/api/quiz/{quiz.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Capitals"
+
+
+def test_results_stay_within_the_organization(db, user, client, quiz, outsider):
+    own, headers = outsider
+    client.post("/api/quiz/submit", json={"quiz_id": own, "answers": []}, headers=headers)
+
+    owner = auth_headers(db, user)
+    client.post("/api/quiz/submit", json={"quiz_id": quiz.id, "answers": []}, headers=owner)
+    board = client.get(f"/api/quiz/{quiz.id}/leaderboard", headers=owner).json()
+    assert [entry["username"] for entry in board] == ["player"]
+    stats = client.get(f"/api/quiz/{quiz.id}/stats", headers=owner).json()
+    assert stats["attempts"] == 1
+
+    board = client.get(f"/api/quiz/{own}/leaderboard", headers=headers).json()
+    assert [entry["username"] for entry in board] == ["bart"]
+    summary = client.get("/api/users/me/summary", headers=headers).json()
+    assert [q["title"] for q in summary["quizzes"]] == ["Rivers"]
@@ -0,0 +1,115 @@
+"""
+Refresh tokens rotate on every use, a replayed one revokes its session,
+and revoked sessions are checked (and forgotten) in memory.
+"""
+import pytest
+
+from app.core import revocation, security
+from app.core.revocation import BloomFilter, RevocationList
+from app.services import tokens
+
+
+@pytest.fixture(autouse=True)
+def revoked(monkeypatch):
+    revoked = RevocationList(capacity=100)
+    monkeypatch.setattr(security, "revoked_sessions", revoked)
+    monkeypatch.setattr(tokens, "revoked_sessions", revoked)
+    return revoked
+
+
+@pytest.fixture
+def session(db, user):
+    db.refresh(user)
+    return tokens.login(db, user)
+
+
+def me(client, pair):
+    return client.get("/api/users/me", headers={"Authorization": f"Bearer {pair['access_token']}"})
+
+
+def refresh(client, pair):
+    return client.post("/api/users/token/refresh", json={"refresh_token": pair["refresh_token"]})
+
+
+def test_rotated_refresh_token_works_once(client, session):
+    response = refresh(client, session)
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != session["refresh_token"]
+    assert me(client, rotated).status_code == 200
+
+    response = refresh(client, rotated)
+    assert response.status_code == 200
+    assert me(client, response.json()).status_code == 200
+
+
+def test_replayed_refresh_token_revokes_the_session(client, session, revoked):
+    rotated = refresh(client, session).json()
+
+    # Someone presents the used-up token again: the whole family goes
+    assert refresh(client, session).status_code == 401
+    assert refresh(client, rotated).status_code == 401
+    assert me(client, rotated).status_code == 401
+    assert me(client, session).status_code == 401
+    assert len(revoked) == 1
+
+
+def test_logout_rejects_the_access_token(client, session):
+    assert me(client, session).status_code == 200
+    response = client.post("/api/users/logout", json={"refresh_token": session["refresh_token"]})
+    assert response.status_code == 204
+    assert me(client, session).status_code == 401
+    assert refresh(client, session).status_code == 401
+
+
+def test_revocations_reach_other_workers(db, client, session, revoked, monkeypatch):
+    client.post("/api/users/logout", json={"refresh_token": session["refresh_token"]})
+
+    # A worker that did not handle the logout loads it from the database
+    fresh = RevocationList(capacity=100)
+    monkeypatch.setattr(security, "revoked_sessions", fresh)
+    monkeypatch.setattr(tokens, "revoked_sessions", fresh)
+    assert me(client, session).status_code == 200
+    assert tokens.load_revocations(db) == 1
+    assert me(client, session).status_code == 401
+
+
+def test_prune_drops_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(revocation.time, "time", lambda: now[0])
+    revoked = RevocationList(capacity=4)
+    revoked.add("short", ttl=10)
+    revoked.add("long", ttl=100)
+    assert "short" in revoked and "long" in revoked
+
+    now[0] += 50
+    # Expired entries stop matching at once and are dropped on prune
+    assert "short" not in revoked
+    assert len(revoked) == 2
+    assert revoked.prune() == 1
+    assert "long" in revoked
+    assert "short" not in revoked._expires
+
+    now[0] += 100
+    assert revoked.prune() == 0
+    assert "long" not in revoked
+
+
+def test_revocation_list_grows_past_capacity(monkeypatch):
+    revoked = RevocationList(capacity=2)
+    for n in range(5):
+        revoked.add(f"family-{n}", ttl=60)
+    assert revoked.capacity >= 5
+    assert all(f"family-{n}" in revoked for n in range(5))
+    assert "family-5" not in revoked
+    assert None not in revoked
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    items = [f"family-{n}" for n in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{n}" in bloom for n in range(10_000))
+    assert false_positives < 300
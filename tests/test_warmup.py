@@ -0,0 +1,42 @@
+"""
+A failed warm-up is retried until /healthz/ready can report ready.
+"""
+from app.core.config import settings
+from app.services import warmup
+
+
+def test_failed_warmup_is_retried(db, monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+    monkeypatch.setattr(settings, "WARMUP_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(warmup, "warm_schemas", lambda app=None: None)
+    pooled, calls = [], []
+    monkeypatch.setattr(warmup, "warm_db_pool", pooled.append)
+
+    def flaky_search():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("database is starting up")
+
+    monkeypatch.setattr(warmup, "warm_search", flaky_search)
+    warmup.run_warmup()
+
+    assert warmup.state.ready
+    assert warmup.state.attempts == 3
+    assert warmup.state.error is None
+    # Steps that finished are not run again
+    assert len(pooled) == 1
+
+
+def test_only_the_primary_worker_loads_pools(db, monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+    monkeypatch.setattr(settings, "PRIMARY_WORKER", False)
+    monkeypatch.setattr(warmup, "warm_schemas", lambda app=None: None)
+    monkeypatch.setattr(warmup, "warm_db_pool", lambda connections: None)
+    monkeypatch.setattr(warmup, "warm_search", lambda: None)
+    loaded = []
+    monkeypatch.setattr(warmup, "warm_all_quizzes", loaded.append)
+    warmup.run_warmup()
+
+    assert warmup.state.ready
+    assert warmup.state.steps["quizzes"] == "skipped"
+    assert loaded == []